@@ -0,0 +1,23 @@
+import 'package:reveal_app/app/data/models/college_model.dart';
+import 'package:reveal_app/app/data/models/product_model.dart';
+import 'package:reveal_app/app/data/models/user_model.dart' as app_user;
+import 'package:reveal_app/app/data/models/wallet_model.dart';
+
+/// Everything the home screen needs, loaded with a single /api/bootstrap/ call.
+class BootstrapModel {
+  final app_user.User? user;
+  final WalletModel? wallet;
+  final List<CollegeModel> cafes;
+  final String? cafeId;
+  final List<String> categories;
+  final List<ProductModel> products;
+
+  BootstrapModel({
+    required this.user,
+    required this.wallet,
+    required this.cafes,
+    required this.cafeId,
+    required this.categories,
+    required this.products,
+  });
+}
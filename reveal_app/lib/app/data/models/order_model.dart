@@ -81,6 +81,36 @@ class OrderModel {
   }
 }
 
+/// نتيجة مزامنة الطلبات التزايدية (`/api/orders/?since=`).
+class OrderChanges {
+  final List<OrderModel> changed;
+  final String? cursor;
+  final bool hasMore;
+
+  OrderChanges({
+    required this.changed,
+    required this.cursor,
+    this.hasMore = false,
+  });
+
+  factory OrderChanges.fromJson(Map<String, dynamic> json) {
+    return OrderChanges(
+      changed: (json['changed'] as List?)?.map((i) => OrderModel.fromJson(i)).toList() ?? [],
+      cursor: json['cursor']?.toString(),
+      hasMore: json['has_more'] == true,
+    );
+  }
+}
+
+/// نتيجة انتظار واحد لكل الطلبات النشطة: الطلبات التي تغيرت حالتها (فارغة بعد المهلة)،
+/// و[retryAfter] عندما يطلب الخادم الانتظار قبل الاستعلام التالي (الانتظار المباشر معطل عليه).
+class OrderStatusWait {
+  final List<OrderModel> changed;
+  final Duration? retryAfter;
+
+  OrderStatusWait({required this.changed, this.retryAfter});
+}
+
 class OrderItem {
   final int productId;
   final String productName;
@@ -1,8 +1,10 @@
 ﻿import 'dart:convert';
+import 'dart:math';
 
 import 'package:http/http.dart' as http;
 import 'package:shared_preferences/shared_preferences.dart';
 
+import 'package:reveal_app/app/data/models/bootstrap_model.dart';
 import 'package:reveal_app/app/data/models/college_model.dart';
 import 'package:reveal_app/app/data/models/order_model.dart';
 import 'package:reveal_app/app/data/models/product_model.dart';
@@ -19,10 +21,20 @@ class ApiException implements Exception {
   String toString() => message;
 }
 
+class _CachedResponse {
+  final String etag;
+  final List<int> bodyBytes;
+
+  _CachedResponse(this.etag, this.bodyBytes);
+}
+
 class ApiService {
   static const String baseUrl = 'https://revealsystem.pythonanywhere.com';
   static const String _tokenKey = 'auth_token';
 
+  // Last catalog responses with their ETag, revalidated with If-None-Match.
+  static final Map<String, _CachedResponse> _etagCache = {};
+
   Future<String?> getToken() async {
     final prefs = await SharedPreferences.getInstance();
     return prefs.getString(_tokenKey);
@@ -55,6 +67,43 @@ class ApiService {
     return headers;
   }
 
+  // Orders and wallet operations send an Idempotency-Key and retry once with the
+  // same key, so a lost response never creates a second order or debit.
+  Future<http.Response> _postIdempotent(Uri url, Map<String, dynamic> body) async {
+    final headers = await _headers(authRequired: true);
+    headers['Idempotency-Key'] = _newIdempotencyKey();
+    final encoded = json.encode(body);
+    try {
+      return await http.post(url, headers: headers, body: encoded);
+    } catch (_) {
+      return http.post(url, headers: headers, body: encoded);
+    }
+  }
+
+  String _newIdempotencyKey() {
+    final random = Random.secure();
+    return List.generate(16, (_) => random.nextInt(256).toRadixString(16).padLeft(2, '0')).join();
+  }
+
+  Future<http.Response> _getWithEtag(Uri url, Map<String, String> headers) async {
+    final key = url.toString();
+    final cached = _etagCache[key];
+    if (cached != null) {
+      headers['If-None-Match'] = cached.etag;
+    }
+
+    final response = await http.get(url, headers: headers);
+    if (response.statusCode == 304 && cached != null) {
+      return http.Response.bytes(cached.bodyBytes, 200, headers: response.headers);
+    }
+
+    final etag = response.headers['etag'];
+    if (response.statusCode == 200 && etag != null && etag.isNotEmpty) {
+      _etagCache[key] = _CachedResponse(etag, response.bodyBytes);
+    }
+    return response;
+  }
+
   dynamic _decodeBody(http.Response response) {
     if (response.bodyBytes.isEmpty) {
       return null;
@@ -85,6 +134,32 @@ class ApiService {
     return fallback;
   }
 
+  String _absoluteUrl(String path) {
+    if (path.isEmpty || path.startsWith('http')) {
+      return path;
+    }
+    final normalized = path.startsWith('/') ? path : '/$path';
+    return '$baseUrl$normalized';
+  }
+
+  CollegeModel _parseCafe(dynamic raw) {
+    final map = Map<String, dynamic>.from(raw as Map);
+    final imagePath = (map['image'] ?? '').toString();
+    if (imagePath.isNotEmpty) {
+      map['image'] = _absoluteUrl(imagePath);
+    }
+    return CollegeModel.fromJson(map);
+  }
+
+  ProductModel _parseProduct(dynamic raw) {
+    final map = Map<String, dynamic>.from(raw as Map);
+    final imagePath = (map['image_url'] ?? map['image'] ?? '').toString();
+    if (imagePath.isNotEmpty) {
+      map['image_url'] = _absoluteUrl(imagePath);
+    }
+    return ProductModel.fromJson(map);
+  }
+
   ApiException _buildException(http.Response response, dynamic body) {
     return ApiException(
       _extractMessage(body, fallback: 'Request failed (${response.statusCode}).'),
@@ -164,6 +239,91 @@ class ApiService {
     }
   }
 
+  /// Profile, wallet balance, cafes and the selected cafe's menu in one request.
+  /// Works without a token too (user and wallet are then null).
+  Future<BootstrapModel> getBootstrap({String? cafeId}) async {
+    final query = <String, String>{};
+    if (cafeId != null && cafeId.trim().isNotEmpty) {
+      query['cafe_id'] = cafeId;
+    }
+    final url = Uri.parse('$baseUrl/api/bootstrap/').replace(
+      queryParameters: query.isEmpty ? null : query,
+    );
+
+    try {
+      final headers = await _headers();
+      final token = await getToken();
+      if (token != null && token.isNotEmpty) {
+        headers['Authorization'] = 'Token $token';
+      }
+
+      var response = await http.get(url, headers: headers);
+      if (response.statusCode == 401 && headers.containsKey('Authorization')) {
+        // Expired token: still load the catalog as a guest.
+        headers.remove('Authorization');
+        response = await http.get(url, headers: headers);
+      }
+      final data = _decodeBody(response);
+
+      if (response.statusCode == 200 && data is Map<String, dynamic>) {
+        final user = data['user'];
+        final wallet = data['wallet'];
+        final cafes = data['cafes'];
+        final categories = data['categories'];
+        final products = data['products'];
+        return BootstrapModel(
+          user: user is Map ? app_user.User.fromJson(Map<String, dynamic>.from(user)) : null,
+          wallet: wallet is Map ? WalletModel.fromJson(Map<String, dynamic>.from(wallet)) : null,
+          cafes: cafes is List ? cafes.map(_parseCafe).toList() : <CollegeModel>[],
+          cafeId: data['cafe_id']?.toString(),
+          categories: categories is List
+              ? categories.map((raw) => (raw is Map ? raw['name'] : raw).toString()).toList()
+              : <String>[],
+          products: products is List ? products.map(_parseProduct).toList() : <ProductModel>[],
+        );
+      }
+
+      throw _buildException(response, data);
+    } on ApiException {
+      rethrow;
+    } catch (e) {
+      throw ApiException('Network error: $e');
+    }
+  }
+
+  /// Runs several GET endpoints (e.g. '/api/user/', '/api/wallet/') in one round trip.
+  /// Each result is a map with 'path', 'status', 'headers' and the decoded 'body'.
+  Future<List<Map<String, dynamic>>> batchGet(List<String> paths) async {
+    final url = Uri.parse('$baseUrl/api/batch/');
+
+    try {
+      final headers = await _headers();
+      final token = await getToken();
+      if (token != null && token.isNotEmpty) {
+        headers['Authorization'] = 'Token $token';
+      }
+
+      final response = await http.post(
+        url,
+        headers: headers,
+        body: json.encode({'requests': paths}),
+      );
+      final data = _decodeBody(response);
+
+      if (response.statusCode == 200 && data is Map && data['responses'] is List) {
+        return (data['responses'] as List)
+            .map((item) => Map<String, dynamic>.from(item as Map))
+            .toList();
+      }
+
+      throw _buildException(response, data);
+    } on ApiException {
+      rethrow;
+    } catch (e) {
+      throw ApiException('Network error: $e');
+    }
+  }
+
   Future<app_user.User> getUserProfile() async {
     final url = Uri.parse('$baseUrl/api/user/');
 
@@ -187,19 +347,11 @@ class ApiService {
     final url = Uri.parse('$baseUrl/api/cafes/');
 
     try {
-      final response = await http.get(url, headers: await _headers());
+      final response = await _getWithEtag(url, await _headers());
       final data = _decodeBody(response);
 
       if (response.statusCode == 200 && data is List) {
-        return data.map((raw) {
-          final map = Map<String, dynamic>.from(raw as Map);
-          final imagePath = (map['image'] ?? '').toString();
-          if (imagePath.isNotEmpty && !imagePath.startsWith('http')) {
-            final normalized = imagePath.startsWith('/') ? imagePath : '/$imagePath';
-            map['image'] = '$baseUrl$normalized';
-          }
-          return CollegeModel.fromJson(map);
-        }).toList();
+        return data.map(_parseCafe).toList();
       }
 
       throw _buildException(response, data);
@@ -217,19 +369,11 @@ class ApiService {
     );
 
     try {
-      final response = await http.get(url, headers: await _headers());
+      final response = await _getWithEtag(url, await _headers());
       final data = _decodeBody(response);
 
       if (response.statusCode == 200 && data is List) {
-        return data.map((raw) {
-          final map = Map<String, dynamic>.from(raw as Map);
-          final imagePath = (map['image_url'] ?? map['image'] ?? '').toString();
-          if (imagePath.isNotEmpty && !imagePath.startsWith('http')) {
-            final normalized = imagePath.startsWith('/') ? imagePath : '/$imagePath';
-            map['image_url'] = '$baseUrl$normalized';
-          }
-          return ProductModel.fromJson(map);
-        }).toList();
+        return data.map(_parseProduct).toList();
       }
 
       throw _buildException(response, data);
@@ -320,15 +464,11 @@ class ApiService {
     final url = Uri.parse('$baseUrl/api/wallet/transfer/');
 
     try {
-      final response = await http.post(
-        url,
-        headers: await _headers(authRequired: true),
-        body: json.encode({
-          'wallet_code': walletCode,
-          'amount': amount,
-          if (note != null && note.trim().isNotEmpty) 'note': note.trim(),
-        }),
-      );
+      final response = await _postIdempotent(url, {
+        'wallet_code': walletCode,
+        'amount': amount,
+        if (note != null && note.trim().isNotEmpty) 'note': note.trim(),
+      });
       final data = _decodeBody(response);
 
       if (response.statusCode == 200 && data is Map && data['success'] == true) {
@@ -350,14 +490,10 @@ class ApiService {
     final url = Uri.parse('$baseUrl/api/wallet/withdraw/');
 
     try {
-      final response = await http.post(
-        url,
-        headers: await _headers(authRequired: true),
-        body: json.encode({
-          'amount': amount,
-          if (note != null && note.trim().isNotEmpty) 'note': note.trim(),
-        }),
-      );
+      final response = await _postIdempotent(url, {
+        'amount': amount,
+        if (note != null && note.trim().isNotEmpty) 'note': note.trim(),
+      });
       final data = _decodeBody(response);
 
       if (response.statusCode == 200 && data is Map && data['success'] == true) {
@@ -376,15 +512,11 @@ class ApiService {
     final url = Uri.parse('$baseUrl/api/orders/');
 
     try {
-      final response = await http.post(
-        url,
-        headers: await _headers(authRequired: true),
-        body: json.encode({
-          'total_price': totalPrice,
-          'items': items,
-          'payment_method': paymentMethod,
-        }),
-      );
+      final response = await _postIdempotent(url, {
+        'total_price': totalPrice,
+        'items': items,
+        'payment_method': paymentMethod,
+      });
       final data = _decodeBody(response);
 
       if (response.statusCode == 201 || response.statusCode == 200) {
@@ -418,6 +550,61 @@ class ApiService {
     }
   }
 
+  /// الطلبات التي تغيرت بعد [since] فقط؛ بدون cursor تُجلب الصفحة الأولى
+  /// ويُقرأ مؤشر المزامنة من ترويسة X-Sync-Cursor.
+  Future<OrderChanges> getOrderChanges({String? since}) async {
+    final url = since == null
+        ? Uri.parse('$baseUrl/api/orders/')
+        : Uri.parse('$baseUrl/api/orders/').replace(queryParameters: {'since': since});
+
+    try {
+      final response = await http.get(url, headers: await _headers(authRequired: true));
+      final data = _decodeBody(response);
+
+      if (response.statusCode == 200 && data is List) {
+        return OrderChanges(
+          changed: data.map((item) => OrderModel.fromJson(item)).toList(),
+          cursor: response.headers['x-sync-cursor'],
+        );
+      }
+      if (response.statusCode == 200 && data is Map<String, dynamic>) {
+        return OrderChanges.fromJson(data);
+      }
+
+      throw _buildException(response, data);
+    } on ApiException {
+      rethrow;
+    } catch (e) {
+      throw ApiException('Network error: $e');
+    }
+  }
+
+  /// ينتظر على الخادم (اتصال واحد) حتى تتغير حالة أي طلب في [knownStatuses] ({رقم الطلب: الحالة المعروفة})؛
+  /// يعيد الطلبات المحدثة، أو قائمة فارغة إذا انتهت المهلة بدون تغيير.
+  Future<OrderStatusWait> waitForOrdersStatus(Map<int, String> knownStatuses) async {
+    final orders = knownStatuses.entries.map((entry) => '${entry.key}:${entry.value}').join(',');
+    final url = Uri.parse('$baseUrl/api/orders/wait/').replace(queryParameters: {'orders': orders});
+
+    try {
+      final response = await http.get(url, headers: await _headers(authRequired: true));
+      final data = _decodeBody(response);
+
+      if (response.statusCode == 200 && data is Map<String, dynamic>) {
+        final retryAfter = int.tryParse(response.headers['retry-after'] ?? '');
+        return OrderStatusWait(
+          changed: (data['orders'] as List?)?.map((item) => OrderModel.fromJson(item)).toList() ?? [],
+          retryAfter: retryAfter == null ? null : Duration(seconds: retryAfter),
+        );
+      }
+
+      throw _buildException(response, data);
+    } on ApiException {
+      rethrow;
+    } catch (e) {
+      throw ApiException('Network error: $e');
+    }
+  }
+
   Future<bool> updateSecondaryPhone(String phone) async {
     final url = Uri.parse('$baseUrl/api/user/secondary-phone/');
 
@@ -116,16 +116,12 @@ class _HomeScreenState extends State<HomeScreen> {
 
   Future<void> _fetchRealData() async {
     try {
-      try {
-        final userProfile = await _apiService.getUserProfile();
-        setState(() {
-          userName = userProfile.fullName;
-        });
-      } catch (_) {
-        setState(() => userName = "مستخدم");
-      }
+      // طلب واحد للشاشة الرئيسية: الملف الشخصي + المقاهي + قائمة المقهى المختار
+      final preferredId = context.read<CollegeProvider>().selectedCollege?.id;
+      final bootstrap = await _apiService.getBootstrap(cafeId: preferredId);
+      setState(() => userName = bootstrap.user?.fullName ?? "مستخدم");
 
-      final cafesData = await _apiService.getCafes();
+      final cafesData = bootstrap.cafes;
       final filtered = cafesData.where((cafe) => _isSupportedCafeName(cafe.name)).toList();
       if (mounted) {
         final provider = context.read<CollegeProvider>();
@@ -142,7 +138,9 @@ class _HomeScreenState extends State<HomeScreen> {
         });
       }
 
-      if (selectedCafeId != null) {
+      if (selectedCafeId != null && selectedCafeId == bootstrap.cafeId) {
+        _showProducts(selectedCafeId, bootstrap.products);
+      } else if (selectedCafeId != null) {
         await _fetchProductsForCafe(selectedCafeId);
       } else if (mounted) {
         setState(() => isLoading = false);
@@ -156,23 +154,27 @@ class _HomeScreenState extends State<HomeScreen> {
   Future<void> _fetchProductsForCafe(String? cafeId) async {
     try {
       final productsData = await _apiService.getProducts(cafeId: cafeId);
-      final normalizedCafeId = (cafeId ?? '').toString();
-      final filtered = normalizedCafeId.isEmpty
-          ? productsData
-          : productsData.where((p) => p.cafeId == normalizedCafeId).toList();
-      if (mounted) {
-        setState(() {
-          allProducts = filtered.isNotEmpty ? filtered : productsData;
-          displayedProducts = _applyFilters();
-          isLoading = false;
-        });
-      }
+      _showProducts(cafeId, productsData);
     } catch (e) {
       debugPrint("Error: $e");
       if (mounted) setState(() => isLoading = false);
     }
   }
 
+  void _showProducts(String? cafeId, List<ProductModel> productsData) {
+    final normalizedCafeId = (cafeId ?? '').toString();
+    final filtered = normalizedCafeId.isEmpty
+        ? productsData
+        : productsData.where((p) => p.cafeId == normalizedCafeId).toList();
+    if (mounted) {
+      setState(() {
+        allProducts = filtered.isNotEmpty ? filtered : productsData;
+        displayedProducts = _applyFilters();
+        isLoading = false;
+      });
+    }
+  }
+
   void _handleCollegeSelection() {
     final selected = _collegeProvider?.selectedCollege;
     if (selected == null || selectedCafeId == selected.id) {
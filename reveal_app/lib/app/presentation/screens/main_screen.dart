@@ -37,6 +37,8 @@ class _MainScreenState extends State<MainScreen> with SingleTickerProviderStateM
   late final Animation<double> _bellPulse;
   Timer? _notificationTimer;
   bool _isRefreshingNotifications = false;
+  // مؤشر آخر مزامنة للطلبات؛ الاستعلام الدوري يجلب ما تغير بعده فقط
+  String? _ordersSyncCursor;
 
   @override
   void initState() {
@@ -159,11 +161,19 @@ class _MainScreenState extends State<MainScreen> with SingleTickerProviderStateM
 
     try {
       final api = ApiService();
-      final orders = await api.getOrders();
+      var changes = await api.getOrderChanges(since: _ordersSyncCursor);
+      final orders = [...changes.changed];
+      while (changes.hasMore && changes.cursor != null) {
+        changes = await api.getOrderChanges(since: changes.cursor);
+        orders.addAll(changes.changed);
+      }
       if (!mounted) {
         return;
       }
-      await provider.refreshFromOrders(orders);
+      _ordersSyncCursor = changes.cursor ?? _ordersSyncCursor;
+      if (orders.isNotEmpty) {
+        await provider.refreshFromOrders(orders);
+      }
     } catch (_) {
       // ignore polling errors
     } finally {
@@ -19,6 +19,9 @@ class OrdersScreen extends StatefulWidget {
 class _OrdersScreenState extends State<OrdersScreen> {
   bool isLoading = true;
   List<OrderModel> myOrders = [];
+  // long-poll واحد للشاشة كلها ينتظر كل الطلبات النشطة
+  bool _watching = false;
+  bool _disposed = false;
 
   final Color tealColor = const Color(0xFF009688);
   final Color orangeColor = const Color(0xFFFF5722);
@@ -48,6 +51,7 @@ class _OrdersScreenState extends State<OrdersScreen> {
           isLoading = false;
         });
         await context.read<NotificationProvider>().refreshFromOrders(orders);
+        _watchOrders();
       }
     } catch (e) {
       debugPrint("Error fetching orders: $e");
@@ -55,6 +59,55 @@ class _OrdersScreenState extends State<OrdersScreen> {
     }
   }
 
+  @override
+  void dispose() {
+    _disposed = true;
+    super.dispose();
+  }
+
+  bool _isActive(String status) {
+    final upper = status.toUpperCase();
+    return upper != 'COMPLETED' && upper != 'CANCELLED';
+  }
+
+  Future<void> _watchOrders() async {
+    if (_watching) {
+      // الانتظار الجاري يقرأ myOrders من جديد في دورته التالية
+      return;
+    }
+    _watching = true;
+    final apiService = ApiService();
+    try {
+      while (!_disposed) {
+        final known = {
+          for (final o in myOrders)
+            if (_isActive(o.status)) o.id: o.status,
+        };
+        if (known.isEmpty) {
+          break;
+        }
+        final result = await apiService.waitForOrdersStatus(known);
+        if (_disposed || !mounted) {
+          break;
+        }
+        if (result.changed.isNotEmpty) {
+          final updated = {for (final o in result.changed) o.id: o};
+          setState(() {
+            myOrders = [for (final o in myOrders) updated[o.id] ?? o];
+          });
+          await context.read<NotificationProvider>().refreshFromOrders(result.changed);
+        }
+        if (result.retryAfter != null) {
+          await Future.delayed(result.retryAfter!);
+        }
+      }
+    } catch (e) {
+      debugPrint("Error waiting for order status: $e");
+    } finally {
+      _watching = false;
+    }
+  }
+
   Map<String, dynamic> getStatusStyle(String status) {
     switch (status.toUpperCase()) {
       case 'SUCCESS':
@@ -1,5 +1,6 @@
 ﻿from pathlib import Path
 import os
+import tempfile
 from decouple import config
 import firebase_admin
 from firebase_admin import credentials, firestore
@@ -104,6 +105,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # --- إعدادات CORS ---
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
+CORS_EXPOSE_HEADERS = ['ETag', 'X-Next-Cursor', 'X-Sync-Cursor']
 
 # --- إعدادات REST Framework ---
 REST_FRAMEWORK = {
@@ -117,12 +119,50 @@ REST_FRAMEWORK = {
 }
 
 # --- التخزين المؤقت ---
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
+# locmem: لكل عامل (worker) نسخته الخاصة، مناسب للتطوير فقط.
+# redis: الخيار المطلوب لعدة عمال/خوادم؛ add و incr ذريّة فيه، وعليها يعتمد قفل get_or_compute
+#   وعدّادات الإصدارات وأحداث لوحة الطلبات. CACHE_LOCATION مثل redis://127.0.0.1:6379/1
+# file: مشترك بين العمال لكن بدون أي قفل بينهم (add و incr ليست ذريّة عبر العمليات)،
+#   فقد يحسب أكثر من عامل نفس المفتاح وقد يتكرر رقم حدث؛ يصلح لخادم صغير فقط.
+CACHE_BACKEND = config('CACHE_BACKEND', default='locmem')
+CACHE_LOCATION = config('CACHE_LOCATION', default='')
+
+if CACHE_BACKEND == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_LOCATION or 'redis://127.0.0.1:6379/1',
+            'KEY_PREFIX': 'reveal',
+        }
     }
-}
+elif CACHE_BACKEND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': CACHE_LOCATION or os.path.join(tempfile.gettempdir(), 'reveal_cache'),
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'unique-snowflake',
+        }
+    }
+
+# التحديث المباشر للطلبات (بث SSE للوحة و long-poll للتطبيق) يعتمد على كاش مشترك بين العمال،
+# ومع locmem لا يرى العامل أحداث غيره. لذلك يُفعّل افتراضياً مع redis فقط، وبدونه تعود اللوحة
+# والتطبيق للاستعلام الدوري. كل اتصال مفتوح يمسك عاملاً، فيحتاج عمالاً بخيوط (gunicorn --threads أو gevent).
+LIVE_ORDER_UPDATES = config('LIVE_ORDER_UPDATES', default=CACHE_BACKEND == 'redis', cast=bool)
+
+# تسخين الكاش بعد تشغيل الخادم (بدلاً من أن تدفع أول الطلبات ثمن الكاش البارد)
+# يُضبط في بيئة أمر الخادم فقط وليس في .env، وإلا سخّنت كل عملية تحمّل Django
+# (migrate، الاختبارات، السكربتات...). مثال: WARM_CACHES_ON_START=1 gunicorn config.wsgi
+WARM_CACHES_ON_START = config('WARM_CACHES_ON_START', default=False, cast=bool)
+WARM_CACHES_HOST = config('WARM_CACHES_HOST', default='localhost')
+WARM_CACHES_HTTPS = config('WARM_CACHES_HTTPS', default=False, cast=bool)
+WARM_CACHES_DELAY = config('WARM_CACHES_DELAY', default=2.0, cast=float)
 
 # --- إعدادات Firebase ---
 FIREBASE_CREDS_PATH = config('FIREBASE_CREDENTIALS_PATH', default=str(BASE_DIR / 'config' / 'serviceAccountKey.json'))
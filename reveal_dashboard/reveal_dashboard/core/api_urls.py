@@ -12,13 +12,24 @@ urlpatterns = [
     path('user/', api_views.get_user_profile, name='api_user_profile'),
     path('user/secondary-phone/', api_views.update_secondary_phone, name='api_user_secondary_phone'),
 
+    # --- شاشة البداية (طلب واحد) ---
+    path('bootstrap/', api_views.get_bootstrap, name='api_bootstrap'),
+
+    # --- عدة طلبات GET في رحلة واحدة ---
+    path('batch/', api_views.batch_view, name='api_batch'),
+
     # --- البيانات الأساسية (Cafes & Products) ---
     path('cafes/', api_views.get_cafes_list, name='api_cafes'),
     path('products/', api_views.get_products, name='api_products'),
+    path('products/changes/', api_views.get_product_changes, name='api_product_changes'),
+    path('products/search/', api_views.search_products_view, name='api_product_search'),
 
     # --- الطلبات (Orders) ---
     path('orders/', api_views.orders_endpoint, name='api_orders'),
     path('orders/create/', api_views.create_order, name='api_create_order'),
+    path('orders/quote/', api_views.quote_order_view, name='api_quote_order'),
+    path('orders/wait/', api_views.wait_orders_status, name='api_wait_orders_status'),
+    path('orders/<int:order_id>/wait/', api_views.wait_order_status, name='api_wait_order_status'),
 
     # --- المحفظة (Wallet) ---
     path('wallet/', include('wallet.api_urls')),
@@ -2,79 +2,230 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from decimal import Decimal
+import io
 import re
-from django.db import transaction
 from django.db.models import Q
-from django.core.cache import cache
 from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.http import HttpResponse, HttpResponseNotModified
+from django.urls import Resolver404, resolve
+from django.utils.http import parse_etags
+from rest_framework.renderers import JSONRenderer
 
 # ✅ استدعاءات صحيحة (مودلز جانغو فقط)
-from .models import Product, Order, OrderItem, Cafe
-from wallet.models import Wallet, Transaction
-from .serializers import ProductSerializer, OrderSerializer, CafeSerializer, UserSerializer
+from .models import Cafe, Order
+from wallet.models import Wallet
+from wallet.serializers import WalletSummarySerializer
+from .serializers import CategorySerializer, ProductSerializer, OrderSerializer, UserSerializer
 from users.models import User
 from .utils import send_real_notification, normalize_libyan_phone
+from .catalog import (
+    DELTA_PAGE_SIZE,
+    SHAPE_FULL,
+    SHAPE_LITE,
+    get_cafes_etag,
+    get_cafes_payload,
+    get_categories_for_cafe,
+    get_products_etag,
+    get_products_payload,
+    load_product_changes,
+)
+from .idempotency import idempotent
+from .order_events import (
+    WAIT_DEFAULT_SECONDS,
+    WAIT_FALLBACK_SECONDS,
+    WAIT_MAX_ORDERS,
+    remember_order_status,
+    wait_for_order_status,
+    wait_for_order_statuses,
+)
+from .orders import (
+    ORDER_CHANGES_PAGE_SIZE,
+    OrderError,
+    get_orders_sync_cursor,
+    load_order_changes,
+    place_order,
+    quote_order,
+    user_orders_queryset,
+)
+from .pagination import MAX_PAGE_SIZE, SYNC_CURSOR_HEADER, get_page_params, paginate_queryset, with_next_cursor
+from .search import SEARCH_LIMIT, search_products
+
+PRODUCTS_PAGE_SIZE = 100
+
+# --- /api/batch/ ---
+MAX_BATCH_REQUESTS = 10
+BATCH_FORWARDED_HEADERS = ('ETag', 'X-Next-Cursor')
+# مسارات تحجز العامل طويلاً (long-poll) أو لا معنى لها داخل batch
+BATCH_EXCLUDED_URL_NAMES = ('api_batch', 'api_wait_order_status', 'api_wait_orders_status')
 
 # ❌ تم حذف استدعاء payment_service_OLD لأنه يسبب تضارباً
 # ❌ تم حذف firebase_admin لأننا نعتمد على توكن جانغو
 
-# --- Caching Setup (ممتاز، أبقينا عليه) ---
-PRODUCTS_CACHE_KEY = "products:list:v2"
-PRODUCTS_TTL = 1800  # 30 دقيقة
+def _json_bytes(value):
+    # JSONRenderer يعيد b'' للقيمة None
+    return b'null' if value is None else JSONRenderer().render(value)
 
-def get_products_cached():
-    cached = cache.get(PRODUCTS_CACHE_KEY)
-    if cached:
-        return cached
-    # جلب المنتجات من قاعدة بيانات SQL
-    products = list(Product.objects.select_related('cafe', 'category').order_by('-created_at'))
-    cache.set(PRODUCTS_CACHE_KEY, products, PRODUCTS_TTL)
-    return products
 
-def invalidate_products_cache():
-    cache.delete(PRODUCTS_CACHE_KEY)
+def _catalog_response(request, etag, get_payload):
+    """
+    GET شرطي: إذا كانت نسخة العميل (If-None-Match) مطابقة للإصدار الحالي نرد 304
+    دون استدعاء get_payload، أي دون قاعدة بيانات أو Serializer.
+    get_payload تعيد (body, next_cursor).
+    """
+    client_etags = [tag[2:] if tag.startswith('W/') else tag
+                    for tag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))]
+    if etag in client_etags or '*' in client_etags:
+        response = HttpResponseNotModified()
+    else:
+        body, next_cursor = get_payload()
+        response = with_next_cursor(HttpResponse(body, content_type='application/json'), next_cursor)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'
+    return response
 
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_cafes_list(request):
-    cafes = Cafe.objects.filter(is_active=True).order_by('name')
-    serializer = CafeSerializer(cafes, many=True, context={'request': request})
-    return Response(serializer.data)
+    return _catalog_response(request, get_cafes_etag(request), lambda: (get_cafes_payload(request), None))
 
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_products(request):
     cafe_id = request.GET.get('cafe_id')
-    
-    # 1. جلب المنتجات (سواء من الكاش أو الداتابيز)
+    category_id = request.GET.get('category_id')
+    category_name = request.GET.get('category') or request.GET.get('category_name')
+    available_only = request.GET.get('available')
+
+    # معرفات غير رقمية لا يمكن أن تطابق أي منتج
+    if (cafe_id and not str(cafe_id).isdigit()) or (category_id and not str(category_id).isdigit()):
+        return Response([])
+
+    try:
+        position, limit = get_page_params(request, default_limit=PRODUCTS_PAGE_SIZE)
+    except ValueError:
+        return Response({'error': 'Invalid cursor'}, status=400)
+    if not request.GET.get('cursor') and not request.GET.get('limit'):
+        # بدون ?cursor= أو ?limit= نعيد القائمة كاملة كما كانت (نسخ التطبيق لا تتبع X-Next-Cursor)
+        limit = None
+
+    # ?shape=lite: معرفات المقهى/الفئة فقط مع قاموس جانبي للمقاهي والفئات
+    shape = SHAPE_LITE if request.GET.get('shape') == SHAPE_LITE else SHAPE_FULL
+
+    # جسم الاستجابة الجاهز من الكاش (لكل مقهى/فئة/حالة توفر)
     # ملاحظة: إذا لم يحدد cafe_id نرسل الكل أو فارغ حسب سياستك
-    all_products = get_products_cached()
-    
+    catalog_filters = {
+        'cafe_id': int(cafe_id) if cafe_id else None,
+        'category_id': int(category_id) if category_id else None,
+        'category_name': category_name,
+        'available_only': bool(available_only and str(available_only).lower() in ['1', 'true', 'yes']),
+        'position': position,
+        'limit': limit,
+        'shape': shape,
+    }
+    return _catalog_response(
+        request,
+        get_products_etag(request, **catalog_filters),
+        lambda: get_products_payload(request, **catalog_filters),
+    )
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_bootstrap(request):
+    """
+    كل ما تحتاجه الشاشة الرئيسية في طلب واحد: الملف الشخصي، رصيد المحفظة، المقاهي،
+    فئات المقهى المختار ومنتجاته (?cafe_id=، وإلا أول مقهى نشط).
+    أجزاء الكتالوج تُدمج كما هي من الكاش (JSON جاهز) دون إعادة Serializer.
+    """
+    cafe_id = request.GET.get('cafe_id')
+    if cafe_id and not str(cafe_id).isdigit():
+        return Response({'error': 'Invalid cafe_id'}, status=400)
     if cafe_id:
-        products = [p for p in all_products if str(p.cafe_id) == str(cafe_id)]
+        cafe_id = int(cafe_id)
     else:
-        products = all_products # أو [] إذا أردت إجبار اختيار المقهى
+        cafe_id = Cafe.objects.filter(is_active=True).order_by('name').values_list('id', flat=True).first()
 
-    # 2. التصفية (Filtering)
-    category_id = request.GET.get('category_id')
-    category_name = request.GET.get('category') or request.GET.get('category_name')
-    available_only = request.GET.get('available')
+    user = request.user if request.user.is_authenticated else None
+    profile = wallet = None
+    if user:
+        profile = UserSerializer(user).data
+        wallet_obj, _ = Wallet.objects.get_or_create(user=user)
+        wallet = WalletSummarySerializer(wallet_obj).data
 
-    if category_id:
-        products = [p for p in products if str(p.category_id) == str(category_id)]
-    elif category_name:
-        products = [p for p in products if p.category.name.lower() == category_name.lower()]
+    products_body, products_cursor = b'[]', None
+    categories = []
+    if cafe_id:
+        products_body, products_cursor = get_products_payload(request, cafe_id=cafe_id)
+        categories = CategorySerializer(get_categories_for_cafe(cafe_id), many=True).data
+
+    body = b''.join([
+        b'{"user":', _json_bytes(profile),
+        b',"wallet":', _json_bytes(wallet),
+        b',"cafes":', get_cafes_payload(request),
+        b',"cafe_id":', _json_bytes(cafe_id),
+        b',"categories":', _json_bytes(categories),
+        b',"products":', products_body,
+        b',"products_next_cursor":', _json_bytes(products_cursor),
+        b'}',
+    ])
+    response = HttpResponse(body, content_type='application/json')
+    response['Cache-Control'] = 'private, no-cache'
+    return response
 
-    if available_only and str(available_only).lower() in ['1', 'true', 'yes']:
-        products = [p for p in products if p.is_available]
 
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_product_changes(request):
+    """
+    المزامنة التزايدية: المنتجات التي أضيفت أو عدلت أو حذفت منذ ?since=<cursor>.
+    """
+    cafe_id = request.GET.get('cafe_id')
+    limit = request.GET.get('limit') or DELTA_PAGE_SIZE
+
+    if (cafe_id and not str(cafe_id).isdigit()) or not str(limit).isdigit():
+        return Response({'error': 'Invalid parameters'}, status=400)
+
+    try:
+        changed, deleted, cursor, has_more = load_product_changes(
+            since=request.GET.get('since') or None,
+            cafe_id=int(cafe_id) if cafe_id else None,
+            limit=int(limit),
+        )
+    except ValueError:
+        return Response({'error': 'Invalid cursor'}, status=400)
+
+    serializer = ProductSerializer(changed, many=True, context={'request': request})
+    return Response({
+        'changed': serializer.data,
+        'deleted': deleted,
+        'cursor': cursor,
+        'has_more': has_more,
+    })
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def search_products_view(request):
+    """
+    البحث في المنتجات بالاسم/الوصف/الفئة: /api/products/search/?q=&cafe_id=
+    """
+    query = (request.GET.get('q') or '').strip()
+    cafe_id = request.GET.get('cafe_id')
+    limit = request.GET.get('limit') or SEARCH_LIMIT
+
+    if (cafe_id and not str(cafe_id).isdigit()) or not str(limit).isdigit():
+        return Response({'error': 'Invalid parameters'}, status=400)
+    if not query:
+        return Response([])
+
+    products = search_products(query, cafe_id=int(cafe_id) if cafe_id else None, limit=int(limit))
     serializer = ProductSerializer(products, many=True, context={'request': request})
     return Response(serializer.data)
 
 
-
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def update_secondary_phone(request):
@@ -131,98 +282,84 @@ def get_user_profile(request):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent()
 def create_order(request):
     """
     ????? ????? ?? ??? ????? ??? ??????? ?? ???.
     """
+    if not isinstance(request.data, dict):
+        return Response({'error': 'Invalid request body'}, status=400)
     user = request.user
     total_price_raw = request.data.get('total_price')
     items_data = request.data.get('items')
     payment_method = 'WALLET'
 
-    if total_price_raw is None or not items_data:
+    if not items_data:
         return Response({'error': '???? ????? ????? ?????????.'}, status=400)
 
     if len(items_data) == 0:
         return Response({'error': '????? ?????.'}, status=400)
 
-    try:
-        total_price = Decimal(str(total_price_raw))
-    except Exception:
-        return Response({'error': 'Invalid total_price'}, status=400)
-
-    try:
-        with transaction.atomic():
-            product_ids = [item.get('product_id') for item in items_data]
-            products = list(Product.objects.filter(id__in=product_ids).select_related('cafe'))
-
-            if len(products) != len(set(product_ids)):
-                return Response({'error': '???? ??? ?????.'}, status=400)
-
-            cafes = {p.cafe_id for p in products}
-            if len(cafes) != 1:
-                return Response({'error': '??? ?? ???? ???? ???????? ?? ??? ??????.'}, status=400)
-            target_cafe_id = cafes.pop()
-
-            if payment_method == 'WALLET':
-                try:
-                    wallet = Wallet.objects.select_for_update().get(user=user)
-                except Wallet.DoesNotExist:
-                    return Response({'error': '??????? ??? ??????.'}, status=404)
-
-                if wallet.balance < total_price:
-                    return Response({'error': '???? ??????? ??? ????.'}, status=400)
-
-                Transaction.objects.create(
-                    wallet=wallet,
-                    amount=total_price,
-                    transaction_type='WITHDRAWAL',
-                    source='APP',
-                    description='??? ????'
-                )
-
-            new_order = Order.objects.create(
-                user=user,
-                cafe_id=target_cafe_id,
-                total_price=total_price,
-                status='PENDING',
-                payment_method=payment_method
-            )
-
-            for item in items_data:
-                product_id = item.get('product_id')
-                qty = item.get('quantity', item.get('qty', 1))
-                product = next((p for p in products if str(p.id) == str(product_id)), None)
-
-                if not product:
-                    return Response({'error': '???? ??? ?????.'}, status=400)
-
-                options = item.get('options') or item.get('note') or ''
-                OrderItem.objects.create(
-                    order=new_order,
-                    product=product,
-                    quantity=qty,
-                    price=product.price,
-                    options=options
-                )
-
+    # الإجمالي يحسبه الخادم؛ إن أرسله التطبيق يُستخدم فقط للتأكد من أن الأسعار لم تتغير
+    total_price = None
+    if total_price_raw not in (None, ''):
         try:
-            send_real_notification(user, "?? ?????? ????", f"???? #{new_order.order_number} ??? ????????.")
+            total_price = Decimal(str(total_price_raw))
         except Exception:
-            pass
-
-        return Response({'message': '?? ????? ????? ?????', 'order_id': new_order.id}, status=201)
+            return Response({'error': 'Invalid total_price'}, status=400)
 
+    try:
+        new_order = place_order(user, items_data, total_price, payment_method)
+    except OrderError as exc:
+        return Response(exc.as_response_data(), status=exc.status)
     except Exception as e:
         print(f"Order Error: {e}")
-        return Response({'error': '??? ??? ????? ????? ?????.'}, status=500)
+        return Response({'error': 'حدث خطأ أثناء إنشاء الطلب.'}, status=500)
+
+    try:
+        send_real_notification(user, "تم استلام طلبك", f"طلبك #{new_order.order_number} قيد المراجعة.")
+    except Exception:
+        pass
+
+    return Response({'message': 'تم إرسال الطلب بنجاح', 'order_id': new_order.id, 'total_price': new_order.total_price}, status=201)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_user_orders(request):
-    orders = Order.objects.filter(user=request.user).order_by('-created_at')
-    serializer = OrderSerializer(orders, many=True)
-    return Response(serializer.data)
+    """
+    سجل طلبات المستخدم، مقسّم لصفحات عند إرسال ?cursor= أو ?limit=.
+    مع ?since=<cursor> تعيد فقط الطلبات التي أُنشئت أو تغيرت حالتها بعده (للتحديث الدوري الخفيف).
+    """
+    since = request.GET.get('since')
+    if since:
+        limit = request.GET.get('limit') or ORDER_CHANGES_PAGE_SIZE
+        if not str(limit).isdigit() or int(limit) < 1:
+            return Response({'error': 'Invalid parameters'}, status=400)
+        try:
+            changed, cursor, has_more = load_order_changes(request.user, since, min(int(limit), MAX_PAGE_SIZE))
+        except ValueError:
+            return Response({'error': 'Invalid cursor'}, status=400)
+        return Response({
+            'changed': OrderSerializer(changed, many=True).data,
+            'cursor': cursor,
+            'has_more': has_more,
+        })
+
+    try:
+        position, limit = get_page_params(request)
+    except ValueError:
+        return Response({'error': 'Invalid cursor'}, status=400)
+
+    if not request.GET.get('cursor') and not request.GET.get('limit'):
+        # بدون ?cursor= أو ?limit= نعيد السجل كاملاً كما كان (نسخ التطبيق لا تتبع X-Next-Cursor)
+        orders, next_cursor = user_orders_queryset(request.user).order_by('-created_at', '-pk'), None
+    else:
+        orders, next_cursor = paginate_queryset(user_orders_queryset(request.user), position, limit)
+    response = with_next_cursor(Response(OrderSerializer(orders, many=True).data), next_cursor)
+    if position is None:
+        # نقطة البداية لمزامنة ?since= التالية
+        response[SYNC_CURSOR_HEADER] = get_orders_sync_cursor(request.user)
+    return response
 
 
 @api_view(['GET', 'POST'])
@@ -236,4 +373,191 @@ def orders_endpoint(request):
         return get_user_orders(request._request)
     return create_order(request._request)
 
+
+def _wait_timeout(raw_timeout):
+    # مع locmem لا يرى هذا العامل أحداث العمال الآخرين، فلا فائدة من الإمساك بالطلب
+    return int(raw_timeout) if settings.LIVE_ORDER_UPDATES else 0
+
+
+def _wait_response(data):
+    response = Response(data)
+    if not settings.LIVE_ORDER_UPDATES:
+        response['Retry-After'] = str(WAIT_FALLBACK_SECONDS)
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def wait_order_status(request, order_id):
+    """
+    Long-poll: ?status=<الحالة المعروفة لدى التطبيق>&timeout=<ثوان>
+    تُمسك الطلب حتى تتغير حالة الطلب أو تنتهي المهلة (changed=false)، ثم يعيد التطبيق الاستعلام.
+    بدون كاش مشترك تعود فوراً مع Retry-After (استعلام دوري عادي).
+    """
+    known_status = request.GET.get('status', '').upper()
+    raw_timeout = request.GET.get('timeout') or WAIT_DEFAULT_SECONDS
+    if known_status not in dict(Order.STATUS_CHOICES) or not str(raw_timeout).isdigit():
+        return Response({'error': 'Invalid parameters'}, status=400)
+
+    current_status = Order.objects.filter(id=order_id, user=request.user).values_list('status', flat=True).first()
+    if current_status is None:
+        return Response({'error': 'Order not found'}, status=404)
+
+    status = wait_for_order_status(order_id, current_status, known_status, _wait_timeout(raw_timeout))
+    if status is None:
+        return _wait_response({'changed': False, 'status': known_status})
+
+    order = user_orders_queryset(request.user).filter(id=order_id).first()
+    if order is None:
+        return Response({'error': 'Order not found'}, status=404)
+    if order.status == known_status:
+        # الكاش يحمل حالة لا تطابق قاعدة البيانات: نصححها حتى ينتظر الاستعلام التالي فعلاً بدل أن يعود فوراً
+        remember_order_status(order_id, order.status)
+        return _wait_response({'changed': False, 'status': known_status})
+    return _wait_response({'changed': True, 'status': order.status, 'order': OrderSerializer(order).data})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def wait_orders_status(request):
+    """
+    Long-poll واحد لكل طلبات المستخدم النشطة: ?orders=<id>:<الحالة>,<id>:<الحالة>&timeout=<ثوان>
+    يعيد {"orders": [...]} بالطلبات التي تغيرت حالتها، أو قائمة فارغة بعد المهلة.
+    الطلبات غير الموجودة أو الخاصة بمستخدم آخر تُتجاهل.
+    """
+    raw_timeout = request.GET.get('timeout') or WAIT_DEFAULT_SECONDS
+    statuses = dict(Order.STATUS_CHOICES)
+    known_statuses = {}
+    for pair in request.GET.get('orders', '').split(','):
+        order_id, _, status = pair.partition(':')
+        if not order_id.isdigit() or status.upper() not in statuses:
+            return Response({'error': 'Invalid parameters'}, status=400)
+        known_statuses[int(order_id)] = status.upper()
+    if len(known_statuses) > WAIT_MAX_ORDERS or not str(raw_timeout).isdigit():
+        return Response({'error': 'Invalid parameters'}, status=400)
+
+    current_statuses = dict(
+        Order.objects.filter(id__in=known_statuses, user=request.user).values_list('id', 'status')
+    )
+    known_statuses = {order_id: known_statuses[order_id] for order_id in current_statuses}
+    changed = wait_for_order_statuses(known_statuses, current_statuses, _wait_timeout(raw_timeout))
+    if not changed:
+        return _wait_response({'orders': []})
+
+    orders = []
+    for order in user_orders_queryset(request.user).filter(id__in=changed):
+        if order.status == known_statuses[order.id]:
+            remember_order_status(order.id, order.status)
+        else:
+            orders.append(order)
+    return _wait_response({'orders': OrderSerializer(orders, many=True).data})
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def quote_order_view(request):
+    """
+    التحقق من السلة وحساب الإجمالي بالأسعار الحالية قبل تأكيد الطلب.
+    لا تلمس قاعدة البيانات عندما يُرسل cafe_id وجدول أسعار مقهاه في الكاش.
+    """
+    if not isinstance(request.data, dict):
+        return Response({'error': 'Invalid request body'}, status=400)
+    cafe_id = request.data.get('cafe_id') or None
+    if cafe_id is not None:
+        try:
+            cafe_id = int(cafe_id)
+        except (TypeError, ValueError):
+            return Response({'error': 'Invalid cafe_id'}, status=400)
+    try:
+        quote = quote_order(request.data.get('items'), cafe_id)
+    except OrderError as exc:
+        return Response(exc.as_response_data(), status=exc.status)
+    return Response(quote)
+
 # ❌ تم حذف api_purchase نهائياً لأنه يعتمد على Firebase
+
+
+def _run_sub_request(request, spec):
+    """
+    تنفيذ طلب GET داخلي واحد عبر الـ URLconf بنفس المستخدم الذي تمت مصادقته في طلب الـ batch.
+    تعيد JSON جاهزاً (bytes) لعنصر واحد من الاستجابة.
+    """
+    if isinstance(spec, str):
+        spec = {'path': spec}
+    if not isinstance(spec, dict):
+        spec = {}
+    requested = str(spec.get('path') or '')
+    path, _, query = requested.partition('?')
+
+    if not path.startswith('/api/'):
+        return _json_bytes({'path': requested, 'status': 400, 'body': {'error': 'Only /api/ GET paths are allowed.'}})
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return _json_bytes({'path': requested, 'status': 404, 'body': {'error': 'Not found.'}})
+    if match.url_name in BATCH_EXCLUDED_URL_NAMES:
+        return _json_bytes({'path': requested, 'status': 400, 'body': {'error': 'This path is not allowed in a batch.'}})
+
+    environ = {key: value for key, value in request.META.items() if key not in ('CONTENT_TYPE', 'CONTENT_LENGTH')}
+    environ.pop('HTTP_IF_NONE_MATCH', None)
+    environ.update({
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'wsgi.input': io.BytesIO(b''),
+    })
+    if spec.get('etag'):
+        environ['HTTP_IF_NONE_MATCH'] = str(spec['etag'])
+
+    sub_request = WSGIRequest(environ)
+    # مصادقة واحدة: نمرر المستخدم والتوكن كما هما بدلاً من إعادة التحقق لكل طلب فرعي
+    sub_request.user = request.user
+    if request.user.is_authenticated:
+        sub_request._force_auth_user = request.user
+        sub_request._force_auth_token = request.auth
+
+    try:
+        response = match.func(sub_request, *match.args, **match.kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+    except Exception as exc:
+        print(f"⚠️ Batch sub-request {path} failed: {exc}")
+        return _json_bytes({'path': requested, 'status': 500, 'body': {'error': 'Internal error.'}})
+    if response.streaming:
+        response.close()
+        return _json_bytes({'path': requested, 'status': 400, 'body': {'error': 'Streaming responses are not allowed in a batch.'}})
+
+    headers = {name: response[name] for name in BATCH_FORWARDED_HEADERS if response.has_header(name)}
+    content = response.content
+    if not content:
+        body = b'null'
+    elif response.get('Content-Type', '').startswith('application/json'):
+        body = content
+    else:
+        body = _json_bytes(content.decode('utf-8', errors='replace'))
+
+    return b''.join([
+        b'{"path":', _json_bytes(requested),
+        b',"status":', _json_bytes(response.status_code),
+        b',"headers":', _json_bytes(headers),
+        b',"body":', body,
+        b'}',
+    ])
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def batch_view(request):
+    """
+    تنفيذ عدة طلبات GET داخلية في رحلة واحدة:
+    {"requests": ["/api/user/", {"path": "/api/products/?cafe_id=1", "etag": "..."}]}
+    النتائج بنفس الترتيب، وكل طلب فرعي يطبق صلاحياته الخاصة (401/404...).
+    """
+    specs = request.data.get('requests') if isinstance(request.data, dict) else request.data
+    if not isinstance(specs, list) or not specs:
+        return Response({'error': 'requests must be a non-empty list.'}, status=400)
+    if len(specs) > MAX_BATCH_REQUESTS:
+        return Response({'error': f'At most {MAX_BATCH_REQUESTS} requests per batch.'}, status=400)
+
+    results = [_run_sub_request(request, spec) for spec in specs]
+    body = b'{"responses":[' + b','.join(results) + b']}'
+    return HttpResponse(body, content_type='application/json')
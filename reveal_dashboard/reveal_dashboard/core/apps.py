@@ -1,4 +1,7 @@
+import threading
+
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class CoreConfig(AppConfig):
@@ -9,3 +12,23 @@ class CoreConfig(AppConfig):
         # تحميل الإشارات وتهيئة Firebase عند توفر الاعتمادات
         import core.firebase_config  # noqa: F401
         import core.signals  # noqa: F401
+
+        # التسخين يُفعّل صراحة لعملية الخادم فقط (WARM_CACHES_ON_START=1 في بيئة أمر التشغيل)
+        if settings.WARM_CACHES_ON_START:
+            self._schedule_cache_warmup()
+
+    @staticmethod
+    def _schedule_cache_warmup():
+        def warm():
+            from django.core.management import call_command
+            from django.db import connection
+            try:
+                call_command('warm_caches', host=settings.WARM_CACHES_HOST, https=settings.WARM_CACHES_HTTPS)
+            except Exception as exc:
+                print(f"⚠️ Cache warm-up failed: {exc}")
+            finally:
+                connection.close()
+
+        timer = threading.Timer(settings.WARM_CACHES_DELAY, warm)
+        timer.daemon = True
+        timer.start()
@@ -0,0 +1,450 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from .models import Cafe, Category, Product, ProductTombstone, SystemSettings
+from .pagination import keyset_after, paginate_list
+from .serializers import CafeSerializer, CategorySerializer, ProductLiteSerializer, ProductSerializer
+from .utils import decode_cursor, encode_cursor
+
+# --- كاش الكتالوج مقسّم حسب المقهى ---
+# كل مقهى له عدّاد إصدار خاص به، وتعديل منتج في مقهى يرفع عدّاد ذلك المقهى فقط.
+# العدّاد العام (generation) يُرفع عند تغيير يمس كل المقاهي (مثل تعديل اسم فئة).
+PRODUCTS_TTL = 1800  # 30 دقيقة
+VERSION_TTL = None  # عدّادات الإصدار لا تنتهي صلاحيتها
+
+GENERATION_KEY = "catalog:gen"
+CAFE_VERSION_KEY = "catalog:ver:{cafe_id}"
+PRODUCTS_KEY = "products:index:g{gen}:c{cafe_id}:v{version}"
+PAYLOAD_KEY = "products:json:g{gen}:c{cafe_id}:v{version}:{variant}"
+CATEGORIES_KEY = "categories:g{gen}:c{cafe_id}:v{version}"
+PRICES_KEY = "prices:g{gen}:c{cafe_id}:v{version}"
+CAFES_VERSION_KEY = "catalog:cafes:ver"
+CAFES_PAYLOAD_KEY = "cafes:json:v{version}:{variant}"
+SYSTEM_SETTINGS_VERSION_KEY = "settings:ver"
+SYSTEM_SETTINGS_KEY = "settings:system:v{version}"
+
+ALL_CAFES = 'all'
+
+DEFAULT_CATEGORY_NAMES = ['برغر', 'بيتزا', 'حلويات', 'مشروبات', 'قهوة']
+
+SHAPE_FULL = 'full'
+SHAPE_LITE = 'lite'
+
+# حماية من تدافع الطلبات (stampede): عامل واحد فقط يعيد حساب المفتاح
+# (القفل يعتمد على cache.add، وهي ذريّة بين العمليات في redis فقط وليس في file)
+LOCK_KEY = "lock:{key}"
+LOCK_TTL = 30
+LOCK_WAIT = 5  # ثوانٍ ينتظرها الطلب على مفتاح بارد قبل أن يحسبه بنفسه
+LOCK_POLL_INTERVAL = 0.05
+STALE_GRACE = 300  # مدة بقاء القيمة القديمة بعد انتهاء صلاحيتها لتُخدم أثناء إعادة الحساب
+
+DELTA_PAGE_SIZE = 200
+DELTA_MAX_PAGE_SIZE = 500
+
+
+def _version_seed():
+    # العدّاد يبدأ من الوقت الحالي (بالميكروثانية) وليس من 1: بعد إعادة تشغيل الخادم أو حذف المفتاح من الكاش
+    # لا يعود لقيمة سبق أن ظهرت في ETag عند عميل ما، فلا يحصل على 304 لمحتوى مختلف.
+    return time.time_ns() // 1000
+
+
+def bump_version(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # المفتاح غير موجود (كاش بارد أو تم مسحه)
+        version = _version_seed()
+        cache.set(key, version, VERSION_TTL)
+        return version
+
+
+def get_version(key):
+    cache.add(key, _version_seed(), VERSION_TTL)
+    version = cache.get(key)
+    if version is None:
+        # حُذف بين add و get
+        return bump_version(key)
+    return version
+
+
+def _store(key, value, ttl):
+    # نخزن القيمة مع وقت انتهائها "المرن"، والمفتاح نفسه يبقى STALE_GRACE إضافية
+    cache.set(key, (value, time.time() + ttl), ttl + STALE_GRACE)
+
+
+def _compute_and_store(key, lock_key, compute, ttl):
+    try:
+        value = compute()
+        _store(key, value, ttl)
+        return value
+    finally:
+        cache.delete(lock_key)
+
+
+def get_or_compute(key, compute, ttl=PRODUCTS_TTL):
+    """
+    تعيد قيمة المفتاح من الكاش، أو تحسبها مرة واحدة فقط بين كل العمال (single-flight).
+    - بعد انتهاء الصلاحية: عامل واحد يعيد الحساب والبقية يخدمون القيمة القديمة.
+    - مفتاح بارد (إصدار جديد بعد تعديل): البقية ينتظرون ناتج العامل الذي يحسب بدلاً من تكرار نفس الاستعلام.
+    """
+    lock_key = LOCK_KEY.format(key=key)
+    entry = cache.get(key)
+    if entry is not None:
+        value, fresh_until = entry
+        if fresh_until > time.time() or not cache.add(lock_key, 1, LOCK_TTL):
+            return value
+        return _compute_and_store(key, lock_key, compute, ttl)
+
+    if cache.add(lock_key, 1, LOCK_TTL):
+        return _compute_and_store(key, lock_key, compute, ttl)
+
+    deadline = time.time() + LOCK_WAIT
+    while time.time() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+
+    # العامل الآخر تأخر أو توقف: نحسب بأنفسنا
+    value = compute()
+    _store(key, value, ttl)
+    return value
+
+
+def get_catalog_version(cafe_id=None):
+    """
+    تعيد (generation, version) للمقهى المطلوب دون لمس قاعدة البيانات.
+    """
+    cafe_key = CAFE_VERSION_KEY.format(cafe_id=cafe_id or ALL_CAFES)
+    values = cache.get_many([GENERATION_KEY, cafe_key])
+    generation = values.get(GENERATION_KEY)
+    version = values.get(cafe_key)
+    if generation is None:
+        generation = get_version(GENERATION_KEY)
+    if version is None:
+        version = get_version(cafe_key)
+    return generation, version
+
+
+def get_cafes_version():
+    return get_version(CAFES_VERSION_KEY)
+
+
+def invalidate_cafes_cache():
+    bump_version(CAFES_VERSION_KEY)
+
+
+def invalidate_system_settings():
+    bump_version(SYSTEM_SETTINGS_VERSION_KEY)
+
+
+def get_system_settings():
+    # إعدادات النظام (العملة، الحد الأدنى للشحن...) تُقرأ في كل صفحة تقريباً
+    key = SYSTEM_SETTINGS_KEY.format(version=get_version(SYSTEM_SETTINGS_VERSION_KEY))
+    return get_or_compute(key, SystemSettings.get_solo)
+
+
+def invalidate_products_cache(cafe_id=None):
+    """
+    إبطال كاش المنتجات.
+    مع cafe_id: يُعاد بناء شريحة ذلك المقهى فقط (وقائمة كل المنتجات).
+    بدون cafe_id: يُبطل الكتالوج لكل المقاهي.
+    """
+    if cafe_id is None:
+        bump_version(GENERATION_KEY)
+        return
+    bump_version(CAFE_VERSION_KEY.format(cafe_id=cafe_id))
+    bump_version(CAFE_VERSION_KEY.format(cafe_id=ALL_CAFES))
+
+
+def _products_cache_key(cafe_id, generation, version):
+    return PRODUCTS_KEY.format(gen=generation, cafe_id=cafe_id or ALL_CAFES, version=version)
+
+
+def _build_products_index(products):
+    """
+    فهرس جاهز لشريحة مقهى: القائمة مرتبة تنازلياً على (created_at, id)،
+    ومواقع المنتجات حسب رقم الفئة وحسب اسمها (بحروف صغيرة) حتى لا نمر على كل المنتجات عند التصفية.
+    """
+    by_category = {}
+    by_category_name = {}
+    for position, product in enumerate(products):
+        by_category.setdefault(product.category_id, []).append(position)
+        category_name = product.category.name.lower() if product.category_id else ''
+        by_category_name.setdefault(category_name, []).append(position)
+    return {'products': products, 'by_category': by_category, 'by_category_name': by_category_name}
+
+
+def get_products_index(cafe_id=None):
+    """
+    تعيد فهرس منتجات مقهى واحد (أو كل المقاهي) من الكاش،
+    وعند عدم وجوده تجلب شريحة ذلك المقهى فقط من قاعدة البيانات باستعلام واحد.
+    """
+    def load():
+        products = Product.objects.select_related('cafe', 'category').order_by('-created_at', '-id')
+        if cafe_id:
+            products = products.filter(cafe_id=cafe_id)
+        return _build_products_index(list(products))
+
+    generation, version = get_catalog_version(cafe_id)
+    return get_or_compute(_products_cache_key(cafe_id, generation, version), load)
+
+
+def query_products(cafe_id=None, category_id=None, category_name=None, available_only=False):
+    """
+    محرك استعلام الكتالوج الموحد لكل مسارات /api/products/ ولوحة التحكم.
+    category_id له الأولوية على category_name (مثل السلوك السابق).
+    """
+    index = get_products_index(cafe_id)
+    products = index['products']
+
+    if category_id:
+        positions = index['by_category'].get(int(category_id), [])
+    elif category_name:
+        positions = index['by_category_name'].get(category_name.lower(), [])
+    else:
+        positions = None
+    if positions is not None:
+        products = [products[position] for position in positions]
+
+    if available_only:
+        products = [product for product in products if product.is_available]
+    return products
+
+
+def get_price_table(cafe_id=None):
+    """
+    جدول الأسعار: {product_id: (cafe_id, price, is_available)} لمقهى واحد أو لكل المقاهي.
+    يُبنى من فهرس المنتجات المخزن (بدون استعلام إضافي) ويتبع نفس إصدار الكتالوج.
+    """
+    generation, version = get_catalog_version(cafe_id)
+    key = PRICES_KEY.format(gen=generation, cafe_id=cafe_id or ALL_CAFES, version=version)
+    return get_or_compute(key, lambda: {
+        product.id: (product.cafe_id, product.price, product.is_available)
+        for product in get_products_index(cafe_id)['products']
+    })
+
+
+def _patch_cached_index(cafe_id, product_ids, is_available, updated_at):
+    """
+    نقل فهرس المنتجات المخزن لنطاق واحد (مقهى أو كل المقاهي) إلى إصدار جديد بعد تعديل التوفر.
+    إذا رفع طلب آخر الإصدار في نفس اللحظة لا نكتب شيئاً (الكاش سيُبنى من قاعدة البيانات).
+    """
+    generation, version = get_catalog_version(cafe_id)
+    scope = cafe_id or ALL_CAFES
+    entry = cache.get(_products_cache_key(cafe_id, generation, version))
+    categories = cache.get(CATEGORIES_KEY.format(gen=generation, cafe_id=cafe_id, version=version)) if cafe_id else None
+
+    new_version = bump_version(CAFE_VERSION_KEY.format(cafe_id=scope))
+    if new_version != version + 1:
+        return
+
+    patched = {}
+    if entry is not None:
+        index = entry[0]
+        for product in index['products']:
+            if product.id in product_ids and product.is_available != is_available:
+                product.is_available = is_available
+                product.updated_at = updated_at
+        # مواقع الفئات لا تتغير بتغيير التوفر
+        patched[_products_cache_key(cafe_id, generation, new_version)] = (index, time.time() + PRODUCTS_TTL)
+    if categories is not None:
+        patched[CATEGORIES_KEY.format(gen=generation, cafe_id=cafe_id, version=new_version)] = categories
+    if patched:
+        cache.set_many(patched, PRODUCTS_TTL + STALE_GRACE)
+
+
+def set_products_availability(cafe_id, product_ids, is_available):
+    """
+    تغيير توفر منتجات مقهى واحد بتحديث واحد (UPDATE) بدون إشارات post_save،
+    ثم ترقيع فهرس المنتجات المخزن في الكاش تحت إصدار جديد بدلاً من إعادة بناء الكتالوج من قاعدة البيانات.
+    تعيد عدد المنتجات التي تغيرت فعلاً.
+    """
+    product_ids = {int(product_id) for product_id in product_ids}
+    if not product_ids:
+        return 0
+
+    updated_at = timezone.now()
+    updated = (
+        Product.objects.filter(cafe_id=cafe_id, id__in=product_ids)
+        .exclude(is_available=is_available)
+        .update(is_available=is_available, updated_at=updated_at)
+    )
+    if updated:
+        _patch_cached_index(cafe_id, product_ids, is_available, updated_at)
+        _patch_cached_index(None, product_ids, is_available, updated_at)
+    return updated
+
+
+def ensure_default_categories():
+    """
+    إنشاء الفئات الافتراضية مرة واحدة (بعد migrate)، بدلاً من التحقق منها في كل طلب.
+    """
+    existing = set(Category.objects.filter(name__in=DEFAULT_CATEGORY_NAMES).values_list('name', flat=True))
+    missing = [Category(name=name) for name in DEFAULT_CATEGORY_NAMES if name not in existing]
+    if missing:
+        Category.objects.bulk_create(missing)
+        invalidate_products_cache()
+
+
+def get_categories_for_cafe(cafe_id):
+    """
+    فئات المقهى (الافتراضية + الفئات المستخدمة في منتجاته) مرتبة بالاسم، من الكاش.
+    تُبطل مع إصدار كتالوج المقهى عند أي تعديل على منتجاته أو على الفئات.
+    """
+    generation, version = get_catalog_version(cafe_id)
+    key = CATEGORIES_KEY.format(gen=generation, cafe_id=cafe_id, version=version)
+    return get_or_compute(key, lambda: list(
+        Category.objects.filter(Q(name__in=DEFAULT_CATEGORY_NAMES) | Q(products__cafe_id=cafe_id))
+        .distinct()
+        .order_by('name')
+    ))
+
+
+def _variant_hash(*parts):
+    return hashlib.md5(':'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+
+def _products_variant(request, category_id=None, category_name=None, available_only=False, position=None, limit=None,
+                      shape=SHAPE_FULL):
+    # روابط الصور مطلقة لذلك يدخل الـ host ضمن المتغيرات
+    category_name = (category_name or '').lower() if not category_id else ''
+    return _variant_hash(
+        shape,
+        category_id or ALL_CAFES,
+        category_name,
+        '1' if available_only else '0',
+        position[0].isoformat() if position else '',
+        position[1] if position else '',
+        limit or '',
+        request.build_absolute_uri('/'),
+    )
+
+
+def get_products_etag(request, cafe_id=None, **filters):
+    """
+    ETag قوي مشتق من أرقام إصدار الكتالوج، يُحسب من الكاش فقط (بدون قاعدة بيانات أو Serializer).
+    """
+    generation, version = get_catalog_version(cafe_id)
+    variant = _products_variant(request, **filters)
+    return f'"p{generation}.{cafe_id or ALL_CAFES}.{version}-{variant[:16]}"'
+
+
+def get_products_payload(request, cafe_id=None, category_id=None, category_name=None, available_only=False,
+                         position=None, limit=None, shape=SHAPE_FULL):
+    """
+    تعيد (جسم استجابة /api/products/ كـ JSON جاهز (bytes)، المؤشر التالي).
+    نخزن الناتج النهائي بعد الـ Serializer لأنه الجزء الأغلى، وليس فقط نتيجة الاستعلام.
+    """
+    generation, version = get_catalog_version(cafe_id)
+    key = PAYLOAD_KEY.format(
+        gen=generation,
+        cafe_id=cafe_id or ALL_CAFES,
+        version=version,
+        variant=_products_variant(request, category_id, category_name, available_only, position, limit, shape),
+    )
+
+    def render():
+        products = query_products(cafe_id, category_id, category_name, available_only)
+
+        next_cursor = None
+        if limit:
+            products, next_cursor = paginate_list(products, position, limit)
+
+        if shape == SHAPE_LITE:
+            data = _lite_products_data(products, request)
+        else:
+            data = ProductSerializer(products, many=True, context={'request': request}).data
+        return JSONRenderer().render(data), next_cursor
+
+    return get_or_compute(key, render)
+
+
+def _lite_products_data(products, request):
+    """
+    المنتجات بالشكل المختصر + قاموس واحد للمقاهي وآخر للفئات بدل تكرارها داخل كل منتج.
+    """
+    cafes = {}
+    categories = {}
+    for product in products:
+        if product.cafe_id not in cafes:
+            cafes[product.cafe_id] = product.cafe
+        if product.category_id not in categories:
+            categories[product.category_id] = product.category
+
+    context = {'request': request}
+    return {
+        'products': ProductLiteSerializer(products, many=True, context=context).data,
+        'cafes': {str(cafe.id): CafeSerializer(cafe, context=context).data for cafe in cafes.values()},
+        'categories': {str(category.id): CategorySerializer(category).data for category in categories.values()},
+    }
+
+
+def get_cafes_etag(request):
+    variant = _variant_hash(request.build_absolute_uri('/'))
+    return f'"c{get_cafes_version()}-{variant[:16]}"'
+
+
+def get_cafes_payload(request):
+    """
+    قائمة المقاهي النشطة كـ JSON جاهز، تُبطل عند أي تعديل على مقهى.
+    """
+    key = CAFES_PAYLOAD_KEY.format(
+        version=get_cafes_version(),
+        variant=_variant_hash(request.build_absolute_uri('/')),
+    )
+
+    def render():
+        cafes = Cafe.objects.filter(is_active=True).order_by('name')
+        serializer = CafeSerializer(cafes, many=True, context={'request': request})
+        return JSONRenderer().render(serializer.data)
+
+    return get_or_compute(key, render)
+
+
+def load_product_changes(since=None, cafe_id=None, limit=DELTA_PAGE_SIZE):
+    """
+    المزامنة التزايدية للكتالوج: تعيد (المنتجات المعدلة، أرقام المنتجات المحذوفة، cursor جديد، has_more).
+    بدون since تعيد الكتالوج كاملاً (أول مزامنة) مع cursor يبدأ من الآن.
+    ترفع ValueError إذا كان الـ cursor غير صالح.
+    """
+    limit = max(1, min(int(limit), DELTA_MAX_PAGE_SIZE))
+    changed_qs = Product.objects.select_related('cafe', 'category').order_by('updated_at', 'id')
+    deleted_qs = ProductTombstone.objects.order_by('deleted_at', 'id')
+    if cafe_id:
+        changed_qs = changed_qs.filter(cafe_id=cafe_id)
+        deleted_qs = deleted_qs.filter(cafe_id=cafe_id)
+
+    if since:
+        position = decode_cursor(since)
+        if not isinstance(position, dict):
+            raise ValueError('Invalid cursor')
+        changed_position, deleted_position = position.get('p'), position.get('d')
+        if changed_position:
+            changed_qs = keyset_after(changed_qs, 'updated_at', changed_position)
+        if deleted_position:
+            deleted_qs = keyset_after(deleted_qs, 'deleted_at', deleted_position)
+        deleted = list(deleted_qs[:limit + 1])
+    else:
+        # أول مزامنة: لا يوجد ما يُحذف من نسخة العميل، نبدأ بعد آخر أثر حذف موجود
+        changed_position = None
+        last_tombstone = deleted_qs.order_by('-deleted_at', '-id').first()
+        deleted_position = [last_tombstone.deleted_at.isoformat(), last_tombstone.id] if last_tombstone else None
+        deleted = []
+
+    changed = list(changed_qs[:limit + 1])
+    has_more = len(changed) > limit or len(deleted) > limit
+    changed, deleted = changed[:limit], deleted[:limit]
+
+    if changed:
+        changed_position = [changed[-1].updated_at.isoformat(), changed[-1].id]
+    if deleted:
+        deleted_position = [deleted[-1].deleted_at.isoformat(), deleted[-1].id]
+
+    cursor = encode_cursor({'p': changed_position, 'd': deleted_position})
+    return changed, [tombstone.product_id for tombstone in deleted], cursor, has_more
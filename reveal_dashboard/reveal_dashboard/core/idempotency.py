@@ -0,0 +1,138 @@
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import IdempotencyKey
+
+# --- مفاتيح عدم التكرار (Idempotency-Key) ---
+# التطبيق يرسل نفس المفتاح عند إعادة المحاولة؛ إن كان الطلب الأول قد نُفذ نعيد استجابته المحفوظة
+# (قراءة واحدة على الفهرس الفريد (user, key)) بدون تنفيذ المعاملة مرة ثانية.
+# الاستجابة تُحفظ داخل نفس المعاملة التي ينفذ فيها الـ view عمله: إما أن يُحفظ الاثنان أو لا شيء.
+# لذلك حجز بلا استجابة بعد CLAIM_LEASE يعني أن الطلب الأول مات دون أن يُحفظ شيء، فيمكن إعادة حجزه.
+# الحجز يُعاد بتحديث created_at؛ والطلب الأول (إن كان بطيئاً وما زال يعمل) يجد أن حجزه أُخذ
+# عند حفظ الاستجابة فيتراجع عن معاملته بدل أن تُنفذ العملية مرتين.
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+IDEMPOTENCY_TTL = 60 * 60 * 24
+CLAIM_LEASE = 60
+KEY_MAX_LENGTH = IdempotencyKey._meta.get_field('key').max_length
+
+
+def _authenticated_user(request):
+    return request.user if request.user.is_authenticated else None
+
+
+def _request_hash(data):
+    body = json.dumps(data, sort_keys=True, cls=JSONEncoder, default=str)
+    return hashlib.sha256(body.encode('utf-8')).hexdigest()
+
+
+def _replay(record, endpoint, request_hash):
+    if record.endpoint != endpoint or record.request_hash != request_hash:
+        return Response({'error': 'Idempotency-Key was already used for a different request.'}, status=422)
+    if record.status_code is None:
+        response = Response({'error': 'A request with this Idempotency-Key is still being processed.'}, status=409)
+        response['Retry-After'] = '1'
+        return response
+    response = Response(record.response, status=record.status_code)
+    response[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def _claim(user, key, endpoint, request_hash):
+    """
+    تعيد (record, None) إذا حجزنا المفتاح لهذا الطلب، أو (None, response) لإعادة نتيجة سابقة.
+    الحجز يُحفظ فوراً (خارج معاملة الـ view) حتى ترى المحاولات المتزامنة أنه قيد التنفيذ.
+    """
+    now = timezone.now()
+    record = IdempotencyKey.objects.filter(user=user, key=key).first()
+    if record is not None:
+        if record.created_at < now - timedelta(seconds=IDEMPOTENCY_TTL):
+            record.delete()
+        elif (record.status_code is None and record.endpoint == endpoint and record.request_hash == request_hash
+              and record.created_at < now - timedelta(seconds=CLAIM_LEASE)):
+            # حجز متروك: نأخذه فقط إن لم يسبقنا إليه طلب آخر
+            taken = IdempotencyKey.objects.filter(
+                pk=record.pk, status_code__isnull=True, created_at=record.created_at,
+            ).update(created_at=now)
+            if taken:
+                record.created_at = now
+                return record, None
+            return None, _replay(IdempotencyKey.objects.get(pk=record.pk), endpoint, request_hash)
+        else:
+            return None, _replay(record, endpoint, request_hash)
+
+    try:
+        with transaction.atomic():
+            return IdempotencyKey.objects.create(user=user, key=key, endpoint=endpoint, request_hash=request_hash), None
+    except IntegrityError:
+        # محاولة أخرى بنفس المفتاح وصلت في نفس اللحظة وحجزته قبلنا
+        return None, _replay(IdempotencyKey.objects.get(user=user, key=key), endpoint, request_hash)
+
+
+def idempotent(get_user=_authenticated_user):
+    """
+    مزخرف لنقاط الكتابة (يوضع تحت @api_view و @permission_classes).
+    get_user(request) تعيد المستخدم الذي يُربط به المفتاح؛ إن فشلت يُنفذ الـ view كالمعتاد
+    وهو من يرد بخطأ المصادقة.
+    """
+    def decorator(view):
+        endpoint = view.__name__
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            key = request.headers.get(IDEMPOTENCY_HEADER, '').strip()
+            if not key:
+                return view(request, *args, **kwargs)
+            if len(key) > KEY_MAX_LENGTH:
+                return Response({'error': 'Invalid Idempotency-Key'}, status=400)
+
+            try:
+                user = get_user(request)
+            except Exception:
+                user = None
+            if user is None:
+                return view(request, *args, **kwargs)
+
+            record, replay = _claim(user, key, endpoint, _request_hash(request.data))
+            if replay is not None:
+                return replay
+
+            # الحجز ما زال لنا فقط إذا لم يتغير created_at (لم يُعد حجزه بعد انتهاء المهلة)
+            claim = IdempotencyKey.objects.filter(pk=record.pk, created_at=record.created_at)
+            try:
+                with transaction.atomic():
+                    response = view(request, *args, **kwargs)
+                    # أخطاء الخادم لا تُحفظ حتى تنجح إعادة المحاولة لاحقاً
+                    stored = response.status_code < 500 and isinstance(response, Response)
+                    if stored and not claim.update(status_code=response.status_code, response=response.data):
+                        # تأخرنا أكثر من CLAIM_LEASE وأعاد طلب آخر الحجز: نتراجع عن عملنا
+                        transaction.set_rollback(True)
+                        response = Response(
+                            {'error': 'A request with this Idempotency-Key is still being processed.'}, status=409,
+                        )
+                        response['Retry-After'] = '1'
+                        return response
+            except Exception:
+                # المعاملة رجعت بالكامل، فإعادة المحاولة آمنة
+                claim.delete()
+                raise
+            if not stored:
+                claim.delete()
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def purge_expired_keys():
+    cutoff = timezone.now() - timedelta(seconds=IDEMPOTENCY_TTL)
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,98 @@
+import hashlib
+import io
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+# --- نسخ الصور المصغرة (WebP/JPEG) ---
+# تُولّد مرة واحدة عند رفع الصورة، واسم الملف مشتق من محتوى الصورة الأصلية
+# حتى لا تتكرر النسخ لنفس الصورة ويمكن تخزينها في المتصفح/التطبيق بلا انتهاء.
+VARIANTS_DIR = 'variants/'
+IMAGE_VARIANT_SIZES = {
+    'thumb': 160,
+    'small': 480,
+    'medium': 960,
+}
+IMAGE_VARIANT_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def _content_hash(field_file):
+    digest = hashlib.sha256()
+    field_file.open('rb')
+    try:
+        for chunk in field_file.chunks():
+            digest.update(chunk)
+    finally:
+        field_file.seek(0)
+    return digest.hexdigest()[:20]
+
+
+def build_image_variants(field_file):
+    """
+    تولّد النسخ المصغرة لصورة (ImageField) وتعيد قاموس المسارات:
+    {'source': <اسم الصورة الأصلية>, 'thumb': {'webp': ..., 'jpg': ...}, ...}
+    """
+    content_hash = _content_hash(field_file)
+    variants = {'source': field_file.name}
+
+    with Image.open(field_file) as original:
+        original = ImageOps.exif_transpose(original)
+        has_alpha = original.mode in ('RGBA', 'LA') or 'transparency' in original.info
+
+        for size_name, max_side in IMAGE_VARIANT_SIZES.items():
+            variants[size_name] = {}
+            resized = original.copy()
+            resized.thumbnail((max_side, max_side), Image.LANCZOS)
+
+            for extension, (image_format, save_options) in IMAGE_VARIANT_FORMATS.items():
+                name = f'{VARIANTS_DIR}{content_hash}_{size_name}.{extension}'
+                if not default_storage.exists(name):
+                    if image_format == 'JPEG' or not has_alpha:
+                        output_image = resized.convert('RGB')
+                    else:
+                        output_image = resized.convert('RGBA')
+                    buffer = io.BytesIO()
+                    output_image.save(buffer, format=image_format, **save_options)
+                    name = default_storage.save(name, ContentFile(buffer.getvalue()))
+                variants[size_name][extension] = name
+
+    return variants
+
+
+def variants_outdated(instance):
+    """
+    هل تحتاج صورة الكائن (منتج/مقهى) لإعادة توليد النسخ؟
+    """
+    variants = instance.image_variants or {}
+    if not instance.image:
+        return bool(variants)
+    return variants.get('source') != instance.image.name
+
+
+def refresh_image_variants(instance):
+    """
+    تحدّث image_variants للكائن إذا تغيرت صورته، وتعيد True إذا تم التحديث.
+    الحفظ عبر update() حتى لا تتكرر إشارات post_save.
+    """
+    if not variants_outdated(instance):
+        return False
+
+    variants = build_image_variants(instance.image) if instance.image else {}
+    type(instance).objects.filter(pk=instance.pk).update(image_variants=variants)
+    instance.image_variants = variants
+    return True
+
+
+def variant_urls(variants):
+    """
+    تحويل قاموس المسارات المخزن إلى روابط (بدون المفتاح source).
+    """
+    return {
+        size_name: {extension: default_storage.url(name) for extension, name in formats.items()}
+        for size_name, formats in (variants or {}).items()
+        if size_name != 'source'
+    }
@@ -0,0 +1,98 @@
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.test import RequestFactory
+
+from core.catalog import PRODUCTS_TTL, get_products_payload, query_products
+from core.models import Cafe, Product
+from core.serializers import ProductSerializer
+
+LEGACY_CACHE_KEY = "benchmark:legacy:products"
+
+
+def legacy_orm_products(request, cafe_id, category_name=None, available_only=False):
+    # المسار القديم في core/views.get_products: استعلام ORM و Serializer في كل طلب
+    products = Product.objects.select_related('cafe', 'category').filter(cafe_id=cafe_id).order_by('-created_at')
+    if category_name:
+        products = products.filter(category__name__iexact=category_name)
+    if available_only:
+        products = products.filter(is_available=True)
+    return ProductSerializer(products, many=True, context={'request': request}).data
+
+
+def legacy_cached_products(request, cafe_id, category_name=None, available_only=False):
+    # المسار القديم في core/api_views.get_products: كل المنتجات في مفتاح واحد ثم تصفية بالقوائم
+    all_products = cache.get(LEGACY_CACHE_KEY)
+    if not all_products:
+        all_products = list(Product.objects.select_related('cafe', 'category').order_by('-created_at'))
+        cache.set(LEGACY_CACHE_KEY, all_products, PRODUCTS_TTL)
+    products = [p for p in all_products if str(p.cafe_id) == str(cafe_id)]
+    if category_name:
+        products = [p for p in products if p.category.name.lower() == category_name.lower()]
+    if available_only:
+        products = [p for p in products if p.is_available]
+    return ProductSerializer(products, many=True, context={'request': request}).data
+
+
+def engine_products(request, cafe_id, category_name=None, available_only=False):
+    products = query_products(cafe_id, category_name=category_name, available_only=available_only)
+    return ProductSerializer(products, many=True, context={'request': request}).data
+
+
+def engine_payload(request, cafe_id, category_name=None, available_only=False):
+    return get_products_payload(request, cafe_id, category_name=category_name, available_only=available_only)
+
+
+class Command(BaseCommand):
+    help = "Compare the catalog query engine against the two legacy /api/products/ implementations."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=50, help="Requests per scenario.")
+        parser.add_argument("--cafe", type=int, help="Cafe id to query (defaults to the cafe with most products).")
+
+    def handle(self, *args, **options):
+        iterations = max(1, options["iterations"])
+        cafe = self._pick_cafe(options["cafe"])
+        category = Product.objects.filter(cafe=cafe, category__isnull=False).values_list('category__name', flat=True).first()
+        request = RequestFactory().get("/api/products/")
+
+        scenarios = [
+            ("cafe", {}),
+            ("cafe + available", {"available_only": True}),
+        ]
+        if category:
+            scenarios.append((f"cafe + category={category}", {"category_name": category}))
+
+        paths = [
+            ("legacy ORM (core/views)", legacy_orm_products),
+            ("legacy global cache (api_views)", legacy_cached_products),
+            ("engine + serializer", engine_products),
+            ("engine cached JSON", engine_payload),
+        ]
+
+        self.stdout.write(
+            f"Cafe #{cafe.pk} ({Product.objects.filter(cafe=cafe).count()} products, "
+            f"{Product.objects.count()} in total), {iterations} iterations per scenario"
+        )
+        for scenario, filters in scenarios:
+            self.stdout.write(f"\n{scenario}")
+            for label, run in paths:
+                run(request, cafe.pk, **filters)  # تسخين الكاش للمسارات التي تستخدمه
+                started = time.perf_counter()
+                for _ in range(iterations):
+                    run(request, cafe.pk, **filters)
+                average_ms = (time.perf_counter() - started) * 1000 / iterations
+                self.stdout.write(f"  {label:<34} {average_ms:8.2f} ms/request")
+
+        cache.delete(LEGACY_CACHE_KEY)
+
+    def _pick_cafe(self, cafe_id):
+        if cafe_id:
+            cafe = Cafe.objects.filter(pk=cafe_id).first()
+        else:
+            cafe = Cafe.objects.annotate(product_count=Count('products')).order_by('-product_count').first()
+        if cafe is None:
+            raise CommandError("No cafe to benchmark. Create products first (e.g. manage.py seed_cafes).")
+        return cafe
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from core.catalog import invalidate_cafes_cache, invalidate_products_cache
+from core.images import build_image_variants, variants_outdated
+from core.models import Cafe, Product
+
+
+class Command(BaseCommand):
+    help = "Generate thumbnail/WebP variants for existing product and cafe images."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Rebuild variants even when they are already up to date.",
+        )
+
+    def handle(self, *args, **options):
+        force = options["force"]
+        total = 0
+        failed = 0
+
+        for model in (Cafe, Product):
+            queryset = model.objects.exclude(image="").exclude(image__isnull=True).order_by("pk")
+            for obj in queryset.iterator():
+                if not force and not variants_outdated(obj):
+                    continue
+                try:
+                    variants = build_image_variants(obj.image)
+                except Exception as exc:
+                    failed += 1
+                    self.stdout.write(self.style.WARNING(f"Skipped {model.__name__} #{obj.pk}: {exc}"))
+                    continue
+                model.objects.filter(pk=obj.pk).update(image_variants=variants)
+                total += 1
+
+        # update() لا يرسل إشارات، لذلك نبطل الكاش مرة واحدة في النهاية
+        invalidate_products_cache()
+        invalidate_cafes_cache()
+
+        self.stdout.write(self.style.SUCCESS(f"Built variants for {total} images ({failed} failed)."))
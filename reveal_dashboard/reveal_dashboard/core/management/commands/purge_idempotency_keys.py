@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.idempotency import IDEMPOTENCY_TTL, purge_expired_keys
+
+
+class Command(BaseCommand):
+    help = f"Delete stored Idempotency-Key responses older than {IDEMPOTENCY_TTL // 3600} hours."
+
+    def handle(self, *args, **options):
+        deleted = purge_expired_keys()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired idempotency keys."))
@@ -0,0 +1,97 @@
+import threading
+import time
+from collections import Counter
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, OperationalError, connection
+from django.db.models import Q
+
+from core.models import Cafe, Order
+from users.models import User
+
+STRESS_EMAIL = "stress-orders@reveal.local"
+STRESS_PHONE = "stress-orders"
+
+
+class Command(BaseCommand):
+    help = "Create many orders concurrently and check that no two get the same order number."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--orders", type=int, default=100_000, help="Total orders to create.")
+        parser.add_argument("--workers", type=int, default=16, help="Concurrent threads.")
+        parser.add_argument("--retries", type=int, default=20, help="Retries per order when the database is busy.")
+        parser.add_argument("--keep", action="store_true", help="Keep the stress cafe and its orders afterwards.")
+
+    def handle(self, *args, **options):
+        total = max(1, options["orders"])
+        workers = max(1, min(options["workers"], total))
+        retries = options["retries"]
+
+        # مقهى ومستخدم خاصان بالاختبار حتى يُحذف كل شيء بالتتالي في النهاية
+        User.objects.filter(Q(email=STRESS_EMAIL) | Q(phone_number=STRESS_PHONE)).delete()
+        user = User.objects.create_user(STRESS_EMAIL, password=None, phone_number=STRESS_PHONE)
+        cafe = Cafe.objects.create(name="Stress test cafe", is_active=False)
+
+        numbers = []
+        collisions = Counter()
+        failures = Counter()
+        lock = threading.Lock()
+        remaining = iter(range(total))
+
+        def worker():
+            created = []
+            try:
+                while True:
+                    with lock:
+                        if next(remaining, None) is None:
+                            break
+                    for attempt in range(retries + 1):
+                        try:
+                            order = Order.objects.create(user=user, cafe=cafe, total_price=Decimal("0"))
+                            created.append(order.order_number)
+                            break
+                        except IntegrityError as exc:
+                            with lock:
+                                collisions[str(exc)] += 1
+                            break
+                        except OperationalError as exc:
+                            # SQLite يسمح بكاتب واحد فقط؛ هذا انتظار وليس تكراراً في الرقم
+                            if attempt == retries:
+                                with lock:
+                                    failures[str(exc)] += 1
+                            else:
+                                time.sleep(0.01 * (attempt + 1))
+            finally:
+                connection.close()
+                with lock:
+                    numbers.extend(created)
+
+        self.stdout.write(f"Creating {total} orders with {workers} workers...")
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        duplicates = sum(count - 1 for count in Counter(numbers).values() if count > 1)
+        stored = Order.objects.filter(cafe=cafe).count()
+        distinct = Order.objects.filter(cafe=cafe).values('business_day', 'order_number').distinct().count()
+
+        self.stdout.write(
+            f"  created {len(numbers)} orders in {elapsed:.1f} s ({len(numbers) / elapsed:.0f} orders/s)\n"
+            f"  stored {stored}, distinct numbers {distinct}, duplicates {duplicates}\n"
+            f"  integrity errors {sum(collisions.values())}, busy-database failures {sum(failures.values())}"
+        )
+        for message, count in (collisions + failures).most_common(5):
+            self.stdout.write(f"    {count} x {message}")
+
+        if not options["keep"]:
+            cafe.delete()
+            user.delete()
+
+        if collisions or duplicates or distinct != stored:
+            raise CommandError("Order number collisions detected.")
+        self.stdout.write(self.style.SUCCESS("No order number collisions."))
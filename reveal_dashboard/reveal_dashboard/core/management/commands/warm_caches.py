@@ -0,0 +1,59 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+
+from core.api_views import get_cafes_list, get_products
+from core.catalog import SHAPE_LITE, get_categories_for_cafe, get_system_settings
+from core.models import Cafe
+from core.reports import get_report_rollup
+
+
+class Command(BaseCommand):
+    help = "Precompute catalog payloads, category lists, system settings and report rollups."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--host",
+            default="localhost",
+            help="Host the app uses to reach the API (image URLs in the payloads are absolute).",
+        )
+        parser.add_argument(
+            "--https",
+            action="store_true",
+            help="Build payloads for https:// URLs.",
+        )
+
+    def handle(self, *args, **options):
+        factory = RequestFactory(HTTP_HOST=options["host"])
+        secure = options["https"]
+        started = time.perf_counter()
+        self.warmed = 0
+
+        def api(view, **params):
+            # نمر عبر نفس الـ view حتى تطابق مفاتيح الكاش ما يطلبه التطبيق فعلاً
+            return lambda: view(factory.get("/api/", params, secure=secure))
+
+        self._warm("system settings", get_system_settings)
+        self._warm("reports rollup", get_report_rollup)
+        self._warm("cafes", api(get_cafes_list))
+        self._warm("products all", api(get_products))
+        self._warm("products all lite", api(get_products, shape=SHAPE_LITE))
+
+        for cafe in Cafe.objects.filter(is_active=True).order_by("pk"):
+            self._warm(f"categories cafe={cafe.pk}", lambda: get_categories_for_cafe(cafe.pk))
+            self._warm(f"products cafe={cafe.pk}", api(get_products, cafe_id=cafe.pk))
+            self._warm(f"products cafe={cafe.pk} lite", api(get_products, cafe_id=cafe.pk, shape=SHAPE_LITE))
+
+        total_ms = (time.perf_counter() - started) * 1000
+        self.stdout.write(self.style.SUCCESS(f"Warmed {self.warmed} cache entries in {total_ms:.1f} ms."))
+
+    def _warm(self, label, compute):
+        started = time.perf_counter()
+        try:
+            compute()
+        except Exception as exc:
+            self.stdout.write(self.style.WARNING(f"  {label}: failed ({exc})"))
+            return
+        self.warmed += 1
+        self.stdout.write(f"  {label}: {(time.perf_counter() - started) * 1000:.1f} ms")
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_merge_20260108_0040'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now, verbose_name='آخر تحديث'),
+            preserve_default=False,
+        ),
+        migrations.CreateModel(
+            name='ProductTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_id', models.BigIntegerField(db_index=True, verbose_name='رقم المنتج')),
+                ('cafe_id', models.BigIntegerField(db_index=True, verbose_name='رقم المقهى')),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='تاريخ الحذف')),
+            ],
+        ),
+    ]
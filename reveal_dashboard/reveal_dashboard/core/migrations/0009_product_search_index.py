@@ -0,0 +1,73 @@
+import re
+
+from django.db import migrations
+
+# نسخة ثابتة من تعريف الفهرس والتطبيع كما كانت عند كتابة هذا الـ migration،
+# حتى لا يتغير سلوكه (أو ينكسر) إذا تغيّر core.search لاحقاً
+FTS_TABLE = 'core_product_fts'
+CREATE_FTS_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "name, description, category, cafe_id UNINDEXED, "
+    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+)
+DROP_FTS_SQL = f"DROP TABLE IF EXISTS {FTS_TABLE}"
+
+TASHKEEL_RE = re.compile('[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED\u0640]')
+ARABIC_LETTERS = str.maketrans({
+    'أ': 'ا',
+    'إ': 'ا',
+    'آ': 'ا',
+    'ٱ': 'ا',
+    'ى': 'ي',
+    'ئ': 'ي',
+    'ؤ': 'و',
+    'ة': 'ه',
+})
+
+
+def normalize_arabic(text):
+    if not text:
+        return ''
+    text = TASHKEEL_RE.sub('', str(text))
+    return text.translate(ARABIC_LETTERS).lower()
+
+
+def create_search_index(apps, schema_editor):
+    # فهرس FTS5 متوفر فقط على SQLite، وباقي قواعد البيانات تستخدم البحث البسيط
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+
+    schema_editor.execute(CREATE_FTS_SQL)
+    Product = apps.get_model('core', 'Product')
+    rows = [
+        [
+            product.id,
+            normalize_arabic(product.name),
+            normalize_arabic(product.description),
+            normalize_arabic(product.category.name if product.category_id else ''),
+            product.cafe_id,
+        ]
+        for product in Product.objects.select_related('category').iterator()
+    ]
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, name, description, category, cafe_id) VALUES (%s, %s, %s, %s, %s)",
+            rows,
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(DROP_FTS_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_product_updated_at_producttombstone'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
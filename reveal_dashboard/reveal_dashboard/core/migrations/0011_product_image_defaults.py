@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:05
+
+from django.db import migrations, models
+
+
+def backfill_image_defaults(apps, schema_editor):
+    from core.utils import get_image_variant_count, get_smart_image_for_product
+
+    Product = apps.get_model('core', 'Product')
+    products = list(Product.objects.select_related('category'))
+    for product in products:
+        product.image_variant_count = get_image_variant_count(product.name, product.category.name)
+        product.default_image = get_smart_image_for_product(product.name) or ''
+    Product.objects.bulk_update(products, ['image_variant_count', 'default_image'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_cafe_image_variants_product_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='default_image',
+            field=models.CharField(blank=True, default='', editable=False, max_length=100, verbose_name='الصورة الافتراضية'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='image_variant_count',
+            field=models.PositiveSmallIntegerField(default=5, editable=False, verbose_name='عدد الصور الافتراضية'),
+        ),
+        migrations.RunPython(backfill_image_defaults, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_business_day(apps, schema_editor):
+    Order = apps.get_model('core', 'Order')
+    orders = list(Order.objects.filter(business_day__isnull=True).only('id', 'created_at'))
+    for order in orders:
+        order.business_day = timezone.localdate(order.created_at)
+    Order.objects.bulk_update(orders, ['business_day'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_product_image_defaults'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='اليوم')),
+                ('last_number', models.PositiveIntegerField(default=0, verbose_name='آخر رقم')),
+                ('cafe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_sequences', to='core.cafe', verbose_name='المقهى')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('cafe', 'day'), name='unique_order_sequence_per_cafe_day')],
+            },
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='business_day',
+            field=models.DateField(blank=True, editable=False, null=True, verbose_name='يوم الطلب'),
+        ),
+        migrations.RunPython(backfill_business_day, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='order',
+            name='order_number',
+            field=models.CharField(blank=True, max_length=10, null=True, verbose_name='رقم الطلب'),
+        ),
+        migrations.AddConstraint(
+            model_name='order',
+            constraint=models.UniqueConstraint(fields=('cafe', 'business_day', 'order_number'), name='unique_order_number_per_cafe_day'),
+        ),
+    ]
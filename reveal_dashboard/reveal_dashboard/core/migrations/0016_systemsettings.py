@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-18 20:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_idempotencykey_request_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SystemSettings',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('system_name', models.CharField(default='منظومة ريفيل', max_length=200, verbose_name='اسم النظام')),
+                ('welcome_message', models.CharField(default='مرحباً بك', max_length=255, verbose_name='رسالة الترحيب')),
+                ('min_charge_amount', models.DecimalField(decimal_places=2, default=1.0, max_digits=10, verbose_name='الحد الأدنى للشحن')),
+                ('currency_symbol', models.CharField(default='د.ل', max_length=10, verbose_name='رمز العملة')),
+                ('allow_registration', models.BooleanField(default=True, verbose_name='السماح بالتسجيل')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='آخر تحديث')),
+            ],
+        ),
+    ]
@@ -1,11 +1,16 @@
 from django.conf import settings
-from django.db import models
-import uuid
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+
+from .utils import get_image_variant_count, get_smart_image_for_product
 
 
 class Cafe(models.Model):
     name = models.CharField(max_length=100, verbose_name="اسم المقهى")
     image = models.ImageField(upload_to='cafes/', blank=True, null=True, verbose_name="صورة المقهى")
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, verbose_name="نسخ الصورة")
     location = models.CharField(max_length=200, blank=True, null=True, verbose_name="الموقع")
     is_active = models.BooleanField(default=True, verbose_name="نشط")
     owner = models.OneToOneField(
@@ -40,14 +45,33 @@ class Product(models.Model):
     description = models.TextField(verbose_name="الوصف", blank=True)
     price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="السعر")
     image = models.ImageField(upload_to='products/', blank=True, null=True, verbose_name="صورة المنتج")
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, verbose_name="نسخ الصورة")
     is_available = models.BooleanField(default=True, verbose_name="متاح")
     rating = models.DecimalField(max_digits=3, decimal_places=1, default=4.5, verbose_name="التقييم")
     rating_count = models.IntegerField(default=10, verbose_name="عدد التقييمات")
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="آخر تحديث")
+    image_variant_count = models.PositiveSmallIntegerField(default=5, editable=False, verbose_name="عدد الصور الافتراضية")
+    default_image = models.CharField(max_length=100, blank=True, default='', editable=False, verbose_name="الصورة الافتراضية")
 
     def __str__(self):
         return self.name
 
+    def refresh_image_defaults(self):
+        """
+        تصنيف المنتج (للصورة الافتراضية) يُحسب هنا عند الحفظ فقط، وليس عند كل عرض.
+        """
+        category_name = self.category.name if self.category_id else ''
+        self.image_variant_count = get_image_variant_count(self.name, category_name)
+        self.default_image = get_smart_image_for_product(self.name) or ''
+
+    def save(self, *args, **kwargs):
+        self.refresh_image_defaults()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and ({'name', 'category'} & set(update_fields)):
+            kwargs['update_fields'] = set(update_fields) | {'image_variant_count', 'default_image'}
+        super().save(*args, **kwargs)
+
     @property
     def image_url(self):
         if self.image:
@@ -55,6 +79,65 @@ class Product(models.Model):
         return ""
 
 
+class ProductTombstone(models.Model):
+    """
+    أثر المنتج المحذوف، حتى تعرف نسخ التطبيق المحلية أن المنتج حُذف عند المزامنة التزايدية.
+    """
+    product_id = models.BigIntegerField(db_index=True, verbose_name="رقم المنتج")
+    cafe_id = models.BigIntegerField(db_index=True, verbose_name="رقم المقهى")
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="تاريخ الحذف")
+
+    def __str__(self):
+        return f"Deleted product #{self.product_id}"
+
+
+class OrderSequence(models.Model):
+    """
+    عداد أرقام الطلبات لكل مقهى في كل يوم (A-001، A-002، ...).
+    الزيادة تتم بـ UPDATE ... SET last_number = last_number + 1 داخل قاعدة البيانات،
+    فالصف مقفول حتى نهاية المعاملة ولا يحصل طلبان على نفس الرقم.
+    """
+    LETTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    BLOCK_SIZE = 1000
+
+    cafe = models.ForeignKey(Cafe, on_delete=models.CASCADE, related_name='order_sequences', verbose_name="المقهى")
+    day = models.DateField(verbose_name="اليوم")
+    last_number = models.PositiveIntegerField(default=0, verbose_name="آخر رقم")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cafe', 'day'], name='unique_order_sequence_per_cafe_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.cafe_id} / {self.day}: {self.last_number}"
+
+    @classmethod
+    def format_number(cls, number):
+        # كل 1000 طلب حرف جديد: A-001 ... A-999، B-000 ... ثم أرقام فقط بعد Z
+        block, rest = divmod(number, cls.BLOCK_SIZE)
+        if block < len(cls.LETTERS):
+            return f"{cls.LETTERS[block]}-{rest:03d}"
+        return str(number)
+
+    @classmethod
+    def next_number(cls, cafe_id, day):
+        """
+        يحجز الرقم التالي للمقهى في اليوم المحدد ويعيده منسقاً.
+        يجب أن تُستدعى داخل معاملة (Order.save تفعل ذلك).
+        """
+        sequence = cls.objects.filter(cafe_id=cafe_id, day=day)
+        if not sequence.update(last_number=F('last_number') + 1):
+            try:
+                with transaction.atomic():
+                    cls.objects.create(cafe_id=cafe_id, day=day, last_number=1)
+                return cls.format_number(1)
+            except IntegrityError:
+                # طلب آخر أنشأ عداد اليوم في نفس اللحظة
+                sequence.update(last_number=F('last_number') + 1)
+        return cls.format_number(sequence.values_list('last_number', flat=True).get())
+
+
 class Order(models.Model):
     STATUS_CHOICES = (
         ('PENDING', 'قيد الانتظار'),
@@ -76,11 +159,30 @@ class Order(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING', verbose_name="الحالة")
     payment_method = models.CharField(max_length=10, choices=PAYMENT_METHOD_CHOICES, default='WALLET', verbose_name='طريقة الدفع')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="تاريخ الطلب")
-    order_number = models.CharField(max_length=10, unique=True, blank=True, null=True, verbose_name="رقم الطلب")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="آخر تحديث")
+    business_day = models.DateField(null=True, blank=True, editable=False, verbose_name="يوم الطلب")
+    order_number = models.CharField(max_length=10, blank=True, null=True, verbose_name="رقم الطلب")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['cafe', 'business_day', 'order_number'],
+                name='unique_order_number_per_cafe_day',
+            ),
+        ]
+        indexes = [
+            # مزامنة طلبات المستخدم التزايدية (?since=) على (updated_at, id)
+            models.Index(fields=['user', 'updated_at', 'id'], name='order_user_updated_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.order_number:
-            self.order_number = str(uuid.uuid4().int)[:8]
+            # بدون savepoint إضافي عندما يكون الحفظ داخل معاملة أصلاً (مثل place_order)
+            with transaction.atomic(savepoint=False):
+                self.business_day = self.business_day or timezone.localdate()
+                self.order_number = OrderSequence.next_number(self.cafe_id, self.business_day)
+                super().save(*args, **kwargs)
+            return
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -98,6 +200,30 @@ class OrderItem(models.Model):
         return f"{self.quantity} x {self.product.name}"
 
 
+class IdempotencyKey(models.Model):
+    """
+    نتيجة طلب كتابة (إنشاء طلب، عمليات المحفظة) محفوظة حسب ترويسة Idempotency-Key،
+    حتى تعيد محاولات التطبيق نفس الاستجابة بدلاً من تنفيذ العملية مرة ثانية.
+    status_code فارغ يعني أن الطلب الأول ما زال قيد التنفيذ.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='idempotency_keys', verbose_name="المستخدم")
+    key = models.CharField(max_length=100, verbose_name="المفتاح")
+    endpoint = models.CharField(max_length=100, verbose_name="نقطة الاتصال")
+    # بصمة جسم الطلب: نفس المفتاح مع جسم مختلف يُرفض بدل إعادة استجابة لا تخصه
+    request_hash = models.CharField(max_length=64, blank=True, default='', verbose_name="بصمة الطلب")
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name="رمز الاستجابة")
+    response = models.JSONField(null=True, blank=True, encoder=JSONEncoder, verbose_name="الاستجابة")
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key_per_user'),
+        ]
+
+    def __str__(self):
+        return f"{self.endpoint} [{self.key}]"
+
+
 class SystemSettings(models.Model):
     system_name = models.CharField(max_length=200, default='منظومة ريفيل', verbose_name='اسم النظام')
     welcome_message = models.CharField(max_length=255, default='مرحباً بك', verbose_name='رسالة الترحيب')
@@ -0,0 +1,174 @@
+import json
+import time
+
+from django.core.cache import cache
+from django.db import connection
+from django.template.loader import render_to_string
+
+from .catalog import ALL_CAFES, get_system_settings
+from .models import Order
+
+# --- أحداث لوحة الطلبات المباشرة (Server-Sent Events) ---
+# كل تغيير على طلب يُنشر في سجل قصير داخل الكاش لكل مقهى (وقناة لكل المقاهي للمدير العام):
+# عداد تسلسلي + مفتاح لكل حدث يحمل بطاقة الطلب جاهزة (HTML).
+# اتصال البث يقرأ العداد فقط من الكاش كل STREAM_POLL_INTERVAL ولا يمسك اتصالاً بقاعدة البيانات.
+# ملاحظة: مع عدة عمليات (workers) يجب أن يكون الكاش مشتركاً وذرياً (CACHE_BACKEND=redis)؛
+# مع file قد يأخذ حدثان نفس الرقم فيضيع أحدهما.
+EVENTS_SEQ_KEY = "orders:events:seq:{channel}"
+EVENT_KEY = "orders:events:{channel}:{seq}"
+EVENT_TTL = 300
+MAX_REPLAY_EVENTS = 100
+STREAM_POLL_INTERVAL = 0.25
+STREAM_HEARTBEAT = 15
+# يعيد المتصفح الاتصال تلقائياً (مع Last-Event-ID) فلا نُبقي العامل مشغولاً أكثر من دقيقة
+STREAM_MAX_SECONDS = 55
+STREAM_RETRY_MS = 1000
+
+# --- انتظار تغير حالة الطلبات (long-poll للتطبيق) ---
+# آخر حالة لكل طلب تُحفظ في الكاش مع نشر أحداثه؛ الانتظار يقرأ هذه المفاتيح فقط ولا يلمس قاعدة البيانات.
+# التطبيق يفتح اتصالاً واحداً لكل طلباته النشطة (حتى WAIT_MAX_ORDERS).
+ORDER_STATUS_KEY = "orders:status:{order_id}"
+ORDER_STATUS_TTL = 60 * 60
+WAIT_POLL_INTERVAL = 0.5
+WAIT_DEFAULT_SECONDS = 25
+# أقل من مهلة الوكيل العكسي المعتادة (30-60 ثانية)
+WAIT_MAX_SECONDS = 30
+WAIT_MAX_ORDERS = 50
+# بدون كاش مشترك (LIVE_ORDER_UPDATES) يعود الطلب فوراً ويعيد التطبيق الاستعلام بعد هذه المدة (Retry-After)
+WAIT_FALLBACK_SECONDS = 15
+
+# حالات لا تظهر في أعمدة اللوحة؛ بطاقتها تُحذف من الصفحة
+FINISHED_STATUSES = ('COMPLETED', 'CANCELLED')
+
+
+def _channels(cafe_id):
+    return (cafe_id, ALL_CAFES)
+
+
+def _next_seq(channel):
+    key = EVENTS_SEQ_KEY.format(channel=channel)
+    cache.add(key, 0, None)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # العداد حُذف من الكاش بين add و incr
+        cache.set(key, 1, None)
+        return 1
+
+
+def get_last_event_id(channel):
+    return cache.get(EVENTS_SEQ_KEY.format(channel=channel)) or 0
+
+
+def render_order_card(order, system_settings=None):
+    return render_to_string('partials/order_card.html', {
+        'order': order,
+        'system_settings': system_settings or get_system_settings(),
+    })
+
+
+def publish_order_events(order_ids, event_type='status'):
+    """
+    تنشر حدثاً لكل طلب (مع بطاقته) في قناة مقهاه وقناة كل المقاهي.
+    تُستدعى بعد نجاح المعاملة (transaction.on_commit) حتى تكون عناصر الطلب محفوظة.
+    """
+    orders = list(
+        Order.objects.filter(id__in=order_ids)
+        .select_related('user', 'cafe')
+        .prefetch_related('items__product')
+    )
+    # الحالات أولاً: فشل رسم البطاقات بعدها لا يترك منتظري long-poll على حالة قديمة
+    cache.set_many({ORDER_STATUS_KEY.format(order_id=order.id): order.status for order in orders}, ORDER_STATUS_TTL)
+
+    # الإعدادات للبطاقات فقط، فلا نقرأها قبل نشر الحالات ولا إذا كانت كل الطلبات منتهية
+    system_settings = None
+    for order in orders:
+        finished = order.status in FINISHED_STATUSES
+        if not finished and system_settings is None:
+            system_settings = get_system_settings()
+        event = {
+            'type': event_type,
+            'order_id': order.id,
+            'status': order.status,
+            'html': '' if finished else render_order_card(order, system_settings),
+        }
+        for channel in _channels(order.cafe_id):
+            cache.set(EVENT_KEY.format(channel=channel, seq=_next_seq(channel)), event, EVENT_TTL)
+
+
+def _format_event(event_id, name, data):
+    return f"id: {event_id}\nevent: {name}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def stream_order_events(channel, last_event_id=None):
+    """
+    مولّد نص event-stream لقناة واحدة.
+    إذا فاتت العميل أحداث لم تعد في الكاش يُرسل حدث reload ليعيد تحميل الصفحة مرة واحدة.
+    """
+    # لا نحتاج قاعدة البيانات أثناء البث
+    connection.close()
+
+    seq_key = EVENTS_SEQ_KEY.format(channel=channel)
+    last_id = get_last_event_id(channel) if last_event_id is None else last_event_id
+    started = last_beat = time.monotonic()
+    yield f"retry: {STREAM_RETRY_MS}\n\n"
+
+    while time.monotonic() - started < STREAM_MAX_SECONDS:
+        current = cache.get(seq_key) or 0
+        if current != last_id:
+            keys = [EVENT_KEY.format(channel=channel, seq=seq) for seq in range(last_id + 1, current + 1)]
+            events = cache.get_many(keys) if 0 < len(keys) <= MAX_REPLAY_EVENTS else {}
+            if current < last_id or len(events) < len(keys):
+                yield _format_event(current, 'reload', {})
+            else:
+                for seq, key in enumerate(keys, start=last_id + 1):
+                    yield _format_event(seq, 'order', events[key])
+            last_id = current
+            last_beat = time.monotonic()
+        elif time.monotonic() - last_beat >= STREAM_HEARTBEAT:
+            yield ": ping\n\n"
+            last_beat = time.monotonic()
+        time.sleep(STREAM_POLL_INTERVAL)
+
+
+def remember_order_status(order_id, status):
+    # تصحيح حالة الكاش من قاعدة البيانات (مثلاً بعد نشر فشل في منتصفه)
+    cache.set(ORDER_STATUS_KEY.format(order_id=order_id), status, ORDER_STATUS_TTL)
+
+
+def wait_for_order_statuses(known_statuses, current_statuses, timeout=WAIT_DEFAULT_SECONDS):
+    """
+    تنتظر حتى تختلف حالة أحد الطلبات عن known_statuses ({order_id: الحالة لدى التطبيق}) أو تنتهي المهلة.
+    current_statuses هي الحالات المقروءة من قاعدة البيانات قبل الانتظار.
+    تعيد {order_id: الحالة الجديدة} للطلبات التي تغيرت، أو قاموساً فارغاً إذا لم يتغير شيء.
+    """
+    changed = {
+        order_id: status for order_id, status in current_statuses.items() if status != known_statuses[order_id]
+    }
+    if changed or timeout <= 0:
+        return changed
+
+    keys = {ORDER_STATUS_KEY.format(order_id=order_id): order_id for order_id in current_statuses}
+    # add وليس set: لو نُشرت حالة أحدث بين قراءة قاعدة البيانات وهذا السطر لا نكتب فوقها
+    for key, order_id in keys.items():
+        cache.add(key, current_statuses[order_id], ORDER_STATUS_TTL)
+    # لا نمسك اتصالاً بقاعدة البيانات طوال الانتظار
+    connection.close()
+
+    deadline = time.monotonic() + min(timeout, WAIT_MAX_SECONDS)
+    while True:
+        changed = {
+            keys[key]: status
+            for key, status in cache.get_many(keys).items()
+            if status != known_statuses[keys[key]]
+        }
+        if changed or time.monotonic() >= deadline:
+            return changed
+        time.sleep(WAIT_POLL_INTERVAL)
+
+
+def wait_for_order_status(order_id, current_status, known_status, timeout=WAIT_DEFAULT_SECONDS):
+    """
+    نفس wait_for_order_statuses لطلب واحد: تعيد الحالة الجديدة، أو None إذا لم تتغير.
+    """
+    return wait_for_order_statuses({order_id: known_status}, {order_id: current_status}, timeout).get(order_id)
@@ -0,0 +1,289 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from .catalog import get_price_table
+from .models import Order, OrderItem, Product
+from .order_events import publish_order_events
+from .pagination import keyset_after
+from .utils import decode_cursor, encode_cursor, send_bulk_notifications
+from wallet.models import Transaction, Wallet
+
+# --- إنشاء الطلبات ---
+# مسار كتابة واحد لكل نقاط إنشاء الطلب (api/orders/ و api/orders/create/):
+# استعلام واحد للمنتجات (قاموس حسب المعرف) وإدخال كل العناصر بـ bulk_create،
+# لذلك عدد الاستعلامات ثابت مهما كان عدد العناصر.
+OPTIONS_MAX_LENGTH = OrderItem._meta.get_field('options').max_length
+MAX_ITEM_QUANTITY = 100
+
+
+class OrderError(Exception):
+    def __init__(self, message, status=400, **extra):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        # حقول إضافية تُعاد للتطبيق مع رسالة الخطأ (مثل المنتجات غير المتاحة)
+        self.extra = extra
+
+    def as_response_data(self):
+        return {'error': self.message, **self.extra}
+
+
+def _parse_lines(items_data):
+    """
+    تحويل عناصر الطلب القادمة من التطبيق إلى [(product_id, quantity, options)].
+    """
+    if not isinstance(items_data, list) or not items_data:
+        raise OrderError('لا توجد عناصر في الطلب.')
+
+    lines = []
+    for item in items_data:
+        if not isinstance(item, dict):
+            raise OrderError('بيانات الطلب غير صحيحة.')
+        try:
+            product_id = int(item.get('product_id'))
+            quantity = int(item.get('quantity', item.get('qty', 1)))
+        except (TypeError, ValueError):
+            raise OrderError('بيانات الطلب غير صحيحة.')
+        if quantity < 1:
+            raise OrderError('الكمية يجب أن تكون 1 على الأقل.')
+        if quantity > MAX_ITEM_QUANTITY:
+            raise OrderError(f'الكمية يجب ألا تتجاوز {MAX_ITEM_QUANTITY}.')
+        options = str(item.get('options') or item.get('note') or '')[:OPTIONS_MAX_LENGTH]
+        lines.append((product_id, quantity, options))
+    return lines
+
+
+def price_lines(lines, price_of):
+    """
+    تسعير عناصر الطلب من جانب الخادم.
+    price_of(product_id) تعيد (cafe_id, price, is_available) أو None إذا لم يوجد المنتج.
+    تعيد (الإجمالي، رقم المقهى، [(product_id, quantity, options, unit_price)]).
+    """
+    missing, unavailable, cafes = [], [], set()
+    priced = []
+    total = Decimal('0')
+    for product_id, quantity, options in lines:
+        entry = price_of(product_id)
+        if entry is None:
+            missing.append(product_id)
+            continue
+        cafe_id, price, is_available = entry
+        if not is_available:
+            unavailable.append(product_id)
+            continue
+        cafes.add(cafe_id)
+        priced.append((product_id, quantity, options, price))
+        total += price * quantity
+
+    if missing:
+        raise OrderError('بعض المنتجات غير موجودة.', missing=missing, unavailable=unavailable)
+    if unavailable:
+        raise OrderError('بعض المنتجات غير متاحة حالياً.', unavailable=unavailable)
+    if len(cafes) != 1:
+        raise OrderError('لا يمكن طلب منتجات من أكثر من مقهى في نفس الطلب.')
+    return total, cafes.pop(), priced
+
+
+def quote_order(items_data, cafe_id=None):
+    """
+    التحقق من سلة التطبيق وتسعيرها من جدول أسعار المقهى المخزن (بدون قاعدة بيانات عند دفء الكاش).
+    بدون cafe_id نجلب أسعار المنتجات المطلوبة فقط باستعلام واحد بدلاً من فهرس كل المقاهي.
+    المبالغ نصوص مثل بقية مبالغ الـ API حتى لا تفقد دقتها في JSON.
+    """
+    lines = _parse_lines(items_data)
+    if cafe_id:
+        price_of = get_price_table(cafe_id).get
+    else:
+        rows = Product.objects.filter(id__in={product_id for product_id, _, _ in lines}).values_list(
+            'id', 'cafe_id', 'price', 'is_available',
+        )
+        price_of = {row[0]: row[1:] for row in rows}.get
+
+    total, cafe_id, priced = price_lines(lines, price_of)
+    return {
+        'cafe_id': cafe_id,
+        'total_price': str(total),
+        'items': [
+            {
+                'product_id': product_id,
+                'quantity': quantity,
+                'unit_price': str(unit_price),
+                'line_total': str(unit_price * quantity),
+            }
+            for product_id, quantity, _, unit_price in priced
+        ],
+    }
+
+
+def place_order(user, items_data, expected_total=None, payment_method='WALLET'):
+    """
+    إنشاء طلب مع عناصره وخصم قيمته من المحفظة داخل معاملة واحدة.
+    الإجمالي يُحسب من أسعار المنتجات في قاعدة البيانات (نفس استعلام جلب المنتجات)،
+    وإذا أرسل التطبيق إجمالياً مختلفاً يُرفض الطلب (409) مع الإجمالي الصحيح.
+    ترفع OrderError (مع رمز الحالة المناسب) وعندها لا يُحفظ أي شيء.
+    """
+    lines = _parse_lines(items_data)
+
+    with transaction.atomic():
+        products = Product.objects.in_bulk({product_id for product_id, _, _ in lines})
+
+        def price_of(product_id):
+            product = products.get(product_id)
+            return (product.cafe_id, product.price, product.is_available) if product else None
+
+        total_price, target_cafe_id, priced = price_lines(lines, price_of)
+        if expected_total is not None and Decimal(str(expected_total)) != total_price:
+            raise OrderError('تغيرت أسعار بعض المنتجات، يرجى مراجعة السلة.', status=409, total_price=str(total_price))
+
+        if payment_method == 'WALLET':
+            wallet = Wallet.objects.select_for_update().filter(user=user).first()
+            if wallet is None:
+                raise OrderError('المحفظة غير موجودة.', status=404)
+            if wallet.balance < total_price:
+                raise OrderError('رصيد المحفظة غير كافٍ.')
+
+            Transaction.objects.create(
+                wallet=wallet,
+                amount=total_price,
+                transaction_type='WITHDRAWAL',
+                source='APP',
+                description='خصم طلب',
+            )
+
+        order = Order.objects.create(
+            user=user,
+            cafe_id=target_cafe_id,
+            total_price=total_price,
+            status='PENDING',
+            payment_method=payment_method,
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                product=products[product_id],
+                quantity=quantity,
+                price=unit_price,
+                options=options,
+            )
+            for product_id, quantity, options, unit_price in priced
+        ])
+
+    return order
+
+
+# --- سجل طلبات المستخدم ---
+ORDER_CHANGES_PAGE_SIZE = 50
+
+
+def user_orders_queryset(user):
+    # كل ما يحتاجه OrderSerializer مسبقاً: المقهى، العناصر ومنتجاتها
+    return (
+        Order.objects.filter(user=user)
+        .select_related('cafe')
+        .prefetch_related('items__product')
+    )
+
+
+def _order_position(order):
+    return [order.updated_at.isoformat(), order.id]
+
+
+def get_orders_sync_cursor(user):
+    """
+    مؤشر المزامنة عند آخر طلب تغير للمستخدم؛ يبدأ منه التطبيق الاستعلام بـ ?since=.
+    """
+    last = Order.objects.filter(user=user).only('id', 'updated_at').order_by('-updated_at', '-id').first()
+    return encode_cursor(_order_position(last) if last else None)
+
+
+def load_order_changes(user, since, limit=ORDER_CHANGES_PAGE_SIZE):
+    """
+    طلبات المستخدم التي أُنشئت أو تغيرت حالتها بعد since.
+    تعيد (الطلبات، cursor جديد، has_more). ترفع ValueError إذا كان الـ cursor غير صالح.
+    """
+    position = decode_cursor(since)
+    if position is not None and (not isinstance(position, list) or len(position) != 2):
+        raise ValueError('Invalid cursor')
+
+    orders = user_orders_queryset(user).order_by('updated_at', 'id')
+    if position:
+        orders = keyset_after(orders, 'updated_at', position)
+
+    changed = list(orders[:limit + 1])
+    has_more = len(changed) > limit
+    changed = changed[:limit]
+    if changed:
+        position = _order_position(changed[-1])
+    return changed, encode_cursor(position), has_more
+
+
+# --- انتقالات حالة الطلب ---
+# الحالة الجديدة -> الحالة التي يجب أن يكون عليها الطلب قبلها
+ORDER_TRANSITIONS = {
+    'ACCEPTED': 'PENDING',
+    'PREPARING': 'ACCEPTED',
+    'READY': 'PREPARING',
+    'COMPLETED': 'READY',
+}
+
+# إشعارات المستخدم عند تغير الحالة (نفس النصوص في signals لتعديلات لوحة الأدمن)
+STATUS_NOTIFICATIONS = {
+    'COMPLETED': ("تم الاستلام ✅", "تم تسليم الطلب #{number}. شكراً لاستخدامك تطبيقنا."),
+    'CANCELLED': ("تم إلغاء الطلب ❌", "عذراً، تم إلغاء الطلب #{number}. يرجى مراجعة الإدارة."),
+}
+
+
+def status_notification(order):
+    """
+    تعيد (user, title, body) لإشعار حالة الطلب، أو None إذا لم تكن الحالة تستدعي إشعاراً.
+    """
+    template = STATUS_NOTIFICATIONS.get(order.status)
+    if template is None:
+        return None
+    title, body = template
+    return order.user, title, body.format(number=order.order_number)
+
+
+def _after_transition(order_ids):
+    # بعد نجاح المعاملة: بث البطاقات للوحة المباشرة وإرسال إشعارات الدفعة معاً
+    publish_order_events(order_ids)
+    orders = Order.objects.filter(id__in=order_ids).select_related('user')
+    send_bulk_notifications([note for note in map(status_notification, orders) if note])
+
+
+def transition_orders(new_status, order_ids=None, cafe=None):
+    """
+    نقل مجموعة طلبات إلى new_status بتحديث واحد مشروط بالحالة السابقة
+    (UPDATE ... WHERE status=<السابقة>)، وتعيد أرقام الطلبات التي انتقلت فعلاً.
+    order_ids=None تعني كل طلبات المقهى في الحالة السابقة (مثل "قبول كل الطلبات الجديدة").
+    """
+    expected = ORDER_TRANSITIONS.get(new_status)
+    if expected is None:
+        raise OrderError('انتقال حالة غير مسموح.')
+
+    orders = Order.objects.filter(status=expected)
+    if cafe is not None:
+        orders = orders.filter(cafe=cafe)
+    if order_ids is not None:
+        orders = orders.filter(id__in=order_ids)
+
+    with transaction.atomic():
+        # قفل الصفوف المطابقة حيث تدعم القاعدة ذلك (SQLite تتجاهل select_for_update)
+        candidates = list(orders.select_for_update().values_list('id', flat=True))
+        if not candidates:
+            return []
+        # update() لا يطبق auto_now، و updated_at هو ما تعتمد عليه مزامنة التطبيق (?since=)
+        stamp = timezone.now()
+        count = Order.objects.filter(id__in=candidates, status=expected).update(status=new_status, updated_at=stamp)
+        if count == len(candidates):
+            moved = candidates
+        else:
+            # طلب متزامن نقل بعض الطلبات قبلنا: ما انتقل فعلاً هو ما يحمل ختم هذا التحديث
+            moved = list(
+                Order.objects.filter(id__in=candidates, status=new_status, updated_at=stamp).values_list('id', flat=True)
+            ) if count else []
+        if moved:
+            transaction.on_commit(lambda: _after_transition(moved), robust=True)
+    return moved
@@ -0,0 +1,103 @@
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .utils import decode_cursor, encode_cursor
+
+# --- ترقيم الصفحات بالمؤشر (Keyset) على (created_at, id) ---
+# لا نستخدم OFFSET لأنه يبطؤ كلما كبر السجل؛ المؤشر يحفظ آخر (created_at, id) تم إرساله.
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+# مؤشر المزامنة التزايدية (?since=) الذي يبدأ منه العميل بعد تحميل الصفحة الأولى
+SYNC_CURSOR_HEADER = 'X-Sync-Cursor'
+
+
+def _parse_moment(value):
+    # المؤشرات التي نصدرها تحمل المنطقة الزمنية دائماً؛ وقت بدونها لا يُقارن مع created_at
+    moment = parse_datetime(str(value))
+    if moment is None or timezone.is_naive(moment):
+        raise ValueError('Invalid cursor')
+    return moment
+
+
+def get_page_params(request, default_limit=DEFAULT_PAGE_SIZE, pk_type=int):
+    """
+    تقرأ ?cursor= و ?limit= من الطلب وتعيد (position, limit).
+    pk_type يحوّل معرف المؤشر لنوع المفتاح الأساسي (int، أو uuid.UUID لمعاملات المحفظة).
+    ترفع ValueError إذا كانت القيم غير صالحة.
+    """
+    raw_limit = request.GET.get('limit') or default_limit
+    if not str(raw_limit).isdigit() or int(raw_limit) < 1:
+        raise ValueError('Invalid limit')
+    limit = min(int(raw_limit), MAX_PAGE_SIZE)
+
+    cursor = request.GET.get('cursor')
+    if not cursor:
+        return None, limit
+
+    position = decode_cursor(cursor)
+    if not isinstance(position, list) or len(position) != 2:
+        raise ValueError('Invalid cursor')
+    created_at = _parse_moment(position[0])
+    try:
+        pk = pk_type(str(position[1]))
+    except (TypeError, ValueError):
+        raise ValueError('Invalid cursor')
+    return (created_at, pk), limit
+
+
+def _cursor_for(item):
+    return encode_cursor([item.created_at.isoformat(), str(item.pk)])
+
+
+def paginate_queryset(queryset, position, limit):
+    """
+    صفحة واحدة من queryset مرتب تنازلياً على (created_at, id).
+    تعيد (العناصر، المؤشر التالي أو None).
+    """
+    queryset = queryset.order_by('-created_at', '-pk')
+    if position:
+        created_at, pk = position
+        queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
+
+    items = list(queryset[:limit + 1])
+    if len(items) > limit:
+        items = items[:limit]
+        return items, _cursor_for(items[-1])
+    return items, None
+
+
+def paginate_list(items, position, limit):
+    """
+    نفس paginate_queryset لكن على قائمة جاهزة من الكاش (معرفات رقمية) مرتبة تنازلياً على (created_at, id).
+    """
+    if position:
+        created_at, pk = position[0], int(position[1])
+        items = [item for item in items if (item.created_at, item.pk) < (created_at, pk)]
+
+    page = items[:limit + 1]
+    if len(page) > limit:
+        page = page[:limit]
+        return page, _cursor_for(page[-1])
+    return page, None
+
+
+def keyset_after(queryset, field, position):
+    """
+    الصفوف التي تأتي بعد position = [وقت بصيغة iso، المعرف] في الترتيب التصاعدي على (field, id).
+    المعرف يفصل بين الصفوف التي لها نفس الوقت. ترفع ValueError إذا كان الموضع غير صالح.
+    """
+    if not isinstance(position, list) or len(position) != 2:
+        raise ValueError('Invalid cursor')
+    moment = _parse_moment(position[0])
+    if not str(position[1]).isdigit():
+        raise ValueError('Invalid cursor')
+    return queryset.filter(Q(**{f'{field}__gt': moment}) | Q(**{field: moment, 'id__gt': int(position[1])}))
+
+
+def with_next_cursor(response, next_cursor):
+    # جسم الاستجابة يبقى قائمة كما هو (توافق مع التطبيق)، والمؤشر التالي في الترويسة
+    if next_cursor:
+        response[NEXT_CURSOR_HEADER] = next_cursor
+    return response
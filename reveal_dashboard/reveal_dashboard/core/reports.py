@@ -0,0 +1,71 @@
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .catalog import bump_version, get_or_compute, get_version
+from .models import Product
+from wallet.models import Transaction, Wallet
+
+# --- ملخص صفحة التقارير ---
+# الأرقام تُحسب مرة واحدة وتُخزن لكل يوم، وتُبطل عند أي حركة محفظة أو تعديل منتج.
+REPORTS_TTL = 600
+REPORTS_VERSION_KEY = "reports:ver"
+REPORTS_KEY = "reports:rollup:{day}:v{version}"
+LATEST_TRANSACTIONS = 10
+
+
+def invalidate_reports_cache():
+    bump_version(REPORTS_VERSION_KEY)
+
+
+def _latest_transactions():
+    latest_qs = Transaction.objects.select_related('wallet', 'wallet__user').order_by('-created_at')[:LATEST_TRANSACTIONS]
+    balances = {}
+    latest_transactions = []
+
+    for trans in latest_qs:
+        wallet_id = trans.wallet_id
+        if wallet_id not in balances:
+            balances[wallet_id] = trans.wallet.balance
+
+        current_balance = balances[wallet_id]
+        latest_transactions.append({
+            'type': 'deposit' if trans.transaction_type == 'DEPOSIT' else 'refund',
+            'amount': trans.amount,
+            'wallet_owner': getattr(trans.wallet.user, 'full_name', str(trans.wallet.user)),
+            'new_balance': current_balance,
+            'timestamp': trans.created_at,
+        })
+
+        if trans.transaction_type == 'DEPOSIT':
+            balances[wallet_id] = current_balance - trans.amount
+        elif trans.transaction_type == 'WITHDRAWAL':
+            balances[wallet_id] = current_balance + trans.amount
+
+    return latest_transactions
+
+
+def _build_rollup(day):
+    wallets = Wallet.objects.aggregate(count=Count('id'), total=Sum('balance'))
+    today = Transaction.objects.filter(created_at__date=day).aggregate(
+        deposits=Sum('amount', filter=Q(transaction_type='DEPOSIT')),
+        deposits_count=Count('id', filter=Q(transaction_type='DEPOSIT')),
+        refunds=Sum('amount', filter=Q(transaction_type='WITHDRAWAL')),
+    )
+    return {
+        'product_count': Product.objects.count(),
+        'wallet_count': wallets['count'],
+        'total_system_balance': wallets['total'] or 0,
+        'total_deposits_today': today['deposits'] or 0,
+        'deposits_count_today': today['deposits_count'],
+        'total_refunds_today': today['refunds'] or 0,
+        'latest_transactions': _latest_transactions(),
+    }
+
+
+def get_report_rollup(day=None):
+    """
+    أرقام صفحة التقارير (عدد المنتجات والمحافظ، الأرصدة، حركات اليوم، آخر الحركات).
+    """
+    day = day or timezone.localdate()
+    key = REPORTS_KEY.format(day=day.isoformat(), version=get_version(REPORTS_VERSION_KEY))
+    return get_or_compute(key, lambda: _build_rollup(day), REPORTS_TTL)
@@ -0,0 +1,141 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Product
+
+# --- البحث النصي في المنتجات (SQLite FTS5) ---
+# الفهرس يخزن نصاً "مطبّعاً" (بدون تشكيل، والألف/الياء/التاء المربوطة بصيغة واحدة)،
+# ونطبّع نص البحث بنفس الطريقة، لذلك "قهوة" تطابق "قَهوه" و"أيس" تطابق "ايس".
+FTS_TABLE = 'core_product_fts'
+SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 50
+
+CREATE_FTS_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "name, description, category, cafe_id UNINDEXED, "
+    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+)
+DROP_FTS_SQL = f"DROP TABLE IF EXISTS {FTS_TABLE}"
+
+TASHKEEL_RE = re.compile('[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED\u0640]')
+ARABIC_LETTERS = str.maketrans({
+    'أ': 'ا',
+    'إ': 'ا',
+    'آ': 'ا',
+    'ٱ': 'ا',
+    'ى': 'ي',
+    'ئ': 'ي',
+    'ؤ': 'و',
+    'ة': 'ه',
+})
+TOKEN_RE = re.compile(r'\w+')
+
+_fts_available = None
+
+
+def normalize_arabic(text):
+    """
+    توحيد النص العربي للبحث: حذف التشكيل والتطويل وتوحيد صور الألف والياء والتاء المربوطة.
+    """
+    if not text:
+        return ''
+    text = TASHKEEL_RE.sub('', str(text))
+    return text.translate(ARABIC_LETTERS).lower()
+
+
+def fts_available():
+    global _fts_available
+    if _fts_available is None:
+        if connection.vendor != 'sqlite':
+            _fts_available = False
+        else:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE name = %s", [FTS_TABLE])
+                _fts_available = cursor.fetchone() is not None
+    return _fts_available
+
+
+def _index_row(product):
+    category_name = product.category.name if product.category_id else ''
+    return [
+        product.id,
+        normalize_arabic(product.name),
+        normalize_arabic(product.description),
+        normalize_arabic(category_name),
+        product.cafe_id,
+    ]
+
+
+def index_products(products):
+    """
+    إضافة/تحديث منتجات في فهرس البحث (عند الحفظ أو تعديل الفئة).
+    """
+    if not fts_available():
+        return
+    rows = [_index_row(product) for product in products]
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [[row[0]] for row in rows])
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, name, description, category, cafe_id) VALUES (%s, %s, %s, %s, %s)",
+            rows,
+        )
+
+
+def remove_product(product_id):
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [product_id])
+
+
+def rebuild_index():
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+    index_products(Product.objects.select_related('category').iterator(chunk_size=2000))
+
+
+def _match_expression(query):
+    # كل كلمة تُطابق كبادئة، والكلمات مجتمعة (AND). نص المستخدم لا يمر كصيغة FTS خام.
+    tokens = TOKEN_RE.findall(normalize_arabic(query))
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def search_products(query, cafe_id=None, limit=SEARCH_LIMIT):
+    """
+    تعيد قائمة المنتجات المطابقة مرتبة حسب الصلة.
+    """
+    limit = max(1, min(int(limit), MAX_SEARCH_LIMIT))
+    match = _match_expression(query)
+    if not match:
+        return []
+
+    if not fts_available():
+        # قواعد بيانات غير SQLite: بحث بسيط بدون تطبيع
+        products = Product.objects.select_related('cafe', 'category').filter(
+            Q(name__icontains=query) | Q(description__icontains=query) | Q(category__name__icontains=query)
+        )
+        if cafe_id:
+            products = products.filter(cafe_id=cafe_id)
+        return list(products.order_by('-created_at')[:limit])
+
+    sql = f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s"
+    params = [match]
+    if cafe_id:
+        sql += " AND cafe_id = %s"
+        params.append(cafe_id)
+    sql += " ORDER BY rank LIMIT %s"
+    params.append(limit)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        ids = [row[0] for row in cursor.fetchall()]
+
+    found = Product.objects.select_related('cafe', 'category').in_bulk(ids)
+    return [found[product_id] for product_id in ids if product_id in found]
+
@@ -1,4 +1,6 @@
+from django.core.files.storage import default_storage
 from rest_framework import serializers
+from .images import variant_urls
 from .models import Cafe, Product, Order, OrderItem, Category
 from users.models import User
 
@@ -17,6 +19,29 @@ def _build_image_url(image_value, request=None):
     return f"/media/{image_str}" if not image_str.startswith('/media/') else image_str
 
 
+def _build_media_url(name, request=None):
+    if not name:
+        return None
+    url = default_storage.url(name)
+    return request.build_absolute_uri(url) if request else url
+
+
+def _build_variant_urls(variants, request=None):
+    urls = variant_urls(variants)
+    if request:
+        for formats in urls.values():
+            for extension, url in formats.items():
+                formats[extension] = request.build_absolute_uri(url)
+    return urls
+
+
+def _image_variant(obj):
+    # image_variant_count محسوب مسبقاً عند حفظ المنتج (Product.refresh_image_defaults)
+    if not obj.id:
+        return 0
+    return int(obj.id) % (obj.image_variant_count or 1)
+
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -33,15 +58,19 @@ class UserSerializer(serializers.ModelSerializer):
 
 class CafeSerializer(serializers.ModelSerializer):
     image = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Cafe
-        fields = ['id', 'name', 'image', 'location', 'is_active']
+        fields = ['id', 'name', 'image', 'image_variants', 'location', 'is_active']
 
     def get_image(self, obj):
         request = self.context.get('request')
         return _build_image_url(obj.image, request)
 
+    def get_image_variants(self, obj):
+        return _build_variant_urls(obj.image_variants, self.context.get('request'))
+
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -59,11 +88,13 @@ class ProductSerializer(serializers.ModelSerializer):
     image = serializers.SerializerMethodField()
     image_url = serializers.SerializerMethodField()
     image_variant = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
+    default_image = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
         fields = [
-            'id', 'name', 'price', 'image', 'image_url', 'image_variant', 'description',
+            'id', 'name', 'price', 'image', 'image_url', 'image_variant', 'image_variants', 'default_image', 'description',
             'rating', 'rating_count',
             'category', 'category_name', 'category_id',
             'cafe', 'cafe_name', 'cafe_id',
@@ -79,31 +110,46 @@ class ProductSerializer(serializers.ModelSerializer):
         return _build_image_url(obj.image, request)
 
     def get_image_variant(self, obj):
-        category_name = ''
-        if getattr(obj, 'category', None) and obj.category:
-            category_name = (obj.category.name or '')
-
-        text = f"{category_name} {obj.name or ''}".lower()
-
-        def has_any(values):
-            return any(value in text for value in values)
-
-        if has_any(['pizza', 'بيتزا']):
-            count = 5
-        elif has_any(['burger', 'برغر', 'برجر']):
-            count = 5
-        elif has_any(['dessert', 'sweet', 'حلويات', 'حلوى']):
-            count = 5
-        elif has_any(['coffee', 'قهوة']):
-            count = 2
-        elif has_any(['drink', 'drinks', 'juice', 'water', 'مشروب', 'مشروبات', 'عصير', 'ماء']):
-            count = 5
-        else:
-            count = 5
-
-        if not obj.id:
-            return 0
-        return int(obj.id) % count
+        return _image_variant(obj)
+
+    def get_image_variants(self, obj):
+        return _build_variant_urls(obj.image_variants, self.context.get('request'))
+
+    def get_default_image(self, obj):
+        return _build_media_url(obj.default_image, self.context.get('request'))
+
+
+class ProductLiteSerializer(serializers.ModelSerializer):
+    """
+    شكل مختصر للقوائم (?shape=lite): معرفات المقهى والفئة فقط بدل الكائنات المتداخلة،
+    وبيانات المقاهي والفئات تُرسل مرة واحدة بجانب القائمة.
+    """
+    category_id = serializers.IntegerField(read_only=True)
+    cafe_id = serializers.IntegerField(read_only=True)
+    image_url = serializers.SerializerMethodField()
+    image_variant = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
+    default_image = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Product
+        fields = [
+            'id', 'name', 'price', 'image_url', 'image_variant', 'image_variants', 'default_image', 'description',
+            'rating', 'rating_count', 'category_id', 'cafe_id', 'is_available',
+        ]
+
+    def get_image_url(self, obj):
+        request = self.context.get('request')
+        return _build_image_url(obj.image, request)
+
+    def get_image_variant(self, obj):
+        return _image_variant(obj)
+
+    def get_image_variants(self, obj):
+        return _build_variant_urls(obj.image_variants, self.context.get('request'))
+
+    def get_default_image(self, obj):
+        return _build_media_url(obj.default_image, self.context.get('request'))
 
 
 class OrderItemSerializer(serializers.ModelSerializer):
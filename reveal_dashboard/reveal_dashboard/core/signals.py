@@ -1,7 +1,136 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_save
 from django.dispatch import receiver
-from .models import Order
+from django.utils import timezone
+from .catalog import (
+    ensure_default_categories,
+    invalidate_cafes_cache,
+    invalidate_products_cache,
+    invalidate_system_settings,
+)
+from .images import refresh_image_variants
+from .models import Cafe, Category, Order, Product, ProductTombstone, SystemSettings
+from .order_events import publish_order_events
+from .orders import status_notification
+from .reports import invalidate_reports_cache
+from .search import index_products, remove_product
 from .utils import send_real_notification
+from wallet.models import Transaction, Wallet
+
+
+@receiver(pre_save, sender=Product)
+def product_previous_cafe(sender, instance, raw=False, **kwargs):
+    # نقل منتج لمقهى آخر (من لوحة الأدمن) يجب أن يُبطل شريحة المقهى القديم أيضاً
+    if instance.pk and not raw:
+        instance._previous_cafe_id = (
+            Product.objects.filter(pk=instance.pk).values_list('cafe_id', flat=True).first()
+        )
+
+
+@receiver([post_save, post_delete], sender=Product)
+def product_catalog_changed(sender, instance, **kwargs):
+    """
+    أي إضافة أو تعديل أو حذف لمنتج (من الداش بورد أو لوحة الأدمن) تُبطل شريحة مقهاه فقط.
+    """
+    invalidate_products_cache(instance.cafe_id)
+    previous_cafe_id = getattr(instance, '_previous_cafe_id', None)
+    if previous_cafe_id and previous_cafe_id != instance.cafe_id:
+        invalidate_products_cache(previous_cafe_id)
+
+
+@receiver(post_delete, sender=Product)
+def product_tombstone(sender, instance, **kwargs):
+    # أثر الحذف للمزامنة التزايدية (/api/products/changes/)
+    ProductTombstone.objects.create(product_id=instance.id, cafe_id=instance.cafe_id)
+    remove_product(instance.id)
+
+
+@receiver(post_save, sender=Product)
+def product_search_index(sender, instance, **kwargs):
+    index_products([instance])
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Cafe)
+def image_variants_changed(sender, instance, **kwargs):
+    """
+    توليد النسخ المصغرة (WebP/JPEG) عند رفع صورة جديدة لمنتج أو مقهى.
+    """
+    try:
+        updated = refresh_image_variants(instance)
+    except Exception as e:
+        print(f"❌ Error building image variants for {instance}: {e}")
+        return
+
+    if updated:
+        if sender is Cafe:
+            invalidate_cafes_cache()
+            invalidate_products_cache(instance.id)
+        else:
+            invalidate_products_cache(instance.cafe_id)
+
+
+@receiver([post_save, post_delete], sender=Cafe)
+def cafe_catalog_changed(sender, instance, **kwargs):
+    # بيانات المقهى مضمّنة داخل كل منتج
+    invalidate_products_cache(instance.id)
+    invalidate_cafes_cache()
+
+
+@receiver(post_save, sender=Cafe)
+def cafe_products_touched(sender, instance, created, **kwargs):
+    if not created:
+        Product.objects.filter(cafe=instance).update(updated_at=timezone.now())
+
+
+@receiver([post_save, post_delete], sender=Category)
+def category_catalog_changed(sender, instance, **kwargs):
+    # الفئة مشتركة بين كل المقاهي
+    invalidate_products_cache()
+
+
+@receiver(post_save, sender=Category)
+def category_products_touched(sender, instance, created, **kwargs):
+    # اسم الفئة جزء من بيانات المنتج وتصنيف صورته، فنعيد حسابه ونعتبر المنتجات معدلة للمزامنة التزايدية
+    if not created:
+        products = list(Product.objects.filter(category=instance))
+        for product in products:
+            product.category = instance
+            product.refresh_image_defaults()
+            product.updated_at = timezone.now()
+        Product.objects.bulk_update(products, ['image_variant_count', 'default_image', 'updated_at'])
+        index_products(products)
+
+
+@receiver(post_save, sender=SystemSettings)
+def system_settings_changed(sender, instance, **kwargs):
+    invalidate_system_settings()
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Wallet)
+@receiver([post_save, post_delete], sender=Transaction)
+def reports_changed(sender, instance, **kwargs):
+    invalidate_reports_cache()
+
+
+@receiver(post_migrate)
+def default_categories(sender, app_config=None, **kwargs):
+    # سجل الفئات الافتراضية يُضمن مرة واحدة بعد migrate وليس مع كل طلب
+    if app_config is not None and app_config.name == 'core':
+        ensure_default_categories()
+
+
+@receiver(post_save, sender=Order)
+def order_board_event(sender, instance, created, update_fields=None, **kwargs):
+    """
+    بث الطلب الجديد أو تغير حالته للوحة الطلبات المباشرة بعد نجاح المعاملة.
+    """
+    if created or update_fields is None or 'status' in update_fields:
+        # robust: فشل البث لا يجعل حفظ الطلب يبدو فاشلاً بعد أن تم فعلاً
+        event_type = 'created' if created else 'status'
+        transaction.on_commit(lambda: publish_order_events([instance.pk], event_type), robust=True)
+
 
 @receiver(post_save, sender=Order)
 def order_status_notification(sender, instance, created, **kwargs):
@@ -11,16 +140,6 @@ def order_status_notification(sender, instance, created, **kwargs):
     if created:
         # إشعار عند إنشاء الطلب لأول مرة (اختياري)
         return
-    elif instance.status == 'COMPLETED':
-        send_real_notification(
-            instance.user, 
-            "تم الاستلام ✅", 
-            f"تم تسليم الطلب #{instance.order_number}. شكراً لاستخدامك تطبيقنا."
-        )
-
-    elif instance.status == 'CANCELLED':
-        send_real_notification(
-            instance.user, 
-            "تم إلغاء الطلب ❌", 
-            f"عذراً، تم إلغاء الطلب #{instance.order_number}. يرجى مراجعة الإدارة."
-        )
\ No newline at end of file
+    notification = status_notification(instance)
+    if notification:
+        send_real_notification(*notification)
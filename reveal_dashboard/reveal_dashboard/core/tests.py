@@ -1,3 +1,1348 @@
-from django.test import TestCase
+import datetime
+import io
+import shutil
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.authtoken.models import Token
+
+from .catalog import (
+    DEFAULT_CATEGORY_NAMES, ensure_default_categories, get_catalog_version, get_categories_for_cafe, query_products,
+    set_products_availability,
+)
+from .models import Cafe, Category, IdempotencyKey, Order, OrderItem, OrderSequence, Product, SystemSettings
+from . import catalog, idempotency, images, order_events, search
+from .order_events import ORDER_STATUS_KEY, publish_order_events
+from .orders import OrderError, place_order, transition_orders
+from .reports import get_report_rollup
+from .serializers import ProductSerializer
+from .utils import encode_cursor
+from users.models import User
+from wallet.models import Transaction, Wallet
+
+
+class CreateOrderQueryCountTests(TestCase):
+    """
+    عدد استعلامات إنشاء الطلب يجب أن يبقى ثابتاً مهما زاد عدد العناصر.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user('order@test.local', password='pass1234', phone_number='0910000000')
+        self.token = Token.objects.create(user=self.user)
+        Transaction.objects.create(wallet=self.user.wallet, amount=Decimal('1000'), transaction_type='DEPOSIT')
+
+        cafe = Cafe.objects.create(name='مقهى')
+        category = Category.objects.create(name='قهوة')
+        self.products = [
+            Product.objects.create(cafe=cafe, category=category, name=f'منتج {i}', price=Decimal('2.50'))
+            for i in range(15)
+        ]
+
+    def _create_order(self, products):
+        items = [{'product_id': product.id, 'quantity': 2, 'options': 'بدون سكر'} for product in products]
+        total = sum(product.price * 2 for product in products)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                '/api/orders/create/',
+                {'total_price': str(total), 'items': items},
+                content_type='application/json',
+                HTTP_AUTHORIZATION=f'Token {self.token.key}',
+            )
+        self.assertEqual(response.status_code, 201, response.content)
+        return response, len(queries)
+
+    def test_query_count_does_not_grow_with_items(self):
+        # أول طلب في اليوم ينشئ عداد أرقام الطلبات، لذلك نقيس بعده
+        self._create_order(self.products[:1])
+        _, single_line = self._create_order(self.products[:1])
+        response, fifteen_lines = self._create_order(self.products)
+
+        self.assertEqual(fifteen_lines, single_line)
+        self.assertLessEqual(fifteen_lines, 15)
+
+        order = Order.objects.get(id=response.json()['order_id'])
+        self.assertEqual(order.items.count(), 15)
+        self.assertEqual(Wallet.objects.get(user=self.user).balance, Decimal('1000') - Decimal('5') * 17)
+
+    def test_failed_order_writes_nothing(self):
+        items = [{'product_id': self.products[0].id, 'quantity': 1}, {'product_id': 999999, 'quantity': 1}]
+        response = self.client.post(
+            '/api/orders/create/',
+            {'total_price': '5', 'items': items},
+            content_type='application/json',
+            HTTP_AUTHORIZATION=f'Token {self.token.key}',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(Wallet.objects.get(user=self.user).balance, Decimal('1000'))
+
+    def test_stale_total_is_rejected_with_current_total(self):
+        items = [{'product_id': self.products[0].id, 'quantity': 2}]
+        response = self.client.post(
+            '/api/orders/create/',
+            {'total_price': '4.00', 'items': items},
+            content_type='application/json',
+            HTTP_AUTHORIZATION=f'Token {self.token.key}',
+        )
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Decimal(str(response.json()['total_price'])), Decimal('5.00'))
+        self.assertFalse(Order.objects.exists())
+
+
+class QuoteOrderTests(TestCase):
+    """
+    تسعير السلة قبل التأكيد: الأسعار من الخادم، والمنتجات غير المتاحة تُعاد بأرقامها.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.cafe = Cafe.objects.create(name='مقهى')
+        category = Category.objects.create(name='قهوة')
+        self.coffee = Product.objects.create(cafe=self.cafe, category=category, name='قهوة', price=Decimal('2.50'))
+        self.tea = Product.objects.create(cafe=self.cafe, category=category, name='شاي', price=Decimal('1.25'), is_available=False)
+
+    def _quote(self, body):
+        return self.client.post('/api/orders/quote/', body, content_type='application/json')
+
+    def test_quote_uses_server_prices(self):
+        response = self._quote({'items': [{'product_id': self.coffee.id, 'quantity': 3}]})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['total_price'], '7.50')
+        self.assertEqual(data['items'][0]['unit_price'], '2.50')
+        self.assertEqual(data['items'][0]['line_total'], '7.50')
+
+    def test_quantity_is_bounded(self):
+        response = self._quote({'items': [{'product_id': self.coffee.id, 'quantity': 10 ** 9}]})
+        self.assertEqual(response.status_code, 400)
+
+    def test_quote_with_cafe_is_served_from_the_cafe_price_table(self):
+        body = {'cafe_id': self.cafe.id, 'items': [{'product_id': self.coffee.id, 'quantity': 2}]}
+        self._quote(body)
+        with CaptureQueriesContext(connection) as queries:
+            response = self._quote(body)
+        self.assertEqual(response.json()['total_price'], '5.00')
+        self.assertEqual(len(queries), 0)
+
+    def test_quote_without_cafe_loads_only_the_requested_products(self):
+        with mock.patch('core.catalog.get_products_index') as index:
+            with CaptureQueriesContext(connection) as queries:
+                response = self._quote({'items': [{'product_id': self.coffee.id, 'quantity': 1}]})
+        index.assert_not_called()
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(response.json()['cafe_id'], self.cafe.id)
+
+    def test_unavailable_product(self):
+        response = self._quote({'items': [{'product_id': self.tea.id, 'quantity': 1}]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['unavailable'], [self.tea.id])
+
+    def test_non_object_body(self):
+        self.assertEqual(self._quote([1, 2]).status_code, 400)
+
+
+class OrderNumberTests(TestCase):
+    """
+    أرقام الطلبات قصيرة ومتسلسلة لكل مقهى في كل يوم.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user('numbers@test.local', password='pass1234', phone_number='0910000001')
+        self.cafe = Cafe.objects.create(name='مقهى أ')
+        self.other_cafe = Cafe.objects.create(name='مقهى ب')
+
+    def _order(self, cafe, **kwargs):
+        return Order.objects.create(user=self.user, cafe=cafe, total_price=Decimal('1'), **kwargs)
+
+    def test_sequence_per_cafe_and_day(self):
+        self.assertEqual([self._order(self.cafe).order_number for _ in range(3)], ['A-001', 'A-002', 'A-003'])
+        self.assertEqual(self._order(self.other_cafe).order_number, 'A-001')
+        yesterday = datetime.date.today() - datetime.timedelta(days=1)
+        self.assertEqual(self._order(self.cafe, business_day=yesterday).order_number, 'A-001')
+
+    def test_format_number(self):
+        self.assertEqual(OrderSequence.format_number(42), 'A-042')
+        self.assertEqual(OrderSequence.format_number(1000), 'B-000')
+        self.assertEqual(OrderSequence.format_number(26000), '26000')
+
+
+class OrderNumberStressTests(TransactionTestCase):
+    """
+    إنشاء طلبات من عدة خيوط في نفس الوقت بدون أي تكرار في الأرقام.
+    (للحمل الكامل: manage.py stress_order_numbers --orders 100000)
+    """
+
+    def test_concurrent_orders_get_unique_numbers(self):
+        out = StringIO()
+        call_command('stress_order_numbers', orders=300, workers=8, keep=True, stdout=out)
+        numbers = list(Order.objects.values_list('order_number', flat=True))
+        self.assertEqual(len(numbers), 300, out.getvalue())
+        self.assertEqual(len(set(numbers)), 300)
+        self.assertEqual(OrderSequence.objects.get().last_number, 300)
+
+
+class IdempotencyTests(TransactionTestCase):
+    """
+    Idempotency-Key: إعادة المحاولة تعيد نفس الاستجابة، والمفتاح المحجوز لا يُنفذ مرة ثانية.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user('idem@test.local', password=None, phone_number='0910000007')
+        self.token = Token.objects.create(user=self.user)
+        Transaction.objects.create(wallet=self.user.wallet, amount=Decimal('100'), transaction_type='DEPOSIT')
+        cafe = Cafe.objects.create(name='مقهى')
+        category = Category.objects.create(name='قهوة')
+        self.product = Product.objects.create(cafe=cafe, category=category, name='قهوة', price=Decimal('2.50'))
+
+    def _post(self, key, quantity=1):
+        return self.client.post(
+            '/api/orders/create/',
+            {'items': [{'product_id': self.product.id, 'quantity': quantity}]},
+            content_type='application/json',
+            HTTP_AUTHORIZATION=f'Token {self.token.key}',
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_retry_replays_the_first_response(self):
+        first = self._post('key-1')
+        second = self._post('key-1')
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(Wallet.objects.get(user=self.user).balance, Decimal('97.50'))
+
+    def test_same_key_with_different_body(self):
+        self._post('key-2')
+        self.assertEqual(self._post('key-2', quantity=2).status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_concurrent_retry_waits_for_the_first_request(self):
+        inside, release = threading.Event(), threading.Event()
+        results = {}
+
+        def slow_place_order(*args, **kwargs):
+            inside.set()
+            release.wait(5)
+            return place_order(*args, **kwargs)
+
+        def first_request():
+            results['first'] = self._post('key-3')
+            connection.close()
+
+        with mock.patch('core.api_views.place_order', slow_place_order):
+            thread = threading.Thread(target=first_request)
+            thread.start()
+            inside.wait(5)
+            concurrent = self._post('key-3')
+            release.set()
+            thread.join()
+
+        self.assertEqual(concurrent.status_code, 409)
+        self.assertEqual(results['first'].status_code, 201)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def _abandoned_claim(self, key, age):
+        # المحاولة الأولى حجزت المفتاح ثم توقف الخادم قبل أن تُحفظ معاملتها
+        body = {'items': [{'product_id': self.product.id, 'quantity': 1}]}
+        IdempotencyKey.objects.create(user=self.user, key=key, endpoint='create_order', request_hash=idempotency._request_hash(body))
+        IdempotencyKey.objects.filter(key=key).update(created_at=timezone.now() - datetime.timedelta(seconds=age))
+
+    def test_unfinished_claim_within_lease(self):
+        self._abandoned_claim('key-4', age=5)
+        response = self._post('key-4')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertFalse(Order.objects.exists())
+
+    def test_abandoned_claim_is_reclaimed_after_lease(self):
+        self._abandoned_claim('key-5', age=idempotency.CLAIM_LEASE + 5)
+        response = self._post('key-5')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(self._post('key-5')['Idempotent-Replayed'], 'true')
+
+    def test_slow_request_whose_claim_was_taken_rolls_back(self):
+        def place_order_then_lose_claim(*args, **kwargs):
+            order = place_order(*args, **kwargs)
+            # طلب آخر أعاد حجز المفتاح بعد انتهاء المهلة أثناء تنفيذنا
+            IdempotencyKey.objects.filter(key='key-6').update(created_at=timezone.now())
+            return order
+
+        with mock.patch('core.api_views.place_order', place_order_then_lose_claim):
+            response = self._post('key-6')
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(Wallet.objects.get(user=self.user).balance, Decimal('100'))
+
+class OrderTransitionTests(TestCase):
+    """
+    انتقالات حالة الطلب: تحديث مشروط بالحالة السابقة، وما نقله طلب آخر قبلنا لا يُحسب لنا.
+    """
+
+    def setUp(self):
+        self.staff = User.objects.create_user('board@test.local', password=None, phone_number='0910000008', is_staff=True)
+        self.customer = User.objects.create_user('buyer@test.local', password=None, phone_number='0910000009')
+        self.cafe = Cafe.objects.create(name='مقهى', owner=self.staff)
+        self.other_cafe = Cafe.objects.create(name='مقهى آخر')
+
+    def _order(self, status='PENDING', cafe=None):
+        return Order.objects.create(user=self.customer, cafe=cafe or self.cafe, total_price=Decimal('5'), status=status)
+
+    def test_state_machine(self):
+        order = self._order()
+        self.assertEqual(transition_orders('READY', [order.id]), [])
+        for status in ('ACCEPTED', 'PREPARING', 'READY', 'COMPLETED'):
+            self.assertEqual(transition_orders(status, [order.id]), [order.id])
+            order.refresh_from_db()
+            self.assertEqual(order.status, status)
+        with self.assertRaises(OrderError):
+            transition_orders('PENDING', [order.id])
+
+    def test_move_all_is_limited_to_the_cafe(self):
+        mine, theirs = self._order(), self._order(cafe=self.other_cafe)
+        self.assertEqual(transition_orders('ACCEPTED', cafe=self.cafe), [mine.id])
+        theirs.refresh_from_db()
+        self.assertEqual(theirs.status, 'PENDING')
+
+    def test_orders_moved_concurrently_are_not_reported(self):
+        first, second = self._order(), self._order()
+        real_now = timezone.now
+
+        def now_after_concurrent_move():
+            # طلب آخر ينقل second بين قراءة المرشحين والتحديث
+            Order.objects.filter(id=second.id).update(status='ACCEPTED', updated_at=real_now() - datetime.timedelta(seconds=1))
+            return real_now()
+
+        with mock.patch('core.orders.timezone.now', now_after_concurrent_move):
+            moved = transition_orders('ACCEPTED', [first.id, second.id])
+        self.assertEqual(moved, [first.id])
+
+    def test_bulk_status_json(self):
+        pending, accepted = self._order(), self._order('ACCEPTED')
+        self.client.force_login(self.staff)
+        response = self.client.post(
+            '/orders/bulk-status/',
+            {'status': 'ACCEPTED', 'order_ids': [pending.id, accepted.id]},
+            HTTP_ACCEPT='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'status': 'ACCEPTED', 'transitioned': [pending.id], 'skipped': [accepted.id]})
+
+        response = self.client.post('/orders/bulk-status/', {'status': 'BOGUS', 'all': '1'}, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+@mock.patch.multiple(order_events, STREAM_MAX_SECONDS=0.1, STREAM_POLL_INTERVAL=0.01)
+class OrderEventStreamTests(SimpleTestCase):
+    """
+    بث لوحة الطلبات: إعادة الأحداث الفائتة من Last-Event-ID، و reload إذا انتهت صلاحيتها، ونبضات keep-alive.
+    """
+
+    channel = 'test-stream'
+
+    def setUp(self):
+        cache.clear()
+
+    def _publish(self, order_id):
+        seq = order_events._next_seq(self.channel)
+        event = {'type': 'status', 'order_id': order_id, 'status': 'ACCEPTED', 'html': ''}
+        cache.set(order_events.EVENT_KEY.format(channel=self.channel, seq=seq), event)
+        return seq
+
+    def _stream(self, last_event_id=None):
+        return ''.join(order_events.stream_order_events(self.channel, last_event_id))
+
+    def test_replays_events_after_last_event_id(self):
+        self._publish(1)
+        self._publish(2)
+        self._publish(3)
+        body = self._stream(last_event_id=1)
+
+        self.assertTrue(body.startswith('retry: '))
+        self.assertNotIn('id: 1\n', body)
+        self.assertIn('id: 2\nevent: order\ndata: {"type": "status", "order_id": 2', body)
+        self.assertIn('id: 3\nevent: order', body)
+        self.assertNotIn('event: reload', body)
+
+    def test_reload_when_missed_events_expired(self):
+        for order_id in range(5):
+            self._publish(order_id)
+        cache.delete(order_events.EVENT_KEY.format(channel=self.channel, seq=3))
+        body = self._stream(last_event_id=1)
+
+        self.assertIn('id: 5\nevent: reload\n', body)
+        self.assertNotIn('event: order', body)
+
+    @mock.patch.object(order_events, 'STREAM_HEARTBEAT', 0.03)
+    def test_heartbeat_when_idle(self):
+        self._publish(1)
+        body = self._stream()
+
+        # بدون Last-Event-ID يبدأ البث من الحدث الحالي ولا يعيد ما قبله
+        self.assertNotIn('event: order', body)
+        self.assertIn(': ping\n\n', body)
+
+
+class OrdersPageQueryCountTests(TestCase):
+    """
+    صفحة الطلبات في الداش بورد تُبنى بعدد ثابت من الاستعلامات مهما زاد عدد الطلبات.
+    """
+
+    def setUp(self):
+        self.staff = User.objects.create_user('staff@test.local', password='pass1234', phone_number='0910000002', is_staff=True)
+        self.cafe = Cafe.objects.create(name='مقهى', owner=self.staff)
+        category = Category.objects.create(name='قهوة')
+        self.products = [
+            Product.objects.create(cafe=self.cafe, category=category, name=f'منتج {i}', price=Decimal('2.50'))
+            for i in range(3)
+        ]
+        SystemSettings.get_solo()
+        self.client.force_login(self.staff)
+
+    def _add_orders(self, count):
+        statuses = ['PENDING', 'ACCEPTED', 'PREPARING', 'READY', 'COMPLETED', 'CANCELLED']
+        for i in range(count):
+            customer = User.objects.create_user(f'c{count}-{i}@test.local', password=None, phone_number=f'092{count:03d}{i:04d}')
+            order = Order.objects.create(user=customer, cafe=self.cafe, total_price=Decimal('5'), status=statuses[i % len(statuses)])
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=product, quantity=1, price=product.price)
+                for product in self.products
+            ])
+
+    def _page_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/orders/')
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_query_count_is_constant(self):
+        self._page_queries()  # تسخين كاش إعدادات النظام وجلسة الدخول
+        self._add_orders(6)
+        _, few = self._page_queries()
+        self._add_orders(60)
+        response, many = self._page_queries()
+
+        self.assertEqual(many, few)
+        self.assertEqual(len(response.context['new_orders']), 11)
+        self.assertEqual(len(response.context['ready_orders']), 11)
+        self.assertEqual(len(response.context['history_orders']), 20)
+
+
+class OrdersLiveUpdatesTests(TestCase):
+    """
+    بث لوحة الطلبات يعمل فقط مع كاش مشترك؛ بدونه يرفض الخادم البث وتعود الصفحة للتحديث الدوري.
+    """
+
+    def setUp(self):
+        self.staff = User.objects.create_user('live@test.local', password=None, phone_number='0910000013', is_staff=True)
+        Cafe.objects.create(name='مقهى', owner=self.staff)
+        SystemSettings.get_solo()
+        self.client.force_login(self.staff)
+
+    @override_settings(LIVE_ORDER_UPDATES=False)
+    def test_without_shared_cache_the_board_polls(self):
+        self.assertEqual(self.client.get('/orders/stream/').status_code, 204)
+        response = self.client.get('/orders/')
+        self.assertFalse(response.context['live_updates'])
+        self.assertContains(response, 'if (!false || !window.EventSource)')
+
+    @override_settings(LIVE_ORDER_UPDATES=True)
+    def test_with_shared_cache_the_board_streams(self):
+        with mock.patch('core.views.stream_order_events', return_value=iter(['retry: 1000\n\n'])):
+            response = self.client.get('/orders/stream/')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(b''.join(response.streaming_content), b'retry: 1000\n\n')
+        self.assertTrue(self.client.get('/orders/').context['live_updates'])
+
+class UserOrdersSyncTests(TestCase):
+    """
+    سجل طلبات التطبيق: عدد استعلامات ثابت، ووضع ?since= يعيد ما تغير فقط.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user('sync@test.local', password=None, phone_number='0910000003')
+        self.token = Token.objects.create(user=self.user)
+        self.cafe = Cafe.objects.create(name='مقهى')
+        category = Category.objects.create(name='قهوة')
+        self.products = [
+            Product.objects.create(cafe=self.cafe, category=category, name=f'منتج {i}', price=Decimal('2.50'))
+            for i in range(3)
+        ]
+
+    def _add_orders(self, count):
+        orders = []
+        for _ in range(count):
+            order = Order.objects.create(user=self.user, cafe=self.cafe, total_price=Decimal('7.50'))
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=product, quantity=1, price=product.price)
+                for product in self.products
+            ])
+            orders.append(order)
+        return orders
+
+    def _get(self, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/orders/', params or {}, HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response, len(queries)
+
+    def test_query_count_is_constant(self):
+        self._add_orders(2)
+        _, few = self._get()
+        self._add_orders(20)
+        response, many = self._get()
+
+        self.assertEqual(many, few)
+        self.assertEqual(len(response.json()), 22)
+        self.assertEqual(len(response.json()[0]['items']), 3)
+
+    def test_history_is_complete_without_paging_params(self):
+        self._add_orders(60)
+        response, _ = self._get()
+        self.assertEqual(len(response.json()), 60)
+        self.assertNotIn('X-Next-Cursor', response)
+
+        response, _ = self._get({'limit': 50})
+        self.assertEqual(len(response.json()), 50)
+        response, _ = self._get({'cursor': response['X-Next-Cursor']})
+        self.assertEqual(len(response.json()), 10)
+
+    def test_since_returns_only_changed_orders(self):
+        first, second = self._add_orders(2)
+        response, _ = self._get()
+        cursor = response['X-Sync-Cursor']
+
+        response, _ = self._get({'since': cursor})
+        self.assertEqual(response.json()['changed'], [])
+        self.assertEqual(response.json()['cursor'], cursor)
+
+        first.status = 'ACCEPTED'
+        first.save()
+        response, _ = self._get({'since': cursor})
+        data = response.json()
+        self.assertEqual([order['id'] for order in data['changed']], [first.id])
+        self.assertEqual(data['changed'][0]['status'], 'ACCEPTED')
+        self.assertFalse(data['has_more'])
+
+        response, _ = self._get({'since': data['cursor']})
+        self.assertEqual(response.json()['changed'], [])
+
+    def test_invalid_since_cursor(self):
+        response = self.client.get('/api/orders/', {'since': 'not-a-cursor'}, HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(LIVE_ORDER_UPDATES=True)
+class WaitOrderStatusTests(TransactionTestCase):
+    """
+    long-poll حالة الطلبات: يعود فور تغير الحالة (بعد نجاح المعاملة) أو بعد المهلة بدون تغيير،
+    وبدون كاش مشترك يعود فوراً مع Retry-After.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('wait@test.local', password=None, phone_number='0910000004')
+        self.token = Token.objects.create(user=self.user)
+        self.cafe = Cafe.objects.create(name='مقهى')
+        self.order = Order.objects.create(user=self.user, cafe=self.cafe, total_price=Decimal('5'))
+
+    def _wait(self, status, timeout=5):
+        return self.client.get(
+            f'/api/orders/{self.order.id}/wait/',
+            {'status': status, 'timeout': timeout},
+            HTTP_AUTHORIZATION=f'Token {self.token.key}',
+        )
+
+    def test_returns_immediately_when_status_is_stale(self):
+        response = self._wait('ACCEPTED')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['changed'])
+        self.assertEqual(response.json()['order']['status'], 'PENDING')
+
+    def test_timeout_without_change(self):
+        response = self._wait('PENDING', timeout=0)
+        self.assertEqual(response.json(), {'changed': False, 'status': 'PENDING'})
+
+    def test_wakes_up_on_transition(self):
+        result = {}
+        waiter = threading.Thread(target=lambda: result.update(response=self._wait('PENDING')))
+        started = time.monotonic()
+        waiter.start()
+        time.sleep(0.5)
+        transition_orders('ACCEPTED', [self.order.id])
+        waiter.join()
+
+        self.assertLess(time.monotonic() - started, 3)
+        self.assertEqual(result['response'].json()['status'], 'ACCEPTED')
+
+    def test_status_is_published_even_if_rendering_fails(self):
+        Order.objects.filter(id=self.order.id).update(status='ACCEPTED')
+        status_key = ORDER_STATUS_KEY.format(order_id=self.order.id)
+        with mock.patch('core.order_events.get_system_settings', return_value=SystemSettings()):
+            with mock.patch('core.order_events.render_order_card', side_effect=RuntimeError('template')):
+                with self.assertRaises(RuntimeError):
+                    publish_order_events([self.order.id])
+        self.assertEqual(cache.get(status_key), 'ACCEPTED')
+
+        cache.delete(status_key)
+        with mock.patch('core.order_events.get_system_settings', side_effect=RuntimeError('settings')):
+            with self.assertRaises(RuntimeError):
+                publish_order_events([self.order.id])
+        self.assertEqual(cache.get(status_key), 'ACCEPTED')
+
+    def test_stale_cached_status_is_not_reported_as_change(self):
+        cache.set(ORDER_STATUS_KEY.format(order_id=self.order.id), 'READY')
+        response = self._wait('PENDING')
+        self.assertEqual(response.json(), {'changed': False, 'status': 'PENDING'})
+        self.assertEqual(cache.get(ORDER_STATUS_KEY.format(order_id=self.order.id)), 'PENDING')
+
+    def test_other_users_order_is_hidden(self):
+        other = User.objects.create_user('other@test.local', password=None, phone_number='0910000005')
+        self.order.user = other
+        self.order.save()
+        self.assertEqual(self._wait('PENDING').status_code, 404)
+
+    def _wait_all(self, orders, timeout=5):
+        return self.client.get(
+            '/api/orders/wait/',
+            {'orders': ','.join(f'{order_id}:{status}' for order_id, status in orders), 'timeout': timeout},
+            HTTP_AUTHORIZATION=f'Token {self.token.key}',
+        )
+
+    def test_one_wait_for_all_active_orders(self):
+        second = Order.objects.create(user=self.user, cafe=self.cafe, total_price=Decimal('3'))
+        result = {}
+        waiter = threading.Thread(target=lambda: result.update(
+            response=self._wait_all([(self.order.id, 'PENDING'), (second.id, 'PENDING')]),
+        ))
+        started = time.monotonic()
+        waiter.start()
+        time.sleep(0.5)
+        transition_orders('ACCEPTED', [second.id])
+        waiter.join()
+
+        self.assertLess(time.monotonic() - started, 3)
+        orders = result['response'].json()['orders']
+        self.assertEqual([(order['id'], order['status']) for order in orders], [(second.id, 'ACCEPTED')])
+
+    def test_wait_all_reports_stale_orders_and_ignores_foreign_ones(self):
+        other = User.objects.create_user('other@test.local', password=None, phone_number='0910000005')
+        foreign = Order.objects.create(user=other, cafe=self.cafe, total_price=Decimal('3'))
+        response = self._wait_all([(self.order.id, 'ACCEPTED'), (foreign.id, 'ACCEPTED')])
+        self.assertEqual([order['id'] for order in response.json()['orders']], [self.order.id])
+        self.assertEqual(self._wait_all([(self.order.id, 'PENDING')], timeout=0).json(), {'orders': []})
+
+    def test_wait_all_rejects_bad_input(self):
+        self.assertEqual(self._wait_all([(self.order.id, 'UNKNOWN')]).status_code, 400)
+        self.assertEqual(self._wait_all([]).status_code, 400)
+        too_many = [(order_id, 'PENDING') for order_id in range(1, order_events.WAIT_MAX_ORDERS + 2)]
+        self.assertEqual(self._wait_all(too_many).status_code, 400)
+
+    @override_settings(LIVE_ORDER_UPDATES=False)
+    def test_without_shared_cache_waits_return_immediately(self):
+        started = time.monotonic()
+        single = self._wait('PENDING')
+        every = self._wait_all([(self.order.id, 'PENDING')])
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(single.json(), {'changed': False, 'status': 'PENDING'})
+        self.assertEqual(every.json(), {'orders': []})
+        self.assertEqual(single['Retry-After'], str(order_events.WAIT_FALLBACK_SECONDS))
+        self.assertEqual(every['Retry-After'], str(order_events.WAIT_FALLBACK_SECONDS))
+
+
+class CatalogETagTests(TestCase):
+    """
+    جسم /api/products/ يُخدم من الكاش كما هو، وETag الكتالوج لا يتكرر بعد إعادة تشغيل الخادم ثم تعديل المحتوى.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.cafe = Cafe.objects.create(name='مقهى')
+        category = Category.objects.create(name='قهوة')
+        self.product = Product.objects.create(cafe=self.cafe, category=category, name='منتج', price=Decimal('2.50'))
+
+    def _get(self, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get('/api/products/', {'cafe_id': self.cafe.id}, **headers)
+
+    def test_etag_survives_restart(self):
+        cache.clear()
+        self.product.price = Decimal('2.75')
+        self.product.save()
+        old_etag = self._get()['ETag']
+        self.assertEqual(self._get(old_etag).status_code, 304)
+
+        cache.clear()  # مثل إعادة تشغيل الخادم مع LocMem
+        self.product.price = Decimal('3.00')
+        self.product.save()
+
+        response = self._get(old_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], old_etag)
+        self.assertEqual(response.json()[0]['price'], '3.00')
+
+    def test_warm_payload_is_served_without_serializing(self):
+        body = self._get().content
+        with mock.patch('core.catalog.ProductSerializer') as serializer:
+            with CaptureQueriesContext(connection) as queries:
+                response = self._get()
+        serializer.assert_not_called()
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(response.content, body)
+
+    def test_not_modified_round_trip(self):
+        etag = self._get()['ETag']
+        not_modified = self._get(etag)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b'')
+        self.assertEqual(not_modified['ETag'], etag)
+
+        self.product.name = 'منتج جديد'
+        self.product.save()
+        response = self._get(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['name'], 'منتج جديد')
+        self.assertEqual(self._get(response['ETag']).status_code, 304)
+
+
+class PaginationTests(TestCase):
+    """
+    ترقيم الصفحات بالمؤشر: مؤشر تالف يعيد 400، والقائمة بدون ?cursor= أو ?limit= تبقى كاملة.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user('page@test.local', password=None, phone_number='0910000006')
+        self.token = Token.objects.create(user=self.user)
+        self.cafe = Cafe.objects.create(name='مقهى')
+        self.category = Category.objects.create(name='قهوة')
+
+    def test_bad_cursor_pk_is_rejected(self):
+        cursor = encode_cursor(['2024-01-01T00:00:00+00:00', 'abc'])
+        for path in ('/api/orders/', '/api/wallet/transactions/', '/api/products/'):
+            response = self.client.get(path, {'cursor': cursor}, HTTP_AUTHORIZATION=f'Token {self.token.key}')
+            self.assertEqual(response.status_code, 400, path)
+
+    def test_malformed_or_naive_cursor_time_is_rejected(self):
+        for moment in ('not-a-date', '2024-13-45T00:00:00+00:00', '2024-01-01T00:00:00'):
+            cursor = encode_cursor([moment, 1])
+            for path in ('/api/products/', '/api/orders/'):
+                response = self.client.get(path, {'cursor': cursor}, HTTP_AUTHORIZATION=f'Token {self.token.key}')
+                self.assertEqual(response.status_code, 400, (path, moment))
+
+    def test_products_without_cursor_are_not_truncated(self):
+        Product.objects.bulk_create([
+            Product(cafe=self.cafe, category=self.category, name=f'منتج {i}', price=Decimal('1'))
+            for i in range(120)
+        ])
+        cache.clear()
+        response = self.client.get('/api/products/', {'cafe_id': self.cafe.id})
+        self.assertEqual(len(response.json()), 120)
+        self.assertNotIn('X-Next-Cursor', response)
+
+        response = self.client.get('/api/products/', {'cafe_id': self.cafe.id, 'limit': 50})
+        self.assertEqual(len(response.json()), 50)
+        response = self.client.get('/api/products/', {'cafe_id': self.cafe.id, 'cursor': response['X-Next-Cursor']})
+        self.assertEqual(len(response.json()), 70)
+
+
+class ProductChangesTests(TestCase):
+    """
+    المزامنة التزايدية للكتالوج: cursor بشكل غير متوقع يعيد 400 وليس 500.
+    """
+
+    def test_malformed_since_is_rejected(self):
+        for position in ({'p': 5}, {'p': ['x']}, {'d': ['2024-01-01T00:00:00+00:00', 'abc']}, [1, 2]):
+            response = self.client.get('/api/products/changes/', {'since': encode_cursor(position)})
+            self.assertEqual(response.status_code, 400, position)
+
+    def test_changes_after_cursor(self):
+        cafe = Cafe.objects.create(name='مقهى')
+        category = Category.objects.create(name='قهوة')
+        first = Product.objects.create(cafe=cafe, category=category, name='منتج 1', price=Decimal('1'))
+        cursor = self.client.get('/api/products/changes/').json()['cursor']
+
+        second = Product.objects.create(cafe=cafe, category=category, name='منتج 2', price=Decimal('1'))
+        deleted_id = first.id
+        first.delete()
+        data = self.client.get('/api/products/changes/', {'since': cursor}).json()
+        self.assertEqual([product['id'] for product in data['changed']], [second.id])
+        self.assertEqual(data['deleted'], [deleted_id])
+
+
+class CacheWarmupTests(SimpleTestCase):
+    """
+    تسخين الكاش عند التشغيل لا يحدث إلا إذا فُعّل صراحة (وليس لكل عملية تحمّل Django).
+    """
+
+    def test_warmup_follows_the_setting_only(self):
+        config = apps.get_app_config('core')
+        with mock.patch.object(type(config), '_schedule_cache_warmup') as schedule:
+            with override_settings(WARM_CACHES_ON_START=False):
+                config.ready()
+            schedule.assert_not_called()
+            with override_settings(WARM_CACHES_ON_START=True):
+                config.ready()
+            schedule.assert_called_once()
+
+
+
+class SingleFlightCacheTests(SimpleTestCase):
+    """
+    get_or_compute: عامل واحد فقط يحسب المفتاح، والبقية يخدمون القيمة القديمة أو ينتظرون ناتجه.
+    """
+
+    key = 'test:single-flight'
+
+    def setUp(self):
+        cache.clear()
+        self.lock_key = catalog.LOCK_KEY.format(key=self.key)
+
+    def _store_stale(self, value):
+        cache.set(self.key, (value, time.time() - 1), 60)
+
+    def test_fresh_value_is_not_recomputed(self):
+        compute = mock.Mock(return_value='new')
+        self.assertEqual(catalog.get_or_compute(self.key, compute), 'new')
+        self.assertEqual(catalog.get_or_compute(self.key, compute), 'new')
+        compute.assert_called_once()
+        self.assertIsNone(cache.get(self.lock_key))
+
+    def test_stale_value_is_served_while_another_worker_recomputes(self):
+        self._store_stale('old')
+        cache.add(self.lock_key, 1)
+        compute = mock.Mock(return_value='new')
+        self.assertEqual(catalog.get_or_compute(self.key, compute), 'old')
+        compute.assert_not_called()
+
+    def test_stale_value_is_recomputed_by_the_lock_holder(self):
+        self._store_stale('old')
+        self.assertEqual(catalog.get_or_compute(self.key, lambda: 'new'), 'new')
+        self.assertEqual(catalog.get_or_compute(self.key, lambda: 'newer'), 'new')
+        self.assertIsNone(cache.get(self.lock_key))
+
+    def test_concurrent_cold_requests_compute_once(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'value'
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(catalog.get_or_compute(self.key, compute)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ['value'] * 5)
+        self.assertEqual(len(calls), 1)
+
+    def test_cold_key_is_computed_if_the_lock_holder_stalls(self):
+        cache.add(self.lock_key, 1)
+        with mock.patch.object(catalog, 'LOCK_WAIT', 0.1):
+            self.assertEqual(catalog.get_or_compute(self.key, lambda: 'mine'), 'mine')
+
+    def test_failed_compute_releases_the_lock(self):
+        with self.assertRaises(RuntimeError):
+            catalog.get_or_compute(self.key, mock.Mock(side_effect=RuntimeError('boom')))
+        self.assertIsNone(cache.get(self.lock_key))
+        self.assertEqual(catalog.get_or_compute(self.key, lambda: 'value'), 'value')
+
+class ProductSearchTests(TestCase):
+    """
+    البحث النصي: التطبيع العربي يجعل الإملاءات المختلفة تتطابق، والفلترة حسب المقهى.
+    """
+
+    def setUp(self):
+        # جدول FTS يُنشأ في الـ migration، والاختبارات تعمل بدونها
+        with connection.cursor() as cursor:
+            cursor.execute(search.CREATE_FTS_SQL)
+        search._fts_available = None
+        self.addCleanup(setattr, search, '_fts_available', None)
+
+        self.cafe = Cafe.objects.create(name='مقهى')
+        self.other_cafe = Cafe.objects.create(name='مقهى آخر')
+        drinks = Category.objects.create(name='مشروبات')
+        self.coffee = Product.objects.create(cafe=self.cafe, category=drinks, name='قَهْوَة تركية', price=Decimal('2'))
+        self.iced = Product.objects.create(cafe=self.cafe, category=drinks, name='أيس لاتيه', price=Decimal('3'))
+        self.elsewhere = Product.objects.create(cafe=self.other_cafe, category=drinks, name='قهوه عربية', price=Decimal('2'))
+
+    def _search(self, query, **params):
+        response = self.client.get('/api/products/search/', {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [product['id'] for product in response.json()]
+
+    def test_normalize_arabic(self):
+        self.assertEqual(search.normalize_arabic('قَهْوَةٌ'), 'قهوه')
+        self.assertEqual(search.normalize_arabic('إسبريسـو'), 'اسبريسو')
+        self.assertEqual(search.normalize_arabic('مصطفى'), 'مصطفي')
+
+    def test_spelling_variants_match(self):
+        self.assertTrue(search.fts_available())
+        self.assertEqual(set(self._search('قهوة')), {self.coffee.id, self.elsewhere.id})
+        self.assertEqual(self._search('ايس'), [self.iced.id])
+        self.assertEqual(self._search('لات'), [self.iced.id])
+
+    def test_cafe_filter_and_category(self):
+        self.assertEqual(self._search('قهوه', cafe_id=self.cafe.id), [self.coffee.id])
+        self.assertEqual(len(self._search('مشروبات', cafe_id=self.cafe.id)), 2)
+
+    def test_query_syntax_is_not_passed_through(self):
+        self.assertEqual(self._search('" OR *'), [])
+
+
+class ImageVariantTests(TestCase):
+    """
+    نسخ الصور المصغرة: تُولّد مرة واحدة عند الرفع بكل المقاسات والصيغ، وتُشارك بين الصور المتطابقة.
+    """
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.cafe = Cafe.objects.create(name='مقهى')
+        self.category = Category.objects.create(name='قهوة')
+
+    def _upload(self, name='coffee.png', size=(1200, 800), mode='RGBA'):
+        buffer = io.BytesIO()
+        Image.new(mode, size, (200, 120, 40, 128) if mode == 'RGBA' else (200, 120, 40)).save(buffer, format='PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+    def _product(self, image):
+        return Product.objects.create(cafe=self.cafe, category=self.category, name='قهوة', price=Decimal('2'), image=image)
+
+    def test_variants_are_built_on_upload(self):
+        product = self._product(self._upload())
+        variants = Product.objects.get(pk=product.pk).image_variants
+
+        self.assertEqual(variants['source'], product.image.name)
+        for size_name, max_side in images.IMAGE_VARIANT_SIZES.items():
+            self.assertEqual(set(variants[size_name]), {'webp', 'jpg'})
+            with default_storage.open(variants[size_name]['webp']) as stored, Image.open(stored) as variant:
+                self.assertEqual(variant.format, 'WEBP')
+                self.assertEqual(max(variant.size), max_side)
+                self.assertEqual(variant.mode, 'RGBA')
+
+    def test_small_images_are_not_upscaled(self):
+        product = self._product(self._upload(size=(100, 50), mode='RGB'))
+        with default_storage.open(product.image_variants['medium']['jpg']) as stored, Image.open(stored) as variant:
+            self.assertEqual(variant.size, (100, 50))
+
+    def test_same_image_reuses_variant_files(self):
+        first = self._product(self._upload('a.png'))
+        second = self._product(self._upload('b.png'))
+        self.assertEqual(first.image_variants['thumb'], second.image_variants['thumb'])
+
+        # حفظ بدون تغيير الصورة لا يعيد التوليد
+        with mock.patch('core.images.build_image_variants') as build:
+            first.name = 'قهوة مختصة'
+            first.save()
+        build.assert_not_called()
+
+
+class ProductImageDefaultsTests(TestCase):
+    """
+    تصنيف صورة المنتج الافتراضية يُحسب عند الحفظ ويُخزن، ويُعاد حسابه عند تغيير الاسم أو الفئة.
+    """
+
+    def setUp(self):
+        self.cafe = Cafe.objects.create(name='مقهى')
+        self.category = Category.objects.create(name='مشروبات')
+
+    def test_defaults_are_stored_on_save(self):
+        product = Product.objects.create(cafe=self.cafe, category=self.category, name='بيتزا خضار', price=Decimal('5'))
+        product.refresh_from_db()
+        self.assertEqual(product.default_image, 'products/defaults/pizza.jpg')
+        self.assertEqual(product.image_variant_count, 5)
+
+        data = ProductSerializer(product).data
+        self.assertEqual(data['image_variant'], product.id % 5)
+        self.assertTrue(data['default_image'].endswith('products/defaults/pizza.jpg'))
+
+    def test_partial_save_recomputes_defaults(self):
+        product = Product.objects.create(cafe=self.cafe, category=self.category, name='عصير', price=Decimal('2'))
+        product.name = 'قهوة'
+        product.save(update_fields=['name'])
+        product.refresh_from_db()
+        self.assertEqual(product.default_image, 'products/defaults/juice.jpg')
+        self.assertEqual(product.image_variant_count, 2)
+
+    def test_category_rename_updates_products(self):
+        product = Product.objects.create(cafe=self.cafe, category=self.category, name='كوب', price=Decimal('2'))
+        self.assertEqual(product.image_variant_count, 5)
+        self.category.name = 'قهوة'
+        self.category.save()
+        product.refresh_from_db()
+        self.assertEqual(product.image_variant_count, 2)
+
+
+class ReportRollupTests(TestCase):
+    """
+    ملخص التقارير يُحسب مرة ويُخدم من الكاش، ويُبطل مع أي حركة محفظة.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('report@test.local', password=None, phone_number='0910000010')
+        Transaction.objects.create(wallet=self.user.wallet, amount=Decimal('50'), transaction_type='DEPOSIT')
+
+    def test_rollup_is_cached_until_a_transaction(self):
+        rollup = get_report_rollup()
+        self.assertEqual(rollup['total_deposits_today'], Decimal('50'))
+        self.assertEqual(rollup['total_system_balance'], Decimal('50'))
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(get_report_rollup(), rollup)
+        self.assertEqual(len(queries), 0)
+
+        Transaction.objects.create(wallet=self.user.wallet, amount=Decimal('20'), transaction_type='WITHDRAWAL')
+        rollup = get_report_rollup()
+        self.assertEqual(rollup['total_refunds_today'], Decimal('20'))
+        self.assertEqual(rollup['total_system_balance'], Decimal('30'))
+
+    def test_latest_transactions_walk_back_balances(self):
+        Transaction.objects.create(wallet=self.user.wallet, amount=Decimal('20'), transaction_type='DEPOSIT')
+        latest = get_report_rollup()['latest_transactions']
+        self.assertEqual([entry['new_balance'] for entry in latest], [Decimal('70'), Decimal('50')])
+
+
+class BootstrapTests(TestCase):
+    """
+    /api/bootstrap/: الشاشة الرئيسية في طلب واحد، والكتالوج يُدمج من نفس الكاش الذي تخدمه /api/products/.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('home@test.local', password=None, phone_number='0910000011')
+        self.token = Token.objects.create(user=self.user)
+        self.cafe = Cafe.objects.create(name='أ مقهى')
+        Cafe.objects.create(name='ب مقهى')
+        Cafe.objects.create(name='مغلق', is_active=False)
+        category = Category.objects.create(name='قهوة')
+        self.products = [
+            Product.objects.create(cafe=self.cafe, category=category, name=f'منتج {i}', price=Decimal('2'))
+            for i in range(3)
+        ]
+
+    def test_anonymous_home_screen(self):
+        data = self.client.get('/api/bootstrap/').json()
+        self.assertIsNone(data['user'])
+        self.assertIsNone(data['wallet'])
+        self.assertEqual(data['cafe_id'], self.cafe.id)
+        self.assertEqual(len(data['cafes']), len(self.client.get('/api/cafes/').json()))
+        self.assertEqual(data['products'], self.client.get('/api/products/', {'cafe_id': self.cafe.id}).json())
+        self.assertIn('قهوة', [category['name'] for category in data['categories']])
+
+    def test_signed_in_home_screen(self):
+        Transaction.objects.create(wallet=self.user.wallet, amount=Decimal('12'), transaction_type='DEPOSIT')
+        response = self.client.get('/api/bootstrap/', HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        data = response.json()
+        self.assertEqual(data['user']['email'], 'home@test.local')
+        self.assertEqual(Decimal(str(data['wallet']['balance'])), Decimal('12'))
+
+    def test_warm_catalog_is_not_requeried(self):
+        self.client.get('/api/bootstrap/', {'cafe_id': self.cafe.id})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/bootstrap/', {'cafe_id': self.cafe.id})
+        self.assertEqual(len(response.json()['products']), 3)
+        self.assertEqual(len(queries), 0)
+
+    def test_invalid_cafe_id(self):
+        self.assertEqual(self.client.get('/api/bootstrap/', {'cafe_id': 'x'}).status_code, 400)
+
+
+class CatalogInvalidationTests(TestCase):
+    """
+    كاش الكتالوج مقسّم حسب المقهى: التعديل يُبطل شريحة مقهاه، ونقل منتج يُبطل المقهيين.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.cafe = Cafe.objects.create(name='مقهى')
+        self.other_cafe = Cafe.objects.create(name='مقهى آخر')
+        self.category = Category.objects.create(name='قهوة')
+        self.product = Product.objects.create(cafe=self.cafe, category=self.category, name='قهوة', price=Decimal('2'))
+
+    def _ids(self, cafe):
+        return [product['id'] for product in self.client.get('/api/products/', {'cafe_id': cafe.id}).json()]
+
+    def test_moving_a_product_refreshes_both_cafes(self):
+        self.assertEqual(self._ids(self.cafe), [self.product.id])
+        self.assertEqual(self._ids(self.other_cafe), [])
+
+        self.product.cafe = self.other_cafe
+        self.product.save()
+
+        self.assertEqual(self._ids(self.cafe), [])
+        self.assertEqual(self._ids(self.other_cafe), [self.product.id])
+
+
+class BatchTests(TestCase):
+    """
+    /api/batch/: عدة طلبات GET في رحلة واحدة، بمصادقة الطلب الأصلي وبدون مسارات long-poll.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('batch@test.local', password=None, phone_number='0910000012')
+        self.token = Token.objects.create(user=self.user)
+        self.cafe = Cafe.objects.create(name='مقهى')
+        category = Category.objects.create(name='قهوة')
+        Product.objects.create(cafe=self.cafe, category=category, name='قهوة', price=Decimal('2'))
+
+    def _batch(self, requests, **extra):
+        return self.client.post('/api/batch/', {'requests': requests}, content_type='application/json', **extra)
+
+    def test_sub_requests_share_the_batch_auth(self):
+        products_path = f'/api/products/?cafe_id={self.cafe.id}'
+        response = self._batch(['/api/user/', products_path], HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(response.status_code, 200)
+        user, products = response.json()['responses']
+        self.assertEqual(user['status'], 200)
+        self.assertEqual(user['body']['email'], 'batch@test.local')
+        self.assertEqual(products['body'], self.client.get(products_path).json())
+
+        etag = products['headers']['ETag']
+        cached = self._batch([{'path': products_path, 'etag': etag}]).json()['responses'][0]
+        self.assertEqual(cached['status'], 304)
+
+    def test_anonymous_sub_request_is_rejected_on_its_own(self):
+        user, cafes = self._batch(['/api/user/', '/api/cafes/']).json()['responses']
+        self.assertIn(user['status'], (401, 403))
+        self.assertEqual(cafes['status'], 200)
+
+    def test_request_limit(self):
+        from .api_views import MAX_BATCH_REQUESTS
+        response = self._batch(['/api/cafes/'] * (MAX_BATCH_REQUESTS + 1))
+        self.assertEqual(response.status_code, 400)
+
+    def test_only_get_api_paths(self):
+        self.assertEqual(self.client.get('/api/batch/').status_code, 405)
+        outside, missing, nested, wait, wait_all = self._batch([
+            '/admin/', '/api/nothing/', '/api/batch/', '/api/orders/1/wait/?status=pending', '/api/orders/wait/',
+        ]).json()['responses']
+        self.assertEqual(outside['status'], 400)
+        self.assertEqual(missing['status'], 404)
+        self.assertEqual(nested['status'], 400)
+        self.assertEqual(wait['status'], 400)
+        self.assertEqual(wait_all['status'], 400)
+
+    def test_failing_sub_request_does_not_break_the_batch(self):
+        with mock.patch('core.api_views.get_products_payload', side_effect=RuntimeError('boom')):
+            products, cafes = self._batch(['/api/products/', '/api/cafes/']).json()['responses']
+        self.assertEqual(products['status'], 500)
+        self.assertEqual(cafes['status'], 200)
+
+
+class ProductAvailabilityTests(TestCase):
+    """
+    تغيير التوفر يرقّع فهرس المقهى وفهرس كل المقاهي في الكاش بدون إعادة بنائهما من قاعدة البيانات.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.cafe = Cafe.objects.create(name='مقهى')
+        self.other_cafe = Cafe.objects.create(name='مقهى آخر')
+        category = Category.objects.create(name='قهوة')
+        self.product = Product.objects.create(cafe=self.cafe, category=category, name='قهوة', price=Decimal('2'))
+        self.sibling = Product.objects.create(cafe=self.cafe, category=category, name='شاي', price=Decimal('1'))
+        self.foreign = Product.objects.create(cafe=self.other_cafe, category=category, name='ماء', price=Decimal('1'))
+
+    def _availability(self, cafe_id=None):
+        return {product.id: product.is_available for product in query_products(cafe_id)}
+
+    def test_toggle_patches_both_slices_without_rebuild(self):
+        query_products(self.cafe.id)
+        query_products()
+
+        self.assertEqual(set_products_availability(self.cafe.id, [self.product.id], False), 1)
+
+        with CaptureQueriesContext(connection) as queries:
+            cafe_slice = self._availability(self.cafe.id)
+            all_slice = self._availability()
+            available = [product.id for product in query_products(self.cafe.id, available_only=True)]
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(cafe_slice, {self.product.id: False, self.sibling.id: True})
+        self.assertEqual(all_slice, {self.product.id: False, self.sibling.id: True, self.foreign.id: True})
+        self.assertEqual(available, [self.sibling.id])
+
+    def test_unchanged_products_do_not_bump_the_catalog(self):
+        query_products(self.cafe.id)
+        version = get_catalog_version(self.cafe.id)
+        self.assertEqual(set_products_availability(self.cafe.id, [self.product.id], True), 0)
+        # منتج من مقهى آخر لا يتغير عبر هذا المقهى
+        self.assertEqual(set_products_availability(self.cafe.id, [self.foreign.id], False), 0)
+        self.assertEqual(get_catalog_version(self.cafe.id), version)
+
+    def test_cold_cache_is_rebuilt_from_the_database(self):
+        # شريحة المقهى فقط في الكاش: شريحة كل المقاهي تُبنى لاحقاً من قاعدة البيانات بالقيمة الجديدة
+        query_products(self.cafe.id)
+        set_products_availability(self.cafe.id, [self.product.id], False)
+        self.assertFalse(self._availability()[self.product.id])
+
+        cache.clear()
+        set_products_availability(self.cafe.id, [self.product.id], True)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(self._availability(self.cafe.id)[self.product.id])
+        self.assertGreater(len(queries), 0)
+
+
+class LiteProductsShapeTests(TestCase):
+    """
+    ?shape=lite: نفس المنتجات بمعرفات المقهى والفئة فقط، مع قاموس جانبي واحد للمقاهي والفئات.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.cafe = Cafe.objects.create(name='مقهى')
+        self.coffee = Category.objects.create(name='قهوة')
+        self.tea = Category.objects.create(name='شاي')
+        for i in range(4):
+            Product.objects.create(
+                cafe=self.cafe, category=self.coffee if i % 2 else self.tea, name=f'منتج {i}', price=Decimal('2'),
+            )
+
+    def _get(self, headers=None, **params):
+        return self.client.get('/api/products/', {'cafe_id': self.cafe.id, **params}, **(headers or {}))
+
+    def test_lite_matches_full_with_side_loaded_objects(self):
+        full_response = self._get()
+        lite_response = self._get(shape='lite')
+        full = full_response.json()
+        lite = lite_response.json()
+
+        self.assertEqual([product['id'] for product in lite['products']], [product['id'] for product in full])
+        for full_product, lite_product in zip(full, lite['products']):
+            self.assertNotIn('cafe', lite_product)
+            self.assertNotIn('category', lite_product)
+            self.assertEqual(lite_product['cafe_id'], full_product['cafe']['id'])
+            self.assertEqual(lite['cafes'][str(lite_product['cafe_id'])], full_product['cafe'])
+            self.assertEqual(lite['categories'][str(lite_product['category_id'])], full_product['category'])
+        self.assertEqual(set(lite['categories']), {str(self.coffee.id), str(self.tea.id)})
+        self.assertLess(len(lite_response.content), len(full_response.content))
+
+    def test_shapes_are_cached_separately(self):
+        etag = self._get()['ETag']
+        lite_response = self._get({'HTTP_IF_NONE_MATCH': etag}, shape='lite')
+        self.assertEqual(lite_response.status_code, 200)
+        self.assertIn('products', lite_response.json())
+        self.assertIsInstance(self._get().json(), list)
+
+
+class CategoryRegistryTests(TestCase):
+    """
+    الفئات الافتراضية تُضمن مرة واحدة بعد migrate، وفئات كل مقهى تُخدم من الكاش وتُبطل مع منتجاته.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.cafe = Cafe.objects.create(name='مقهى')
+        self.other_cafe = Cafe.objects.create(name='مقهى آخر')
+
+    def _names(self, cafe):
+        return {category.name for category in get_categories_for_cafe(cafe.id)}
+
+    def test_defaults_are_seeded_once(self):
+        self.assertEqual(Category.objects.filter(name__in=DEFAULT_CATEGORY_NAMES).count(), len(DEFAULT_CATEGORY_NAMES))
+        version = get_catalog_version(self.cafe.id)
+        with CaptureQueriesContext(connection) as queries:
+            ensure_default_categories()
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(get_catalog_version(self.cafe.id), version)
+        self.assertEqual(Category.objects.filter(name__in=DEFAULT_CATEGORY_NAMES).count(), len(DEFAULT_CATEGORY_NAMES))
+
+    def test_cafe_categories_are_cached_and_refreshed_on_product_writes(self):
+        own = Category.objects.create(name='عصائر')
+        foreign = Category.objects.create(name='سلطات')
+        Product.objects.create(cafe=self.other_cafe, category=foreign, name='سلطة', price=Decimal('3'))
+
+        self.assertEqual(self._names(self.cafe), set(DEFAULT_CATEGORY_NAMES))
+        with CaptureQueriesContext(connection) as queries:
+            self._names(self.cafe)
+        self.assertEqual(len(queries), 0)
+
+        Product.objects.create(cafe=self.cafe, category=own, name='عصير', price=Decimal('2'))
+        self.assertEqual(self._names(self.cafe), set(DEFAULT_CATEGORY_NAMES) | {'عصائر'})
+        self.assertEqual(self._names(self.other_cafe), set(DEFAULT_CATEGORY_NAMES) | {'سلطات'})
+
+
+class CatalogQueryEngineTests(TestCase):
+    """
+    query_products: محرك واحد لكل قوائم المنتجات، يصفي من فهرس الشريحة المخزن بنفس ترتيب قاعدة البيانات.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.cafe = Cafe.objects.create(name='مقهى')
+        self.other_cafe = Cafe.objects.create(name='مقهى آخر')
+        self.coffee = Category.objects.create(name='Coffee')
+        self.tea = Category.objects.create(name='شاي')
+        self.latte = Product.objects.create(cafe=self.cafe, category=self.coffee, name='لاتيه', price=Decimal('3'))
+        self.green = Product.objects.create(cafe=self.cafe, category=self.tea, name='شاي أخضر', price=Decimal('1'))
+        self.mocha = Product.objects.create(
+            cafe=self.cafe, category=self.coffee, name='موكا', price=Decimal('4'), is_available=False,
+        )
+        self.foreign = Product.objects.create(cafe=self.other_cafe, category=self.coffee, name='قهوة', price=Decimal('2'))
+
+    def _ids(self, *args, **kwargs):
+        return [product.id for product in query_products(*args, **kwargs)]
+
+    def test_filters_match_the_database(self):
+        newest_first = ('-created_at', '-id')
+        in_cafe = Product.objects.filter(cafe=self.cafe).order_by(*newest_first)
+        self.assertEqual(self._ids(self.cafe.id), list(in_cafe.values_list('id', flat=True)))
+        self.assertEqual(self._ids(), list(Product.objects.order_by(*newest_first).values_list('id', flat=True)))
+        self.assertEqual(self._ids(self.cafe.id, category_id=self.coffee.id), [self.mocha.id, self.latte.id])
+        self.assertEqual(self._ids(self.cafe.id, category_name='coffee'), [self.mocha.id, self.latte.id])
+        self.assertEqual(self._ids(self.cafe.id, category_id=self.tea.id, category_name='coffee'), [self.green.id])
+        self.assertEqual(self._ids(self.cafe.id, category_name='coffee', available_only=True), [self.latte.id])
+        self.assertEqual(self._ids(self.cafe.id, category_name='missing'), [])
+
+    def test_filters_are_served_from_the_cached_index(self):
+        query_products(self.cafe.id)
+        with CaptureQueriesContext(connection) as queries:
+            self._ids(self.cafe.id, category_id=self.coffee.id)
+            self._ids(self.cafe.id, category_name='شاي', available_only=True)
+        self.assertEqual(len(queries), 0)
+
+    def test_dashboard_counts_from_the_cached_index(self):
+        owner = User.objects.create_user('engine@test.local', password=None, phone_number='0910000014', is_staff=True)
+        self.cafe.owner = owner
+        self.cafe.save()
+        self.client.force_login(owner)
+        query_products(self.cafe.id)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/dashboard/')
+        self.assertEqual(response.context['total_products'], 3)
+        self.assertFalse([query for query in queries if 'core_product' in query['sql']])
+
+    def test_endpoint_uses_the_engine(self):
+        params = {'cafe_id': self.cafe.id, 'category': 'Coffee', 'available': 'true'}
+        with mock.patch('core.catalog.query_products', wraps=query_products) as engine:
+            response = self.client.get('/api/products/', params)
+        engine.assert_called_once_with(self.cafe.id, None, 'Coffee', True)
+        self.assertEqual([product['id'] for product in response.json()], [self.latte.id])
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api_views, views
 
 app_name = 'core'
 
@@ -8,7 +8,7 @@ urlpatterns = [
     path('api/login/', views.api_login, name='api_login'),
     path('api/signup/', views.api_signup, name='api_signup'),
     path('api/cafes/', views.get_cafes_list, name='api_cafes'),
-    path('api/products/', views.get_products, name='api_products'),
+    path('api/products/', api_views.get_products, name='api_products'),
     path('api/profile/', views.get_user_profile, name='api_profile'),
     path('api/orders/', views.orders_endpoint, name='api_orders'),
 
@@ -23,6 +23,8 @@ urlpatterns = [
     path('products/add/', views.add_product, name='add_product'),
     path('products/edit/<int:product_id>/', views.edit_product, name='edit_product'),
     path('products/delete/<int:product_id>/', views.delete_product, name='delete_product'),
+    path('products/availability/<int:product_id>/', views.toggle_product_availability, name='toggle_product_availability'),
+    path('products/availability/', views.bulk_product_availability, name='bulk_product_availability'),
 
     # Stock
     path('stock/', views.stock, name='stock'),
@@ -32,10 +34,12 @@ urlpatterns = [
 
     # Orders
     path('orders/', views.orders, name='orders'),
+    path('orders/stream/', views.orders_stream, name='orders_stream'),
     path('orders/accept/<int:order_id>/', views.accept_order, name='accept_order'),
     path('orders/preparing/<int:order_id>/', views.preparing_order, name='preparing_order'),
     path('orders/ready/<int:order_id>/', views.ready_order, name='ready_order'),
     path('orders/complete/<int:order_id>/', views.complete_order, name='complete_order'),
+    path('orders/bulk-status/', views.bulk_order_status, name='bulk_order_status'),
 
     # Customers
     path('customers/', views.customers, name='customers'),
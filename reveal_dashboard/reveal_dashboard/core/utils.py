@@ -1,6 +1,8 @@
 import firebase_admin
 from firebase_admin import credentials, messaging
 from django.conf import settings
+import base64
+import json
 import os
 import re
 
@@ -37,6 +39,35 @@ def send_real_notification(user, title, body):
     except Exception as e:
         print(f"❌ Error sending notification to {user}: {e}")
 
+def send_bulk_notifications(notifications):
+    """
+    إرسال عدة إشعارات دفعة واحدة عبر FCM (طلب واحد بدلاً من طلب لكل مستخدم).
+    notifications: قائمة (user, title, body).
+    """
+    if not notifications:
+        return
+    if not is_firebase_ready():
+        print("⚠️ Firebase is not initialized. Notifications skipped.")
+        return
+
+    messages_batch = [
+        messaging.Message(
+            notification=messaging.Notification(title=title, body=body),
+            token=user.fcm_token,
+        )
+        for user, title, body in notifications
+        if getattr(user, 'fcm_token', None)
+    ]
+    if not messages_batch:
+        return
+
+    try:
+        # FCM يقبل حتى 500 رسالة في الدفعة الواحدة
+        for start in range(0, len(messages_batch), 500):
+            messaging.send_each(messages_batch[start:start + 500])
+    except Exception as e:
+        print(f"❌ Error sending {len(messages_batch)} notifications: {e}")
+
 def get_smart_image_for_product(product_name):
     """
     تحدد مسار صورة افتراضية بناءً على اسم المنتج.
@@ -69,6 +100,27 @@ def get_smart_image_for_product(product_name):
     # نرجع المسار كاملاً
     return f'{base_path}{image_name}'
 
+def get_image_variant_count(product_name, category_name=''):
+    """
+    عدد الصور الافتراضية المتاحة في التطبيق لنوع المنتج (بيتزا، برغر، قهوة...).
+    تُحسب مرة واحدة عند حفظ المنتج وتُخزن في Product.image_variant_count.
+    """
+    text = f"{category_name or ''} {product_name or ''}".lower()
+    has = lambda *words: any(word in text for word in words)
+
+    if has('pizza', 'بيتزا'):
+        return 5
+    if has('burger', 'برغر', 'برجر'):
+        return 5
+    if has('dessert', 'sweet', 'حلويات', 'حلوى'):
+        return 5
+    if has('coffee', 'قهوة'):
+        return 2
+    if has('drink', 'drinks', 'juice', 'water', 'مشروب', 'مشروبات', 'عصير', 'ماء'):
+        return 5
+    return 5
+
+
 def normalize_libyan_phone(raw_phone):
     """
     توحيد صيغة الرقم الليبي ليصبح 09XXXXXXXX
@@ -87,4 +139,23 @@ def normalize_libyan_phone(raw_phone):
     if len(digits) == 9:
         digits = '0' + digits
         
-    return digits
\ No newline at end of file
+    return digits
+
+
+def encode_cursor(value):
+    """
+    تحويل موضع (cursor) إلى نص معتم آمن للروابط.
+    """
+    raw = json.dumps(value, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    عكس encode_cursor. ترفع ValueError إذا كان النص غير صالح.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+    except Exception as exc:
+        raise ValueError('Invalid cursor') from exc
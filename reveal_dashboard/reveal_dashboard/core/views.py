@@ -6,11 +6,10 @@ from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.db import transaction
-from django.db.models import Count, Q, Sum
-from django.http import JsonResponse
+from django.db.models import Count, Q
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
-from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 
 from rest_framework.authtoken.models import Token
@@ -18,17 +17,25 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
-from .api_views import invalidate_products_cache
+from .catalog import (
+    ALL_CAFES,
+    get_categories_for_cafe,
+    get_products_index,
+    get_system_settings,
+    query_products,
+    set_products_availability,
+)
 from .forms import InventoryItemForm, ProductForm
-from .models import Cafe, Category, InventoryItem, Order, OrderItem, Product, SystemSettings
-from .serializers import CafeSerializer, OrderSerializer, ProductSerializer, UserSerializer
+from .idempotency import idempotent
+from .models import Cafe, Category, InventoryItem, Order, Product
+from .order_events import stream_order_events
+from .orders import OrderError, place_order, transition_orders, user_orders_queryset
+from .reports import get_report_rollup
+from .serializers import CafeSerializer, OrderSerializer, UserSerializer
 from .utils import normalize_libyan_phone, send_real_notification
 from users.models import User
 from wallet.models import Transaction, Wallet
 
-DEFAULT_CATEGORY_NAMES = ['برغر', 'بيتزا', 'حلويات', 'مشروبات', 'قهوة']
-
-
 def get_cafe_for_user(user):
     cafe = getattr(user, 'my_cafe', None)
     if cafe:
@@ -42,20 +49,9 @@ def get_cafe_for_user(user):
     return None
 
 
-def ensure_categories_for_cafe(cafe):
-    existing_defaults = set(
-        Category.objects.filter(name__in=DEFAULT_CATEGORY_NAMES).values_list('name', flat=True)
-    )
-    for name in DEFAULT_CATEGORY_NAMES:
-        if name not in existing_defaults:
-            Category.objects.get_or_create(name=name)
-    return Category.objects.filter(
-        Q(name__in=DEFAULT_CATEGORY_NAMES) | Q(products__cafe=cafe)
-    ).distinct().order_by('name')
-
-
-def get_system_settings():
-    return SystemSettings.get_solo()
+def get_category_choices(categories):
+    # queryset كسول للنموذج (ProductForm) مبني على قائمة الفئات المخزنة في الكاش
+    return Category.objects.filter(id__in=[category.id for category in categories]).order_by('name')
 
 
 def infer_unit_from_name(name):
@@ -173,34 +169,6 @@ def get_cafes_list(request):
     return Response(serializer.data)
 
 
-@api_view(['GET'])
-@permission_classes([AllowAny])
-def get_products(request):
-    cafe_id = request.GET.get('cafe_id')
-    if not cafe_id:
-        first_cafe = Cafe.objects.filter(is_active=True).first()
-        if first_cafe:
-            cafe_id = first_cafe.id
-        else:
-            return Response([])
-
-    products = Product.objects.select_related('cafe', 'category').filter(cafe_id=cafe_id).order_by('-created_at')
-    category_id = request.GET.get('category_id')
-    category_name = request.GET.get('category') or request.GET.get('category_name')
-    available_only = request.GET.get('available')
-
-    if category_id:
-        products = products.filter(category_id=category_id)
-    elif category_name:
-        products = products.filter(category__name__iexact=category_name)
-
-    if available_only and str(available_only).lower() in ['1', 'true', 'yes']:
-        products = products.filter(is_available=True)
-
-    serializer = ProductSerializer(products, many=True, context={'request': request})
-    return Response(serializer.data)
-
-
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_user_profile(request):
@@ -210,93 +178,47 @@ def get_user_profile(request):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent()
 def create_order(request):
+    if not isinstance(request.data, dict):
+        return Response({'error': 'Invalid request body'}, status=400)
     user = request.user
     total_price_raw = request.data.get('total_price')
     items_data = request.data.get('items')
     payment_method = 'WALLET'
 
-    if total_price_raw is None or not items_data:
+    if not items_data:
         return Response({'error': 'بيانات الطلب ناقصة.'}, status=400)
 
     if len(items_data) == 0:
         return Response({'error': 'لا توجد عناصر في الطلب.'}, status=400)
 
-    try:
-        total_price = Decimal(str(total_price_raw))
-    except Exception:
-        return Response({'error': 'قيمة الطلب غير صحيحة.'}, status=400)
-
-    try:
-        with transaction.atomic():
-            product_ids = [item.get('product_id') for item in items_data]
-            products = list(Product.objects.filter(id__in=product_ids).select_related('cafe'))
-
-            if len(products) != len(set(product_ids)):
-                return Response({'error': 'بعض المنتجات غير موجودة.'}, status=400)
-
-            cafes = {product.cafe_id for product in products}
-            if len(cafes) != 1:
-                return Response({'error': 'لا يمكن طلب منتجات من أكثر من مقهى في نفس الطلب.'}, status=400)
-            target_cafe_id = cafes.pop()
-
-            if payment_method == 'WALLET':
-                try:
-                    wallet = Wallet.objects.select_for_update().get(user=user)
-                except Wallet.DoesNotExist:
-                    return Response({'error': 'المحفظة غير موجودة.'}, status=404)
-
-                if wallet.balance < total_price:
-                    return Response({'error': 'رصيد المحفظة غير كافٍ.'}, status=400)
-
-                Transaction.objects.create(
-                    wallet=wallet,
-                    amount=total_price,
-                    transaction_type='WITHDRAWAL',
-                    source='APP',
-                    description='خصم طلب',
-                )
-
-            new_order = Order.objects.create(
-                user=user,
-                cafe_id=target_cafe_id,
-                total_price=total_price,
-                status='PENDING',
-                payment_method=payment_method,
-            )
-
-            for item in items_data:
-                product_id = item.get('product_id')
-                qty = item.get('quantity', item.get('qty', 1))
-                product = next((p for p in products if str(p.id) == str(product_id)), None)
-
-                if not product:
-                    return Response({'error': 'منتج غير موجود.'}, status=400)
-
-                options = item.get('options') or item.get('note') or ''
-                OrderItem.objects.create(
-                    order=new_order,
-                    product=product,
-                    quantity=qty,
-                    price=product.price,
-                    options=options,
-                )
-
+    # الإجمالي يحسبه الخادم؛ إن أرسله التطبيق يُستخدم فقط للتأكد من أن الأسعار لم تتغير
+    total_price = None
+    if total_price_raw not in (None, ''):
         try:
-            send_real_notification(user, "تم استلام طلبك", f"طلبك #{new_order.order_number} قيد المراجعة.")
+            total_price = Decimal(str(total_price_raw))
         except Exception:
-            pass
-
-        return Response({'message': 'تم إرسال الطلب بنجاح', 'order_id': new_order.id}, status=201)
+            return Response({'error': 'قيمة الطلب غير صحيحة.'}, status=400)
 
+    try:
+        new_order = place_order(user, items_data, total_price, payment_method)
+    except OrderError as exc:
+        return Response(exc.as_response_data(), status=exc.status)
     except Exception:
         return Response({'error': 'حدث خطأ أثناء إنشاء الطلب.'}, status=500)
 
+    try:
+        send_real_notification(user, "تم استلام طلبك", f"طلبك #{new_order.order_number} قيد المراجعة.")
+    except Exception:
+        pass
+
+    return Response({'message': 'تم إرسال الطلب بنجاح', 'order_id': new_order.id, 'total_price': new_order.total_price}, status=201)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_user_orders(request):
-    orders = Order.objects.filter(user=request.user).order_by('-created_at')
+    orders = user_orders_queryset(request.user).order_by('-created_at')
     serializer = OrderSerializer(orders, many=True)
     return Response(serializer.data)
 
@@ -369,14 +291,15 @@ def dashboard(request):
     products_list = []
 
     if cafe:
-        products_count = Product.objects.filter(cafe=cafe).count()
+        # العدد من طول فهرس المقهى المخزن (نفس الفهرس الذي يخدم /api/products/) بدون استعلام COUNT
+        products_count = len(get_products_index(cafe.id)['products'])
         orders_count = Order.objects.filter(cafe=cafe).count()
         wallets_count = Wallet.objects.count()
-        products_list = Product.objects.filter(cafe=cafe, is_available=True).order_by('-created_at')[:20]
+        products_list = query_products(cafe_id=cafe.id, available_only=True)[:20]
     else:
         wallets_count = Wallet.objects.count()
         if request.user.is_superuser:
-            products_list = Product.objects.filter(is_available=True).order_by('-created_at')[:20]
+            products_list = query_products(available_only=True)[:20]
 
     context = {
         'total_products': products_count,
@@ -403,47 +326,93 @@ def products(request):
             'system_settings': system_settings,
         })
 
-    categories = ensure_categories_for_cafe(cafe)
-    products_qs = Product.objects.filter(cafe=cafe).order_by('-created_at')
+    categories = get_categories_for_cafe(cafe.id)
 
     return render(request, 'core/products.html', {
-        'products': products_qs,
+        'products': query_products(cafe_id=cafe.id),
         'categories': categories,
         'cafe_name': cafe.name,
         'system_settings': system_settings,
     })
 
 
+# أعمدة لوحة الطلبات (الحالة، اسم المتغير في القالب)
+ORDER_BOARD_COLUMNS = (
+    ('PENDING', 'new_orders'),
+    ('ACCEPTED', 'accepted_orders'),
+    ('PREPARING', 'preparing_orders'),
+    ('READY', 'ready_orders'),
+)
+# آخر الطلبات المكتملة/الملغاة المعروضة أسفل اللوحة
+ORDER_HISTORY_WINDOW = 20
+# إعادة تحميل لوحة الطلبات دورياً عندما يكون البث المباشر معطلاً
+ORDERS_POLL_SECONDS = 30
+
+
 @login_required(login_url='core:login')
 def orders(request):
     cafe = get_cafe_for_user(request.user)
     system_settings = get_system_settings()
+    context = {name: [] for _, name in ORDER_BOARD_COLUMNS}
+    context.update({
+        'history_orders': [],
+        'system_settings': system_settings,
+        'live_updates': settings.LIVE_ORDER_UPDATES,
+        'poll_seconds': ORDERS_POLL_SECONDS,
+    })
 
     if request.user.is_superuser:
-        all_orders = Order.objects.all().order_by('-created_at')
+        base_orders = Order.objects.all()
     elif not cafe:
-        return render(request, 'core/orders.html', {
-            'orders': [],
-            'new_orders': [],
-            'accepted_orders': [],
-            'preparing_orders': [],
-            'ready_orders': [],
-            'system_settings': system_settings,
-        })
+        return render(request, 'core/orders.html', context)
     else:
-        all_orders = Order.objects.filter(cafe=cafe).order_by('-created_at')
+        base_orders = Order.objects.filter(cafe=cafe)
+
+    # استعلام واحد للطلبات النشطة (مع عناصرها ومنتجاتها مسبقاً) ثم التقسيم حسب الحالة في بايثون
+    columns = dict(ORDER_BOARD_COLUMNS)
+    active_orders = (
+        base_orders.filter(status__in=columns)
+        .select_related('user', 'cafe')
+        .prefetch_related('items__product')
+        .order_by('-created_at')
+    )
+    for order in active_orders:
+        context[columns[order.status]].append(order)
 
-    context = {
-        'orders': all_orders,
-        'new_orders': all_orders.filter(status='PENDING'),
-        'accepted_orders': all_orders.filter(status='ACCEPTED'),
-        'preparing_orders': all_orders.filter(status='PREPARING'),
-        'ready_orders': all_orders.filter(status='READY'),
-        'system_settings': system_settings,
-    }
+    context['history_orders'] = list(
+        base_orders.exclude(status__in=columns)
+        .select_related('user')
+        .order_by('-created_at')[:ORDER_HISTORY_WINDOW]
+    )
     return render(request, 'core/orders.html', context)
 
 
+@login_required(login_url='core:login')
+def orders_stream(request):
+    """
+    بث أحداث الطلبات (SSE) لمقهى المستخدم، أو لكل المقاهي للمدير العام.
+    بدون كاش مشترك يعيد 204 فيتوقف المتصفح عن إعادة الاتصال وتعود الصفحة للتحديث الدوري.
+    """
+    if not settings.LIVE_ORDER_UPDATES:
+        return HttpResponse(status=204)
+    cafe = get_cafe_for_user(request.user)
+    if cafe:
+        channel = cafe.id
+    elif request.user.is_superuser:
+        channel = ALL_CAFES
+    else:
+        return HttpResponse(status=204)
+
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    response = StreamingHttpResponse(
+        stream_order_events(channel, int(last_event_id) if last_event_id.isdigit() else None),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @login_required(login_url='core:login')
 def customers(request):
     cafe = get_cafe_for_user(request.user)
@@ -559,52 +528,7 @@ def delete_inventory_item(request, item_id):
 
 @login_required(login_url='core:login')
 def reports(request):
-    today = timezone.localdate()
-
-    product_count = Product.objects.count()
-    wallet_count = Wallet.objects.count()
-    total_system_balance = Wallet.objects.aggregate(total=Sum('balance'))['total'] or 0
-
-    deposits_today_qs = Transaction.objects.filter(transaction_type='DEPOSIT', created_at__date=today)
-    total_deposits_today = deposits_today_qs.aggregate(total=Sum('amount'))['total'] or 0
-    deposits_count_today = deposits_today_qs.count()
-
-    refunds_today_qs = Transaction.objects.filter(transaction_type='WITHDRAWAL', created_at__date=today)
-    total_refunds_today = refunds_today_qs.aggregate(total=Sum('amount'))['total'] or 0
-
-    latest_qs = Transaction.objects.select_related('wallet', 'wallet__user').order_by('-created_at')[:10]
-    balances = {}
-    latest_transactions = []
-
-    for trans in latest_qs:
-        wallet_id = trans.wallet_id
-        if wallet_id not in balances:
-            balances[wallet_id] = trans.wallet.balance
-
-        current_balance = balances[wallet_id]
-        latest_transactions.append({
-            'type': 'deposit' if trans.transaction_type == 'DEPOSIT' else 'refund',
-            'amount': trans.amount,
-            'wallet_owner': getattr(trans.wallet.user, 'full_name', str(trans.wallet.user)),
-            'new_balance': current_balance,
-            'timestamp': trans.created_at,
-        })
-
-        if trans.transaction_type == 'DEPOSIT':
-            balances[wallet_id] = current_balance - trans.amount
-        elif trans.transaction_type == 'WITHDRAWAL':
-            balances[wallet_id] = current_balance + trans.amount
-
-    context = {
-        'product_count': product_count,
-        'wallet_count': wallet_count,
-        'total_system_balance': total_system_balance,
-        'total_deposits_today': total_deposits_today,
-        'deposits_count_today': deposits_count_today,
-        'total_refunds_today': total_refunds_today,
-        'latest_transactions': latest_transactions,
-    }
-
+    context = get_report_rollup()
     return render(request, 'core/reports.html', context)
 
 
@@ -681,20 +605,19 @@ def add_product(request):
         messages.error(request, "لا يوجد مقهى مرتبط لهذا الحساب.")
         return redirect('core:products')
 
-    categories_qs = ensure_categories_for_cafe(my_cafe)
+    categories = get_categories_for_cafe(my_cafe.id)
 
     if request.method == 'POST':
         form = ProductForm(request.POST, request.FILES)
-        form.fields['category'].queryset = categories_qs
+        form.fields['category'].queryset = get_category_choices(categories)
 
         if form.is_valid():
             try:
                 product = form.save(commit=False)
                 product.cafe = my_cafe
-                if not product.category:
-                    product.category = categories_qs.first()
+                if not product.category and categories:
+                    product.category = categories[0]
                 product.save()
-                invalidate_products_cache()
                 messages.success(request, f"تم إضافة المنتج {product.name} بنجاح.")
                 return redirect('core:products')
             except Exception as exc:
@@ -712,7 +635,8 @@ def edit_product(request, product_id):
         return redirect('core:products')
 
     product = get_object_or_404(Product, id=product_id, cafe=my_cafe)
-    categories_qs = ensure_categories_for_cafe(my_cafe)
+    categories = get_categories_for_cafe(my_cafe.id)
+    categories_qs = get_category_choices(categories)
 
     if request.method == 'POST':
         form = ProductForm(request.POST, request.FILES, instance=product)
@@ -723,7 +647,6 @@ def edit_product(request, product_id):
                 updated_product = form.save(commit=False)
                 updated_product.cafe = my_cafe
                 updated_product.save()
-                invalidate_products_cache()
                 messages.success(request, "تم تحديث بيانات المنتج بنجاح.")
                 return redirect('core:products')
             except Exception as exc:
@@ -736,7 +659,7 @@ def edit_product(request, product_id):
     return render(request, 'core/edit_product.html', {
         'form': form,
         'product': product,
-        'categories': categories_qs,
+        'categories': categories,
         'cafe_name': my_cafe.name,
         'system_settings': get_system_settings(),
     })
@@ -747,11 +670,41 @@ def delete_product(request, product_id):
     cafe = get_cafe_for_user(request.user)
     if cafe:
         Product.objects.filter(id=product_id, cafe=cafe).delete()
-        invalidate_products_cache()
         messages.success(request, "تم حذف المنتج.")
     return redirect('core:products')
 
 
+def _posted_availability(request):
+    return request.POST.get('is_available', '').lower() in ('1', 'true', 'on')
+
+
+@login_required(login_url='core:login')
+def toggle_product_availability(request, product_id):
+    # تحديث واحد وترقيع كاش الكتالوج بدلاً من حفظ النموذج كاملاً وإعادة بناء الكاش
+    cafe = get_cafe_for_user(request.user)
+    if cafe and request.method == 'POST':
+        set_products_availability(cafe.id, [product_id], _posted_availability(request))
+    return redirect('core:products')
+
+
+@login_required(login_url='core:login')
+def bulk_product_availability(request):
+    cafe = get_cafe_for_user(request.user)
+    if not cafe or request.method != 'POST':
+        return redirect('core:products')
+
+    product_ids = [product_id for product_id in request.POST.getlist('product_ids') if product_id.isdigit()]
+    if not product_ids:
+        messages.error(request, "اختر منتجاً واحداً على الأقل.")
+        return redirect('core:products')
+
+    is_available = _posted_availability(request)
+    updated = set_products_availability(cafe.id, product_ids, is_available)
+    status = "متاحة" if is_available else "غير متاحة"
+    messages.success(request, f"تم تعديل {updated} منتج إلى {status}.")
+    return redirect('core:products')
+
+
 @login_required(login_url='core:login')
 def add_user(request):
     return redirect('core:customers')
@@ -840,50 +793,75 @@ def refund_wallet(request):
     return redirect('core:wallet_recharge')
 
 
-@login_required(login_url='core:login')
-def accept_order(request, order_id):
+def _transition_single_order(request, order_id, new_status):
     cafe = get_cafe_for_user(request.user)
-    if not cafe:
-        return redirect('core:orders')
-
-    order = get_object_or_404(Order, id=order_id, cafe=cafe)
-    if order.status == 'PENDING':
-        order.status = 'ACCEPTED'
-        order.save(update_fields=['status'])
+    if cafe and not transition_orders(new_status, [order_id], cafe=cafe):
+        messages.warning(request, "تغيرت حالة الطلب بالفعل، تم تحديث اللوحة.")
     return redirect('core:orders')
 
 
 @login_required(login_url='core:login')
-def preparing_order(request, order_id):
-    cafe = get_cafe_for_user(request.user)
-    if not cafe:
-        return redirect('core:orders')
+def accept_order(request, order_id):
+    return _transition_single_order(request, order_id, 'ACCEPTED')
 
-    order = get_object_or_404(Order, id=order_id, cafe=cafe)
-    if order.status == 'ACCEPTED':
-        order.status = 'PREPARING'
-        order.save(update_fields=['status'])
-    return redirect('core:orders')
+
+@login_required(login_url='core:login')
+def preparing_order(request, order_id):
+    return _transition_single_order(request, order_id, 'PREPARING')
 
 
 @login_required(login_url='core:login')
 def ready_order(request, order_id):
-    cafe = get_cafe_for_user(request.user)
-    if not cafe:
-        return redirect('core:orders')
-
-    order = get_object_or_404(Order, id=order_id, cafe=cafe)
-    if order.status == 'PREPARING':
-        order.status = 'READY'
-        order.save(update_fields=['status'])
-    return redirect('core:orders')
+    return _transition_single_order(request, order_id, 'READY')
 
 
 @login_required(login_url='core:login')
 def complete_order(request, order_id):
+    return _transition_single_order(request, order_id, 'COMPLETED')
+
+
+@login_required(login_url='core:login')
+def bulk_order_status(request):
+    """
+    نقل عدة طلبات دفعة واحدة: الطلبات المحددة (order_ids) أو كل طلبات الحالة السابقة (all=1).
+    مع Accept: application/json تعيد أرقام الطلبات التي انتقلت والتي تم تخطيها.
+    """
     cafe = get_cafe_for_user(request.user)
-    if cafe:
-        Order.objects.filter(id=order_id, cafe=cafe).update(status='COMPLETED')
+    if not cafe or request.method != 'POST':
+        return redirect('core:orders')
+
+    new_status = request.POST.get('status', '')
+    move_all = request.POST.get('all') == '1'
+    order_ids = [int(order_id) for order_id in request.POST.getlist('order_ids') if order_id.isdigit()]
+    wants_json = request.accepts('application/json') and not request.accepts('text/html')
+
+    if not move_all and not order_ids:
+        if wants_json:
+            return JsonResponse({'error': 'No orders selected.'}, status=400)
+        messages.error(request, "اختر طلباً واحداً على الأقل.")
+        return redirect('core:orders')
+
+    try:
+        moved = transition_orders(new_status, None if move_all else order_ids, cafe=cafe)
+    except OrderError as exc:
+        if wants_json:
+            return JsonResponse({'error': exc.message}, status=exc.status)
+        messages.error(request, exc.message)
+        return redirect('core:orders')
+
+    if wants_json:
+        moved_ids = set(moved)
+        return JsonResponse({
+            'status': new_status,
+            'transitioned': moved,
+            'skipped': [order_id for order_id in order_ids if order_id not in moved_ids],
+        })
+
+    status_label = dict(Order.STATUS_CHOICES)[new_status]
+    if moved:
+        messages.success(request, f"تم نقل {len(moved)} طلب إلى \"{status_label}\".")
+    else:
+        messages.warning(request, "لا توجد طلبات في الحالة المطلوبة.")
     return redirect('core:orders')
 
 
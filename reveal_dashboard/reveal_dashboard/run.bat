@@ -40,6 +40,7 @@ echo    To stop the server, close this window or press CTRL+C.
 echo ====================================================================
 echo.
 
+set WARM_CACHES_ON_START=1
 python manage.py runserver
 
 echo.
@@ -4,6 +4,9 @@ from . import api_views
 urlpatterns = [
     # الرابط سيكون: /api/wallet/
     path('', api_views.get_wallet, name='get_wallet'),
+
+    # الرابط سيكون: /api/wallet/transactions/?cursor=
+    path('transactions/', api_views.get_transactions, name='wallet_transactions'),
     
     # الرابط سيكون: /api/wallet/link/
     path('link/', api_views.link_wallet, name='link_wallet'),
@@ -1,3 +1,4 @@
+import uuid
 from decimal import Decimal
 from django.db import transaction
 from django.db.models import Q, Sum
@@ -8,11 +9,15 @@ from rest_framework.response import Response
 from django.conf import settings
 from django.contrib.auth import get_user_model
 
+from core.idempotency import idempotent
+from core.pagination import get_page_params, paginate_queryset, with_next_cursor
 from .models import Wallet, Transaction
-from .serializers import WalletSerializer
+from .serializers import TransactionSerializer, WalletSerializer
 
 User = get_user_model()
 
+RECENT_TRANSACTIONS = 20
+
 def _sync_wallet_balance(wallet):
     aggregates = wallet.transactions.aggregate(
         deposits=Sum('amount', filter=Q(transaction_type__in=['DEPOSIT', 'deposit'])),
@@ -78,21 +83,44 @@ def get_wallet(request):
     wallet, _ = Wallet.objects.get_or_create(user=user)
     wallet = _sync_wallet_balance(wallet)
     
-    # جلب آخر 20 معاملة فقط لتقليل الضغط على السيرفر
-    recent_transactions = wallet.transactions.order_by('-created_at')[:20]
+    # جلب أول صفحة (آخر 20 معاملة) فقط لتقليل الضغط على السيرفر، والباقي عبر /api/wallet/transactions/
+    recent_transactions, next_cursor = paginate_queryset(wallet.transactions.all(), None, RECENT_TRANSACTIONS)
     
     # نمرر المعاملات يدوياً للسيريالايزر
     serializer = WalletSerializer(wallet)
     data = serializer.data
     # نستبدل المعاملات بالقائمة المحدثة (لضمان الترتيب والعدد)
-    from .serializers import TransactionSerializer
     data['transactions'] = TransactionSerializer(recent_transactions, many=True).data
+    data['transactions_next_cursor'] = next_cursor
     
     return Response(data)
 
 
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_transactions(request):
+    """
+    سجل معاملات المحفظة مقسّم لصفحات بالمؤشر (?cursor=&limit=).
+    """
+    try:
+        user = get_request_user(request)
+    except Exception as e:
+        return Response({'error': str(e)}, status=401)
+
+    try:
+        position, limit = get_page_params(request, pk_type=uuid.UUID)
+    except ValueError:
+        return Response({'error': 'Invalid cursor'}, status=400)
+
+    wallet, _ = Wallet.objects.get_or_create(user=user)
+    transactions, next_cursor = paginate_queryset(wallet.transactions.all(), position, limit)
+    serializer = TransactionSerializer(transactions, many=True)
+    return with_next_cursor(Response(serializer.data), next_cursor)
+
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@idempotent(get_user=get_request_user)
 def transfer_wallet(request):
     try:
         user = get_request_user(request)
@@ -189,6 +217,7 @@ def link_wallet(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@idempotent(get_user=get_request_user)
 def topup_wallet(request):
     """
     شحن المحفظة (لأغراض الاختبار أو إذا كان هناك بوابة دفع).
@@ -224,6 +253,7 @@ def topup_wallet(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@idempotent(get_user=get_request_user)
 def withdraw_wallet(request):
     try:
         user = get_request_user(request)
@@ -53,4 +53,16 @@ class WalletSerializer(serializers.ModelSerializer):
     def get_recent_transactions(self, obj):
         # جلب أحدث 10 عمليات فقط
         qs = Transaction.objects.filter(wallet=obj).order_by('-created_at')[:10]
-        return TransactionSerializer(qs, many=True).data
\ No newline at end of file
+        return TransactionSerializer(qs, many=True).data
+
+
+class WalletSummarySerializer(serializers.ModelSerializer):
+    # الرصيد فقط بدون المعاملات (لشاشة البداية في التطبيق)
+    currency = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Wallet
+        fields = ['id', 'balance', 'currency', 'college', 'link_code', 'updated_at']
+
+    def get_currency(self, obj):
+        return "LYD"